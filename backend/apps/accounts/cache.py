@@ -0,0 +1,162 @@
+"""
+Cached lookup of the user an access token belongs to
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from rest_framework_simplejwt.settings import api_settings
+
+from config.redis import redis_available, redis_failed
+from .models import User
+
+# Columns kept in the cache, in model order. Profile fields are deferred and
+# read from the database only if a request uses them; the password hash is
+# cached only when CachedJWTAuthentication compares it with the token.
+CACHED_FIELDS = [
+    field for field in User._meta.concrete_fields
+    if field.attname in {'id', 'email', 'username', 'is_active', 'is_staff', 'is_superuser'}
+    or (field.attname == 'password' and api_settings.CHECK_REVOKE_TOKEN)
+]
+
+
+class UserResolver:
+    """
+    Two-tier user ID -> User cache for JWT authentication.
+
+    Shared by the WebSocket JWTAuthMiddleware and the DRF
+    CachedJWTAuthentication class, so a reconnect storm or a burst of API
+    calls loads each user from the database once. A per-process LRU answers
+    repeated lookups without I/O for USER_LOCAL_CACHE_TTL, then the default
+    cache for USER_CACHE_TTL, then the database. Only the columns
+    authentication and permission checks read are cached.
+
+    Saving or deleting a user drops its entries (see signals.py); LRUs of
+    other processes catch up within USER_LOCAL_CACHE_TTL. Queryset
+    update() calls send no signal and must call invalidate() themselves.
+    """
+
+    KEY_PREFIX = 'auth_users'
+
+    def __init__(self):
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'local_hits': 0, 'redis_hits': 0, 'misses': 0}
+
+    def _key(self, user_id) -> str:
+        # Entries cached with another set of columns do not fit from_db
+        return f'{self.KEY_PREFIX}:{len(CACHED_FIELDS)}:{user_id}'
+
+    @staticmethod
+    def _build(values: Tuple) -> User:
+        """A fresh instance per lookup, so requests may modify request.user"""
+        return User.from_db(router.db_for_read(User), [field.attname for field in CACHED_FIELDS], values)
+
+    def get_cached(self, user_id) -> Optional[User]:
+        """
+        Get a user from the per-process LRU only
+
+        Safe to call from async code, as it does no I/O.
+
+        Args:
+            user_id: User ID from the token
+
+        Returns:
+            User instance, or None if it is not cached in this process
+        """
+        key = str(user_id)
+        with self._lock:
+            entry = self._local.get(key)
+            if not entry or entry[1] <= time.monotonic():
+                return None
+            self._local.move_to_end(key)
+            self._stats['local_hits'] += 1
+        return self._build(entry[0])
+
+    def _remember(self, key: str, values: Tuple):
+        with self._lock:
+            self._local[key] = (values, time.monotonic() + settings.USER_LOCAL_CACHE_TTL)
+            self._local.move_to_end(key)
+            while len(self._local) > settings.USER_LOCAL_CACHE_SIZE:
+                self._local.popitem(last=False)
+
+    def get_user(self, user_id) -> Optional[User]:
+        """
+        Get the user an access token belongs to
+
+        Args:
+            user_id: User ID from the token
+
+        Returns:
+            User instance with the cached fields loaded, or None if the user
+            does not exist
+        """
+        user = self.get_cached(user_id)
+        if user is not None:
+            return user
+
+        key = str(user_id)
+        if redis_available():
+            try:
+                values = cache.get(self._key(key))
+            except redis.RedisError as e:
+                redis_failed(e, 'authenticating users against the database')
+                values = None
+            if values is not None:
+                with self._lock:
+                    self._stats['redis_hits'] += 1
+                self._remember(key, values)
+                return self._build(values)
+
+        with self._lock:
+            self._stats['misses'] += 1
+        values = User.objects.filter(pk=user_id).values_list(*[field.attname for field in CACHED_FIELDS]).first()
+        if values is None:
+            return None
+
+        self._remember(key, values)
+        if redis_available():
+            try:
+                cache.set(self._key(key), values, timeout=settings.USER_CACHE_TTL)
+            except redis.RedisError as e:
+                redis_failed(e, 'authenticating users against the database')
+        return self._build(values)
+
+    def invalidate(self, user_ids: Iterable[Any]):
+        """
+        Drop the cached entries of users
+
+        Args:
+            user_ids: IDs of users that were saved or deleted
+        """
+        keys = {str(user_id) for user_id in user_ids}
+        if not keys:
+            return
+
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+
+        if not redis_available():
+            return
+        try:
+            cache.delete_many([self._key(key) for key in keys])
+        except redis.RedisError as e:
+            redis_failed(e, 'authenticating users against the database')
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get lookup counters of this process
+
+        Returns:
+            Dict of local_hits, redis_hits and misses (database queries)
+        """
+        with self._lock:
+            return dict(self._stats)
+
+
+user_resolver = UserResolver()
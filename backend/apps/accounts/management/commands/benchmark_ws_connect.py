@@ -0,0 +1,113 @@
+"""
+Measure WebSocket connect-storm throughput and per-request JWT authentication cost
+"""
+import asyncio
+import time
+from unittest.mock import patch
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.accounts.authentication import CachedJWTAuthentication
+from apps.accounts.cache import user_resolver
+from apps.accounts.models import User
+from apps.core.benchmarking import committed_users
+from apps.messages.routing import websocket_urlpatterns
+from config.middleware import JWTAuthMiddleware
+
+
+class UncachedResolver:
+    """What get_user_from_token did before the cache: one query per connect"""
+
+    def get_cached(self, user_id):
+        return None
+
+    def get_user(self, user_id):
+        return User.objects.filter(pk=user_id).first()
+
+
+class Command(BaseCommand):
+    help = (
+        'Open a burst of concurrent WebSocket connections through JWTAuthMiddleware, as after a '
+        'deploy, with and without the user cache, and time REST token authentication. Creates '
+        'users and deletes them afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--connections', type=int, default=2000)
+        parser.add_argument('--requests', type=int, default=2000, help='REST authentications to time')
+
+    def handle(self, *args, **options):
+        channel_layer = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+        with committed_users('storm', options['users']) as users:
+            tokens = [str(AccessToken.for_user(user)) for user in users]
+            storm = [tokens[i % len(tokens)] for i in range(options['connections'])]
+
+            with override_settings(CHANNEL_LAYERS=channel_layer):
+                with patch('config.middleware.user_resolver', UncachedResolver()):
+                    self._storm('query per connect (previous)', storm, queries=len(storm))
+
+                user_resolver.invalidate(user.pk for user in users)
+                for name in ('cold cache', 'warm cache', 'fresh process, warm Redis'):
+                    if name.startswith('fresh'):
+                        user_resolver._local.clear()
+                    before = user_resolver.get_stats()
+                    self._storm(name, storm, queries=None, before=before)
+
+            self._rest(tokens, options['requests'])
+
+    def _storm(self, name, tokens, queries, before=None):
+        application = JWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+        async def connect(token):
+            communicator = WebsocketCommunicator(application, f'/ws/messages/?token={token}')
+            # Generous timeouts: the point is how long the whole burst takes
+            connected, _ = await communicator.connect(timeout=300)
+            if connected:
+                await communicator.receive_json_from(timeout=300)
+                await communicator.disconnect()
+            return connected
+
+        async def run():
+            return await asyncio.gather(*(connect(token) for token in tokens))
+
+        start = time.perf_counter()
+        results = async_to_sync(run)()
+        elapsed = time.perf_counter() - start
+
+        if queries is None:
+            after = user_resolver.get_stats()
+            queries = after['misses'] - before['misses']
+            source = ', '.join(f'{key}={after[key] - before[key]}' for key in after)
+        else:
+            source = 'database'
+        self.stdout.write(
+            f'{name:>30}: {len(tokens)} connects in {elapsed:.2f}s ({len(tokens) / elapsed:.0f}/s), '
+            f'{sum(results)} accepted, {queries} user queries ({source})'
+        )
+
+    def _rest(self, tokens, count):
+        factory = APIRequestFactory()
+        requests = [
+            factory.get('/api/auth/me/', HTTP_AUTHORIZATION=f'Bearer {tokens[i % len(tokens)]}')
+            for i in range(count)
+        ]
+        for name, authenticator in (('JWTAuthentication', JWTAuthentication()),
+                                    ('CachedJWTAuthentication', CachedJWTAuthentication())):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                for request in requests:
+                    authenticator.authenticate(request)
+                elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f'{name:>30}: {count} requests, {elapsed / count * 1e6:.0f}us per authentication, '
+                f'{len(captured)} queries'
+            )
@@ -0,0 +1,15 @@
+"""
+User signal handlers
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import user_resolver
+from .models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Drop the cached copy of a changed or removed user"""
+    user_resolver.invalidate([instance.pk])
@@ -79,7 +79,9 @@ class UserDetailView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
 
     def get_object(self):
-        return self.request.user
+        # request.user comes from the auth cache with most columns deferred;
+        # load the whole row at once instead of one query per deferred field
+        return User.objects.get(pk=self.request.user.pk)
 
 
 class LogoutView(APIView):
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import DailyAnalytics
+from .models import AnalyticsCheckpoint, AnalyticsDay, DailyAnalytics
 
 
 @admin.register(DailyAnalytics)
@@ -9,3 +9,14 @@ class DailyAnalyticsAdmin(admin.ModelAdmin):
     search_fields = ['user__email']
     readonly_fields = ['id', 'created_at', 'updated_at']
     ordering = ['-date']
+
+
+@admin.register(AnalyticsDay)
+class AnalyticsDayAdmin(admin.ModelAdmin):
+    list_display = ['date', 'rows', 'aggregated_at', 'finalized_at']
+    ordering = ['-date']
+
+
+@admin.register(AnalyticsCheckpoint)
+class AnalyticsCheckpointAdmin(admin.ModelAdmin):
+    list_display = ['name', 'position', 'updated_at']
@@ -6,3 +6,6 @@ class AnalyticsConfig(AppConfig):
     name = 'apps.analytics'
     label = 'analytics'
     verbose_name = 'Analytics & Reporting'
+
+    def ready(self):
+        from . import signals  # noqa: F401
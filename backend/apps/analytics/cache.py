@@ -0,0 +1,77 @@
+"""
+Short-lived cache of per-user platform statistics
+"""
+from typing import Any, Dict, Iterable, Optional
+import redis
+from django.conf import settings
+from django.core.cache import cache
+
+from config.redis import redis_available, redis_failed
+
+
+class PlatformStatsCache:
+    """
+    Default-cache entries of the per-platform totals behind the analytics endpoints.
+
+    One key per user holds the conversation, message and unread counts of
+    each connected platform for ANALYTICS_STATS_CACHE_TTL seconds, so a
+    dashboard polling several endpoints runs the aggregation once. Message
+    inserts, mark-read requests and account or conversation deletes drop
+    the user's key; other writes show up once it expires.
+    """
+
+    KEY_PREFIX = 'analytics_stats'
+
+    def _key(self, user_id) -> str:
+        return f'{self.KEY_PREFIX}:{user_id}'
+
+    def get(self, user_id) -> Optional[Dict[str, Dict[str, int]]]:
+        """
+        Get the cached totals of a user
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            Totals keyed by platform, or None if they are not cached
+        """
+        if not redis_available():
+            return None
+        try:
+            return cache.get(self._key(user_id))
+        except redis.RedisError as e:
+            redis_failed(e, 'computing analytics stats per request')
+            return None
+
+    def set(self, user_id, stats: Dict[str, Dict[str, int]]):
+        """
+        Cache the totals of a user
+
+        Args:
+            user_id: User ID
+            stats: Totals keyed by platform
+        """
+        if not redis_available():
+            return
+        try:
+            cache.set(self._key(user_id), stats, timeout=settings.ANALYTICS_STATS_CACHE_TTL)
+        except redis.RedisError as e:
+            redis_failed(e, 'computing analytics stats per request')
+
+    def invalidate(self, user_ids: Iterable[Any]):
+        """
+        Drop the cached totals of users
+
+        Args:
+            user_ids: IDs of users whose messages or accounts changed
+        """
+        keys = [self._key(user_id) for user_id in {str(user_id) for user_id in user_ids}]
+        if not keys or not redis_available():
+            return
+        try:
+            cache.delete_many(keys)
+        except redis.RedisError as e:
+            redis_failed(e, 'computing analytics stats per request')
+
+
+platform_stats_cache = PlatformStatsCache()
@@ -0,0 +1,151 @@
+"""
+Time daily analytics aggregation for many users against the per-user loop it replaced
+"""
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from apps.analytics.models import AnalyticsDay, DailyAnalytics
+from apps.analytics.services import AnalyticsService
+from apps.analytics.tasks import aggregate_daily_analytics
+from apps.core.benchmarking import (
+    PLATFORMS, analyze, build_message, rolled_back, seed_accounts, seed_conversations, seed_users,
+)
+from apps.messages.models import Message
+from apps.platforms.models import PlatformAccount
+
+
+def aggregate_user_platform_analytics(user_id, platform, target_date):
+    """What the task ran four times per user before: six to eight queries each"""
+    if platform == 'all':
+        platform_accounts = PlatformAccount.objects.filter(user_id=user_id)
+    else:
+        platform_accounts = PlatformAccount.objects.filter(user_id=user_id, platform=platform)
+    if not platform_accounts.exists():
+        return
+
+    messages = Message.objects.filter(user_id=user_id, sent_at__date=target_date)
+    if platform != 'all':
+        messages = messages.filter(platform_account__platform=platform)
+
+    DailyAnalytics.objects.update_or_create(
+        user_id=user_id,
+        platform=platform,
+        date=target_date,
+        defaults={
+            'total_messages': messages.count(),
+            'incoming_messages': messages.filter(is_incoming=True).count(),
+            'outgoing_messages': messages.filter(is_incoming=False).count(),
+            'total_conversations': messages.values('conversation_id').distinct().count(),
+        }
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a day of messages for many users and time aggregating it with the per-user loop "
+        "and with the grouped query and bulk upsert, then run the hourly task twice. Seeded rows "
+        "are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--messages', type=int, default=20, help='Messages per user on the day')
+        parser.add_argument('--skip-previous', action='store_true', help='Do not time the per-user loop')
+
+    def handle(self, *args, **options):
+        target_date = timezone.localdate() - timedelta(days=1)
+
+        with rolled_back():
+            start = time.perf_counter()
+            user_ids = self._populate(target_date, options['users'], options['messages'])
+            self.stdout.write(
+                f'seeded {len(user_ids)} users, {len(user_ids) * options["messages"]} messages '
+                f'in {time.perf_counter() - start:.1f}s'
+            )
+            analyze()
+
+            previous = None
+            if not options['skip_previous']:
+                def run_previous():
+                    for user_id in PlatformAccount.objects.values_list('user_id', flat=True).distinct():
+                        for platform in PLATFORMS + ['all']:
+                            aggregate_user_platform_analytics(user_id, platform, target_date)
+                self._time('per-user loop (previous)', run_previous)
+                previous = self._snapshot(target_date)
+                DailyAnalytics.objects.filter(date=target_date).delete()
+
+            self._time('grouped query + upsert', lambda: AnalyticsService.aggregate_day(target_date))
+            self._time('grouped query + upsert (rows exist)', lambda: AnalyticsService.aggregate_day(target_date))
+
+            if previous is not None:
+                current = self._snapshot(target_date)
+                # The loop also wrote zero rows for platforms without messages
+                previous = {key: value for key, value in previous.items() if value[0]}
+                if previous != current:
+                    raise CommandError('Grouped aggregation does not match the per-user loop')
+                self.stdout.write(f'results match the per-user loop ({len(current)} rows)')
+
+            AnalyticsDay.objects.all().delete()
+            for run in ('first', 'second'):
+                self._time(f'hourly task, {run} run', aggregate_daily_analytics)
+            self.stdout.write(
+                'days: ' + ', '.join(str(day) for day in AnalyticsDay.objects.order_by('date'))
+            )
+
+    def _time(self, name, func):
+        # Counted by a wrapper: the query log keeps only the last 9000 queries
+        queries = []
+
+        def count(execute, sql, params, many, context):
+            queries.append(1)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+        self.stdout.write(f'{name:>36}: {elapsed:7.2f}s, {len(queries)} queries')
+
+    def _snapshot(self, target_date):
+        return {
+            (row[0], row[1]): row[2:]
+            for row in DailyAnalytics.objects.filter(date=target_date).values_list(
+                'user_id', 'platform', 'total_messages', 'incoming_messages',
+                'outgoing_messages', 'total_conversations'
+            )
+        }
+
+    def _populate(self, target_date, user_count, message_count):
+        users = seed_users('analytics', user_count)
+        # Every fifth user has connected a second platform
+        accounts = seed_accounts('analytics', [
+            (user, PLATFORMS[(u + extra) % len(PLATFORMS)])
+            for u, user in enumerate(users)
+            for extra in range(2 if u % 5 == 0 else 1)
+        ])
+        conversations = seed_conversations(accounts, 3)
+
+        by_user = {}
+        for conversation in conversations:
+            by_user.setdefault(conversation.user_id, []).append(conversation)
+        day_start, _ = AnalyticsService.day_bounds(target_date)
+
+        batch = []
+        for u, user in enumerate(users):
+            user_conversations = by_user[user.id]
+            for i in range(message_count):
+                batch.append(build_message(
+                    user_conversations[i % len(user_conversations)],
+                    content=f'Message {i}',
+                    is_incoming=i % 3 != 0,
+                    # Spread over the day, with a few on the neighbouring days
+                    sent_at=day_start + timedelta(minutes=(u * 7 + i * 101) % 1560 - 60),
+                ))
+            if len(batch) >= 10000:
+                Message.objects.bulk_create(batch)
+                batch = []
+        Message.objects.bulk_create(batch)
+        return [user.id for user in users]
@@ -0,0 +1,177 @@
+"""
+Check the live analytics counters under concurrent writes and time the daily stats endpoint
+"""
+import statistics
+import threading
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.analytics.models import DailyAnalytics
+from apps.analytics.services import AnalyticsService
+from apps.analytics.views import AnalyticsViewSet
+from apps.core.benchmarking import analyze, build_message, committed_users, rolled_back, seed_account, seed_conversations
+from apps.messages.models import Conversation, Message
+from apps.messages.outbound import OutboundService
+from apps.messages.services import MessageService
+
+COUNTERS = ['total_messages', 'incoming_messages', 'outgoing_messages', 'new_conversations']
+
+
+def previous_daily_stats(user, days):
+    """What daily_stats ran before: two TruncDate group-bys over raw rows"""
+    end_date = timezone.now().date()
+    start_date = end_date - timedelta(days=days - 1)
+    messages = dict(
+        Message.objects.filter(user=user, sent_at__date__gte=start_date, sent_at__date__lte=end_date)
+        .annotate(date=TruncDate('sent_at')).values('date').annotate(count=Count('id'))
+        .order_by('date').values_list('date', 'count')
+    )
+    conversations = dict(
+        Conversation.objects.filter(user=user, created_at__date__gte=start_date, created_at__date__lte=end_date)
+        .annotate(date=TruncDate('created_at')).values('date').annotate(count=Count('id'))
+        .order_by('date').values_list('date', 'count')
+    )
+    return [
+        {
+            'date': str(day),
+            'message_count': messages.get(day, 0),
+            'conversation_count': conversations.get(day, 0),
+        }
+        for day in (start_date + timedelta(days=offset) for offset in range(days))
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Store webhook and outbound messages from concurrent threads and verify the live '
+        'DailyAnalytics counters equal a recount, then time /stats/daily against the raw-message '
+        'group-bys it replaced. Concurrent rows are committed and deleted afterwards, the seeded '
+        'history is rolled back; use PostgreSQL for real contention.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--batches', type=int, default=25, help='Webhook batches per writer')
+        parser.add_argument('--batch-size', type=int, default=10)
+        parser.add_argument('--days', type=int, default=30)
+        parser.add_argument('--messages-per-day', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with committed_users('daily') as (user,):
+            account = seed_account('daily', user=user)
+            self._check_counters(user, account, options)
+            self._time_endpoint(user, account, options)
+
+    def _check_counters(self, user, account, options):
+        errors = []
+
+        def writer(index):
+            try:
+                for b in range(options['batches']):
+                    MessageService.process_webhook_batch('messenger', [
+                        {
+                            'platform': 'messenger',
+                            # A few customers, so conversations are both created and reused
+                            'sender_id': f'customer-{(index + b) % 5}-{b % 3}',
+                            'recipient_id': account.platform_user_id,
+                            'message_id': f'daily.{account.pk}.{index}.{b}.{i}',
+                            'message_text': 'hello',
+                            'is_echo': i % 4 == 0,
+                        }
+                        for i in range(options['batch_size'])
+                    ])
+                    conversation = Conversation.objects.filter(platform_account=account).first()
+                    OutboundService.queue_message(conversation, f'Reply {index}.{b}')
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(options['writers'])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        for e in errors[:5]:
+            self.stderr.write(f'  {type(e).__name__}: {e}')
+
+        today = timezone.localdate()
+        live = self._counters(user, today)
+        expected = {
+            row.platform: [getattr(row, field) for field in COUNTERS]
+            for row in AnalyticsService.build_rows(today, [
+                item for item in AnalyticsService.count_day(today) if item['user_id'] == user.id
+            ])
+        }
+        stored = Message.objects.filter(user=user).count()
+        self.stdout.write(
+            f'{options["writers"]} writers stored {stored} messages in {elapsed:.2f}s, '
+            f'thread_errors={len(errors)}'
+        )
+        self.stdout.write(f'live counters: {live}')
+        if live != expected:
+            raise CommandError(f'Live counters drifted from the recount: {expected}')
+        self.stdout.write('OK: live counters equal a recount of the stored messages')
+
+    def _counters(self, user, day):
+        return {
+            row['platform']: [row[field] for field in COUNTERS]
+            for row in DailyAnalytics.objects.filter(user=user, date=day).values('platform', *COUNTERS)
+        }
+
+    def _time_endpoint(self, user, account, options):
+        days = options['days']
+        with rolled_back():
+            self._populate(account, days, options['messages_per_day'])
+            today = timezone.localdate()
+            for offset in range(days):
+                AnalyticsService.aggregate_day(today - timedelta(days=offset))
+            analyze()
+
+            factory = APIRequestFactory()
+            view = AnalyticsViewSet.as_view({'get': 'daily_stats'})
+
+            def current():
+                request = factory.get(f'/api/analytics/stats/daily/?days={days}', HTTP_HOST='localhost')
+                force_authenticate(request, user=user)
+                return view(request).data
+
+            if current() != previous_daily_stats(user, days):
+                raise CommandError('daily_stats does not match the raw-message group-bys')
+
+            for name, func in (('raw-message group-bys (previous)', lambda: previous_daily_stats(user, days)),
+                               ('DailyAnalytics rows', current)):
+                timings = []
+                for _ in range(options['repeat']):
+                    with CaptureQueriesContext(connection) as captured:
+                        start = time.perf_counter()
+                        func()
+                        timings.append((time.perf_counter() - start) * 1000)
+                self.stdout.write(
+                    f'{name:>34}: {statistics.median(timings):7.2f}ms, {len(captured)} queries '
+                    f'({Message.objects.filter(user=user).count()} messages over {days} days)'
+                )
+
+    def _populate(self, account, days, per_day):
+        conversations = seed_conversations([account], 50)
+        start, _ = AnalyticsService.day_bounds(timezone.localdate() - timedelta(days=days - 1))
+        Message.objects.bulk_create([
+            build_message(
+                conversations[i % len(conversations)],
+                content=f'Message {i}',
+                is_incoming=i % 3 != 0,
+                sent_at=start + timedelta(days=d, seconds=i * 86400 // per_day),
+            )
+            for d in range(days - 1)
+            for i in range(per_day)
+        ], batch_size=5000)
@@ -0,0 +1,136 @@
+"""
+Time the response time job against pairing messages per conversation in Python
+"""
+import random
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.utils import timezone
+
+from apps.analytics.models import DailyAnalytics
+from apps.analytics.response_times import ResponseTimeService
+from apps.analytics.services import AnalyticsService
+from apps.core.benchmarking import (
+    PLATFORMS, analyze, build_message, rolled_back, seed_accounts, seed_conversations, seed_users,
+)
+from apps.messages.models import Conversation, Message
+
+
+def per_conversation_response_times(user_ids):
+    """The naive approach: load each conversation's messages and walk them in Python"""
+    groups = {}
+    limit = settings.ANALYTICS_RESPONSE_MAX_HOURS * 60
+    for conversation in Conversation.objects.filter(user_id__in=user_ids).select_related('platform_account'):
+        turn_start = None
+        for is_incoming, sent_at in conversation.messages.order_by('sent_at', 'id').values_list('is_incoming', 'sent_at'):
+            if is_incoming:
+                turn_start = turn_start or sent_at
+            elif turn_start:
+                minutes = (sent_at - turn_start).total_seconds() / 60
+                if minutes <= limit:
+                    day = timezone.localdate(sent_at)
+                    for platform in (conversation.platform_account.platform, 'all'):
+                        groups.setdefault((conversation.user_id, platform, day), []).append(minutes)
+                turn_start = None
+    return {key: ResponseTimeService.summarize(minutes) for key, minutes in groups.items()}
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed conversations with customer turns and replies, compare the window-function job with '
+        'a per-conversation Python walk, and time an incremental run after a few new messages. '
+        'Seeded rows are rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--conversations', type=int, default=10, help='Conversations per user')
+        parser.add_argument('--turns', type=int, default=6, help='Customer turns per conversation')
+        parser.add_argument('--days', type=int, default=3)
+        parser.add_argument('--changed-users', type=int, default=20)
+
+    def handle(self, *args, **options):
+        random.seed(1)
+        since, _ = AnalyticsService.day_bounds(timezone.localdate() - timedelta(days=options['days'] - 1))
+
+        with override_settings(ANALYTICS_RESPONSE_TIME_LAG=0), rolled_back():
+            start = time.perf_counter()
+            users, conversations = self._populate(options, since)
+            self.stdout.write(
+                f'seeded {Message.objects.filter(user__in=users).count()} messages for {len(users)} users '
+                f'in {time.perf_counter() - start:.1f}s'
+            )
+            analyze()
+            user_ids = [user.id for user in users]
+
+            start = time.perf_counter()
+            expected = per_conversation_response_times(user_ids)
+            self.stdout.write(f'{"per-conversation Python walk":>32}: {time.perf_counter() - start:7.2f}s')
+
+            start = time.perf_counter()
+            result = ResponseTimeService.update(since=since - timedelta(minutes=1))
+            self.stdout.write(
+                f'{"window functions, all users":>32}: {time.perf_counter() - start:7.2f}s '
+                f'({result["users"]} users, {result["rows"]} rows)'
+            )
+            self._compare(user_ids, expected)
+
+            # A few users get a new customer message and a reply
+            time.sleep(0.01)
+            now = timezone.now()
+            changed = random.sample(conversations, options['changed_users'])
+            Message.objects.bulk_create([
+                build_message(conversation, content='Late', is_incoming=is_incoming,
+                              sent_at=now - timedelta(minutes=minutes))
+                for conversation in changed
+                for is_incoming, minutes in ((True, 30), (False, 12))
+            ])
+
+            start = time.perf_counter()
+            result = ResponseTimeService.update()
+            self.stdout.write(
+                f'{"window functions, incremental":>32}: {time.perf_counter() - start:7.2f}s '
+                f'({result["users"]} users, {result["rows"]} rows)'
+            )
+            self._compare(user_ids, per_conversation_response_times(user_ids))
+
+    def _compare(self, user_ids, expected):
+        stored = {
+            (row.user_id, row.platform, row.date): (row.avg_response_time_minutes, row.metadata['response_time'])
+            for row in DailyAnalytics.objects.filter(user_id__in=user_ids, avg_response_time_minutes__isnull=False)
+        }
+        expected = {key: (round(mean, 2), summary) for key, (mean, summary) in expected.items()}
+        if stored != expected:
+            missing = set(expected) ^ set(stored)
+            raise CommandError(f'Response times differ from the Python walk ({len(missing)} rows missing or extra)')
+        self.stdout.write(f'results match the per-conversation walk ({len(stored)} rows)')
+
+    def _populate(self, options, since):
+        users = seed_users('response', options['users'])
+        accounts = seed_accounts('response', [
+            (user, PLATFORMS[u % len(PLATFORMS)]) for u, user in enumerate(users)
+        ])
+        conversations = seed_conversations(accounts, options['conversations'])
+
+        # Turns of one to three customer messages, answered by one or two replies
+        # minutes to hours later; some are never answered
+        now = timezone.now()
+        span = (now - since).total_seconds() + 86400
+        messages = []
+        for conversation in conversations:
+            at = since - timedelta(days=1) + timedelta(seconds=random.uniform(0, span / 2))
+            for _ in range(options['turns']):
+                for is_incoming, count, gap in ((True, random.randint(1, 3), 2),
+                                                (False, random.choice([0, 1, 1, 2]), random.expovariate(1 / 45))):
+                    for _ in range(count):
+                        at += timedelta(minutes=gap + 1)
+                        if at >= now - timedelta(minutes=1):
+                            break
+                        messages.append(build_message(
+                            conversation, content='Hello', is_incoming=is_incoming, sent_at=at
+                        ))
+                at += timedelta(hours=random.uniform(1, 20))
+        Message.objects.bulk_create(messages, batch_size=5000)
+        return users, conversations
@@ -0,0 +1,150 @@
+"""
+Check that the platform stats endpoints run the same number of queries for any number of accounts
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.analytics.cache import platform_stats_cache
+from apps.analytics.services import AnalyticsService
+from apps.analytics.views import AnalyticsViewSet
+from apps.core.benchmarking import (
+    PLATFORMS, build_message, committed_users, rolled_back, seed_accounts, seed_conversations, seed_users,
+)
+from apps.messages.models import Conversation, Message
+from apps.messages.views import MessageViewSet
+from apps.platforms.models import PlatformAccount
+
+
+def previous_platform_stats(user):
+    """What /platform ran before: three counts per connected account"""
+    breakdown = {}
+    for account in PlatformAccount.objects.filter(user=user):
+        counts = breakdown.setdefault(account.platform.lower(), {'conversations': 0, 'messages': 0, 'unread': 0})
+        messages = Message.objects.filter(platform_account=account)
+        counts['conversations'] += Conversation.objects.filter(platform_account=account).count()
+        counts['messages'] += messages.count()
+        counts['unread'] += messages.filter(is_incoming=True, is_read=False).count()
+    return breakdown
+
+
+def previous_message_stats(user):
+    """What /stats/messages ran before: three counts plus one per connected account"""
+    breakdown = {}
+    for account in PlatformAccount.objects.filter(user=user):
+        breakdown[account.platform] = breakdown.get(account.platform, 0) + \
+            Conversation.objects.filter(platform_account=account).count()
+    messages = Message.objects.filter(user=user)
+    return {
+        'total_messages': messages.count(),
+        'unread_messages': messages.filter(is_incoming=True, is_read=False).count(),
+        'total_conversations': Conversation.objects.filter(user=user).count(),
+        'platform_breakdown': {platform: breakdown.get(platform, 0) for platform in PLATFORMS},
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed users with different numbers of connected accounts and check that /stats/messages and '
+        '/platform run a constant number of queries, cold and cached, with the same results as the '
+        'per-account loops they replaced, then that storing and reading messages drops the cached '
+        'totals. Seeded rows are rolled back or deleted.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--accounts', type=int, nargs='+', default=[1, 3, 10],
+                            help='Connected accounts of each seeded user')
+        parser.add_argument('--conversations', type=int, default=5, help='Conversations per account')
+        parser.add_argument('--messages', type=int, default=8, help='Messages per conversation')
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        endpoints = {
+            'stats/messages': (AnalyticsViewSet.as_view({'get': 'message_stats'}), previous_message_stats),
+            'platform': (AnalyticsViewSet.as_view({'get': 'platform'}), previous_platform_stats),
+        }
+
+        with rolled_back():
+            users = seed_users('stats', len(options['accounts']))
+            for user, accounts in zip(users, options['accounts']):
+                self._populate(user, accounts, options['conversations'], options['messages'])
+            platform_stats_cache.invalidate([user.id for user in users])
+
+            counts = {}
+            for name, (view, previous) in endpoints.items():
+                for user, accounts in zip(users, options['accounts']):
+                    with CaptureQueriesContext(connection) as captured:
+                        previous_queries = len(captured)
+                        expected = previous(user)
+                        previous_queries = len(captured) - previous_queries
+
+                    for run in ('cold', 'cached'):
+                        request = factory.get(f'/api/analytics/{name}/', HTTP_HOST='localhost')
+                        force_authenticate(request, user=user)
+                        with CaptureQueriesContext(connection) as captured:
+                            data = view(request).data
+                        if data != expected:
+                            raise CommandError(f'/{name} ({run}) differs from the per-account loop: {data} != {expected}')
+                        counts.setdefault((name, run), set()).add(len(captured))
+                        self.stdout.write(
+                            f'/{name:<14} {accounts:>3} accounts, {run:<6}: {len(captured)} queries '
+                            f'(previous: {previous_queries})'
+                        )
+                    platform_stats_cache.invalidate([user.id])
+
+            platform_stats_cache.invalidate([user.id for user in users])
+
+        varying = {key: sorted(found) for key, found in counts.items() if len(found) > 1}
+        if varying:
+            raise CommandError(f'Query counts depend on the number of accounts: {varying}')
+        self.stdout.write(
+            'OK: ' + ', '.join(f'/{name} {run} {found.pop()} queries' for (name, run), found in counts.items())
+            + ' for any number of accounts'
+        )
+        self._check_invalidation(factory, endpoints['platform'], options)
+
+    def _check_invalidation(self, factory, endpoint, options):
+        # Committed, so the on_commit invalidation runs as it does in production
+        view, previous = endpoint
+        with committed_users('stats') as (user,):
+            self._populate(user, 1, 1, options['messages'])
+            try:
+                self._check_cached_totals(factory, view, previous, user)
+            finally:
+                platform_stats_cache.invalidate([user.id])
+
+    def _check_cached_totals(self, factory, view, previous, user):
+        def current():
+            request = factory.get('/api/analytics/platform/', HTTP_HOST='localhost')
+            force_authenticate(request, user=user)
+            return view(request).data
+
+        platform_stats_cache.invalidate([user.id])
+        current()
+        conversation = Conversation.objects.get(user=user)
+        with transaction.atomic():
+            messages = self._store_messages(conversation, 3)
+            AnalyticsService.record_messages(conversation.platform_account.platform, messages)
+        if current() != previous(user):
+            raise CommandError('/platform served cached totals after messages were stored')
+
+        message = next(message for message in messages if message.is_incoming and not message.is_read)
+        request = factory.post(f'/api/messages/messages/{message.pk}/mark-read/', HTTP_HOST='localhost')
+        force_authenticate(request, user=user)
+        MessageViewSet.as_view({'post': 'mark_read'})(request, pk=message.pk)
+        if current() != previous(user):
+            raise CommandError('/platform served cached totals after a message was marked read')
+        self.stdout.write('OK: storing and reading messages drops the cached totals')
+
+    def _populate(self, user, account_count, conversation_count, message_count):
+        accounts = seed_accounts('stats', [(user, PLATFORMS[a % len(PLATFORMS)]) for a in range(account_count)])
+        # The last account has no conversations yet
+        for conversation in seed_conversations(accounts[:-1] or accounts, conversation_count):
+            self._store_messages(conversation, message_count)
+
+    def _store_messages(self, conversation, count):
+        return Message.objects.bulk_create([
+            build_message(conversation, content=f'Message {i}', is_incoming=i % 3 != 0, is_read=i % 2 == 0)
+            for i in range(count)
+        ])
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.1 on 2026-10-17 01:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsDay',
+            fields=[
+                ('date', models.DateField(primary_key=True, serialize=False)),
+                ('rows', models.IntegerField(default=0, help_text='DailyAnalytics rows written by the last aggregation')),
+                ('aggregated_at', models.DateTimeField()),
+                ('finalized_at', models.DateTimeField(blank=True, help_text='Set once the day was aggregated after late messages stopped arriving; it is then skipped', null=True)),
+            ],
+            options={
+                'verbose_name': 'Analytics Day',
+                'verbose_name_plural': 'Analytics Days',
+                'db_table': 'analytics_days',
+                'ordering': ['-date'],
+            },
+        ),
+    ]
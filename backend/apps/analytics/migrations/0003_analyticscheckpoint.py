@@ -0,0 +1,26 @@
+# Generated by Django 5.0.1 on 2026-10-17 01:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_analyticsday'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsCheckpoint',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('position', models.DateTimeField(help_text='Messages stored up to this time are processed')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Analytics Checkpoint',
+                'verbose_name_plural': 'Analytics Checkpoints',
+                'db_table': 'analytics_checkpoints',
+            },
+        ),
+    ]
@@ -53,3 +53,42 @@ class DailyAnalytics(models.Model):
 
     def __str__(self):
         return f"{self.user.email} - {self.get_platform_display()} - {self.date}"
+
+
+class AnalyticsDay(models.Model):
+    """
+    Aggregation state of a day of DailyAnalytics rows, across all users
+    """
+    date = models.DateField(primary_key=True)
+    rows = models.IntegerField(default=0, help_text="DailyAnalytics rows written by the last aggregation")
+    aggregated_at = models.DateTimeField()
+    finalized_at = models.DateTimeField(
+        blank=True, null=True,
+        help_text="Set once the day was aggregated after late messages stopped arriving; it is then skipped"
+    )
+
+    class Meta:
+        db_table = 'analytics_days'
+        verbose_name = 'Analytics Day'
+        verbose_name_plural = 'Analytics Days'
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.date} ({'finalized' if self.finalized_at else 'open'})"
+
+
+class AnalyticsCheckpoint(models.Model):
+    """
+    Model to remember how far an incremental analytics job got
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    position = models.DateTimeField(help_text="Messages stored up to this time are processed")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'analytics_checkpoints'
+        verbose_name = 'Analytics Checkpoint'
+        verbose_name_plural = 'Analytics Checkpoints'
+
+    def __str__(self):
+        return f"{self.name} - {self.position}"
@@ -0,0 +1,218 @@
+"""
+Response time metrics computed from message turns
+"""
+import logging
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.messages.models import Message
+from apps.platforms.models import PlatformAccount
+from .models import AnalyticsCheckpoint, DailyAnalytics
+from .services import AnalyticsService
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = 'response_times'
+
+# Pairs the first customer message of each turn with the first reply after it.
+# LAG marks the rows where a conversation switches between customer and
+# business; the message stored before the scanned range stands in for the
+# first row's LAG. LEAD over those turn starts then gives each customer turn
+# the start of the reply turn.
+TURN_PAIRS_SQL = """
+WITH scanned AS (
+    SELECT m.id, m.user_id, m.conversation_id, m.sent_at, m.is_incoming, a.platform,
+           COALESCE(
+               LAG(m.is_incoming) OVER (PARTITION BY m.conversation_id ORDER BY m.sent_at, m.id),
+               (SELECT p.is_incoming FROM {messages} p
+                WHERE p.conversation_id = m.conversation_id AND p.sent_at < m.sent_at
+                ORDER BY p.sent_at DESC, p.id DESC LIMIT 1)
+           ) AS previous_incoming
+    FROM {messages} m
+    JOIN {accounts} a ON a.id = m.platform_account_id
+    WHERE m.user_id IN ({users}) AND m.sent_at >= %s
+),
+turns AS (
+    SELECT user_id, platform, is_incoming, sent_at,
+           LEAD(sent_at) OVER (PARTITION BY conversation_id ORDER BY sent_at, id) AS reply_at
+    FROM scanned
+    WHERE previous_incoming IS NULL OR previous_incoming <> is_incoming
+)
+SELECT user_id, platform, sent_at, reply_at
+FROM turns
+WHERE is_incoming AND reply_at >= %s
+"""
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Linearly interpolated percentile of sorted values, like PostgreSQL's percentile_cont"""
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+class ResponseTimeService:
+    """
+    Service for the response time columns of DailyAnalytics.
+
+    A response is the time from the first message of a customer turn to the
+    first business message after it, counted on the day of the reply.
+    Each run only revisits the users that got messages stored since the
+    last checkpoint, from the day of their oldest new message on, and
+    rewrites avg_response_time_minutes and metadata['response_time']
+    (replies, p50_minutes and p90_minutes) of those days.
+    """
+
+    @staticmethod
+    def _as_datetime(value) -> datetime:
+        # SQLite returns raw SQL timestamps as text
+        if isinstance(value, str):
+            value = parse_datetime(value)
+        return value if timezone.is_aware(value) else timezone.make_aware(value, dt_timezone.utc)
+
+    @staticmethod
+    def turn_pairs(user_ids: List[Any], since: datetime) -> Iterator[Tuple[Any, str, datetime, datetime]]:
+        """
+        Get (user_id, platform, customer message time, reply time) of the replies sent since a time
+
+        Args:
+            user_ids: Users to scan
+            since: Only replies sent at or after this time are returned
+
+        Returns:
+            Iterator of tuples, one per reply
+        """
+        sql = TURN_PAIRS_SQL.format(
+            messages=Message._meta.db_table,
+            accounts=PlatformAccount._meta.db_table,
+            users=', '.join(['%s'] * len(user_ids)),
+        )
+        # Replies to turns that started before the scan are slower than the limit anyway
+        scan_start = since - timedelta(hours=settings.ANALYTICS_RESPONSE_MAX_HOURS)
+        user_field = Message._meta.get_field('user').target_field
+        params = [
+            *(user_field.get_db_prep_value(user_id, connection) for user_id in user_ids),
+            connection.ops.adapt_datetimefield_value(scan_start),
+            connection.ops.adapt_datetimefield_value(since),
+        ]
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            for user_id, platform, sent_at, reply_at in cursor:
+                yield user_id, platform, ResponseTimeService._as_datetime(sent_at), \
+                    ResponseTimeService._as_datetime(reply_at)
+
+    @staticmethod
+    def summarize(minutes: List[float]) -> Tuple[float, Dict[str, Any]]:
+        """
+        Get the mean and the metadata entry of a group of response times
+
+        Args:
+            minutes: Response times in minutes
+
+        Returns:
+            Tuple of (mean, {'replies', 'p50_minutes', 'p90_minutes'})
+        """
+        minutes = sorted(minutes)
+        return sum(minutes) / len(minutes), {
+            'replies': len(minutes),
+            'p50_minutes': round(percentile(minutes, 0.5), 2),
+            'p90_minutes': round(percentile(minutes, 0.9), 2),
+        }
+
+    @staticmethod
+    def update_users(user_ids: List[Any], since_day: date) -> int:
+        """
+        Recompute the response times of users from a day on
+
+        Args:
+            user_ids: Users to recompute
+            since_day: First day to recompute
+
+        Returns:
+            Number of DailyAnalytics rows with response times written
+        """
+        since, _ = AnalyticsService.day_bounds(since_day)
+        limit = settings.ANALYTICS_RESPONSE_MAX_HOURS * 60
+
+        groups = {}
+        for user_id, platform, sent_at, reply_at in ResponseTimeService.turn_pairs(user_ids, since):
+            minutes = (reply_at - sent_at).total_seconds() / 60
+            if minutes > limit:
+                continue
+            day = timezone.localdate(reply_at)
+            groups.setdefault((user_id, platform, day), []).append(minutes)
+            groups.setdefault((user_id, 'all', day), []).append(minutes)
+
+        rows = []
+        for (user_id, platform, day), minutes in groups.items():
+            mean, summary = ResponseTimeService.summarize(minutes)
+            rows.append(DailyAnalytics(
+                user_id=user_id,
+                platform=platform,
+                date=day,
+                avg_response_time_minutes=round(mean, 2),
+                metadata={'response_time': summary},
+            ))
+
+        with transaction.atomic():
+            # Days that no longer have replies lose their old figures; metadata only holds these
+            DailyAnalytics.objects.filter(user_id__in=user_ids, date__gte=since_day).exclude(
+                avg_response_time_minutes__isnull=True
+            ).update(avg_response_time_minutes=None, metadata={}, updated_at=timezone.now())
+            DailyAnalytics.objects.bulk_create(
+                rows,
+                batch_size=settings.ANALYTICS_UPSERT_BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=['user', 'platform', 'date'],
+                update_fields=['avg_response_time_minutes', 'metadata', 'updated_at'],
+            )
+        return len(rows)
+
+    @staticmethod
+    def update(since: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Recompute response times for the messages stored since the checkpoint
+
+        Args:
+            since: Process messages stored after this time instead of the
+                   checkpoint; the first run starts ANALYTICS_AGGREGATION_DAYS ago
+
+        Returns:
+            Dict of users and rows updated
+        """
+        # Leave messages being stored right now to the next run
+        until = timezone.now() - timedelta(seconds=settings.ANALYTICS_RESPONSE_TIME_LAG)
+        if since is None:
+            checkpoint = AnalyticsCheckpoint.objects.filter(name=CHECKPOINT_NAME).first()
+            since = checkpoint.position if checkpoint else \
+                until - timedelta(days=settings.ANALYTICS_AGGREGATION_DAYS)
+
+        # Users with new messages, and the day their oldest new message was sent
+        changed = (
+            Message.objects.filter(created_at__gt=since, created_at__lte=until)
+            .values('user_id')
+            .annotate(oldest=Min('sent_at'))
+            .order_by()
+        )
+        by_day = {}
+        for item in changed:
+            by_day.setdefault(timezone.localdate(item['oldest']), []).append(item['user_id'])
+
+        users = rows = 0
+        batch_size = settings.ANALYTICS_RESPONSE_TIME_BATCH_SIZE
+        for since_day, user_ids in sorted(by_day.items()):
+            for start in range(0, len(user_ids), batch_size):
+                batch = user_ids[start:start + batch_size]
+                rows += ResponseTimeService.update_users(batch, since_day)
+                users += len(batch)
+
+        AnalyticsCheckpoint.objects.update_or_create(name=CHECKPOINT_NAME, defaults={'position': until})
+        logger.info(f'Updated response times of {users} users ({rows} rows)')
+        return {'users': users, 'rows': rows}
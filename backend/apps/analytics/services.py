@@ -0,0 +1,347 @@
+"""
+Analytics aggregation services
+"""
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, Tuple
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import CharField, Count, F, Q, Value
+from django.utils import timezone
+
+from apps.messages.models import Conversation, Message
+from apps.platforms.models import PlatformAccount
+from .cache import platform_stats_cache
+from .models import AnalyticsDay, DailyAnalytics
+
+logger = logging.getLogger(__name__)
+
+# Columns recomputed from messages; metadata and response times are left alone
+AGGREGATED_FIELDS = [
+    'total_messages',
+    'incoming_messages',
+    'outgoing_messages',
+    'total_conversations',
+    'new_conversations',
+    'updated_at',
+]
+
+
+class AnalyticsService:
+    """
+    Service for keeping DailyAnalytics rows up to date
+
+    Message and conversation inserts bump the counters of their day as they
+    happen; the hourly task recounts closed days from the messages.
+    """
+
+    @staticmethod
+    def day_bounds(target_date: date) -> Tuple[datetime, datetime]:
+        """Start and end of a day in the configured time zone, for range filters that can use an index"""
+        start = timezone.make_aware(datetime.combine(target_date, time.min))
+        return start, start + timedelta(days=1)
+
+    @staticmethod
+    def _per_platform_and_all(queryset, **aggregates):
+        """
+        Aggregate a queryset per (user, platform) and per user as platform 'all'
+
+        Both groupings go to the database as one UNION ALL statement, so the
+        'all' figures are counted rather than summed from the platform rows.
+        """
+        by_platform = (
+            queryset.values('user_id', platform=F('platform_account__platform'))
+            .annotate(**aggregates)
+            # The default ordering would otherwise be added to the GROUP BY
+            .order_by()
+        )
+        by_user = (
+            queryset.values('user_id', platform=Value('all', output_field=CharField()))
+            .annotate(**aggregates)
+            .order_by()
+        )
+        return by_platform.union(by_user, all=True)
+
+    @staticmethod
+    def count_day(target_date: date) -> List[Dict[str, Any]]:
+        """
+        Count a day's messages and new conversations for all users and platforms
+
+        Each is one query across all users, grouped by user and platform and
+        by user alone for the 'all' rows.
+
+        Args:
+            target_date: Day to count
+
+        Returns:
+            List of dicts with user_id, platform, total, incoming, outgoing,
+            conversations and new_conversations, one per user and platform
+            (including 'all') with messages or new conversations
+        """
+        start, end = AnalyticsService.day_bounds(target_date)
+        counts = {
+            (item['user_id'], item['platform']): {**item, 'new_conversations': 0}
+            for item in AnalyticsService._per_platform_and_all(
+                Message.objects.filter(sent_at__gte=start, sent_at__lt=end),
+                total=Count('id'),
+                incoming=Count('id', filter=Q(is_incoming=True)),
+                outgoing=Count('id', filter=Q(is_incoming=False)),
+                conversations=Count('conversation_id', distinct=True),
+            )
+        }
+
+        new_conversations = AnalyticsService._per_platform_and_all(
+            Conversation.objects.filter(created_at__gte=start, created_at__lt=end),
+            new_conversations=Count('id'),
+        )
+        for item in new_conversations:
+            counts.setdefault((item['user_id'], item['platform']), {
+                'user_id': item['user_id'],
+                'platform': item['platform'],
+                'total': 0,
+                'incoming': 0,
+                'outgoing': 0,
+                'conversations': 0,
+            })['new_conversations'] = item['new_conversations']
+
+        return list(counts.values())
+
+    @staticmethod
+    def build_rows(target_date: date, counts: List[Dict[str, Any]]) -> List[DailyAnalytics]:
+        """
+        Turn counts into DailyAnalytics rows
+
+        Args:
+            target_date: Day the counts are for
+            counts: Result of count_day()
+
+        Returns:
+            Unsaved DailyAnalytics instances
+        """
+        return [
+            DailyAnalytics(
+                user_id=item['user_id'],
+                platform=item['platform'],
+                date=target_date,
+                total_messages=item['total'],
+                incoming_messages=item['incoming'],
+                outgoing_messages=item['outgoing'],
+                total_conversations=item['conversations'],
+                new_conversations=item['new_conversations'],
+            )
+            for item in counts
+        ]
+
+    @staticmethod
+    def platform_stats(user_id) -> Dict[str, Dict[str, int]]:
+        """
+        Get a user's conversation, message and unread counts per platform
+
+        One query grouped by platform, however many accounts the user has
+        connected, cached for ANALYTICS_STATS_CACHE_TTL seconds.
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            Dict of platform -> {'conversations', 'messages', 'unread'} for
+            each platform the user has an account on
+        """
+        stats = platform_stats_cache.get(user_id)
+        if stats is not None:
+            return stats
+
+        stats = {
+            item['platform']: {
+                'conversations': item['conversation_count'],
+                'messages': item['message_count'],
+                'unread': item['unread_count'],
+            }
+            for item in PlatformAccount.objects.filter(user_id=user_id)
+            .values('platform')
+            # Named apart from the relations they count, which they would shadow
+            .annotate(
+                conversation_count=Count('conversations', distinct=True),
+                message_count=Count('conversations__messages'),
+                unread_count=Count('conversations__messages', filter=Q(
+                    conversations__messages__is_incoming=True,
+                    conversations__messages__is_read=False,
+                )),
+            )
+            .order_by()
+        }
+        platform_stats_cache.set(user_id, stats)
+        return stats
+
+    @staticmethod
+    def invalidate_platform_stats(user_ids: Iterable[Any]):
+        """Drop the cached platform totals of users once the current transaction commits"""
+        user_ids = set(user_ids)
+        transaction.on_commit(lambda: platform_stats_cache.invalidate(user_ids))
+
+    @staticmethod
+    def record_messages(platform: str, messages: Iterable[Message]):
+        """
+        Add newly stored messages to the counters of their day
+
+        Called in the transaction that inserts the messages, so dashboards
+        see them at once. Closed days are recounted from messages by
+        aggregate_day() until they are finalized.
+
+        Args:
+            platform: Platform of the messages' account
+            messages: Message instances that were just inserted
+        """
+        increments = AnalyticsService._message_increments(platform, messages, 1)
+        AnalyticsService._increment(increments)
+        AnalyticsService.invalidate_platform_stats(user_id for user_id, _, _ in increments)
+
+    @staticmethod
+    def unrecord_messages(platform: str, messages: Iterable[Message]):
+        """
+        Take deleted messages back out of the counters of their day
+
+        Called in the transaction that deletes messages counted by
+        record_messages(), such as the webhook echo of a queued send.
+
+        Args:
+            platform: Platform of the messages' account
+            messages: Message instances being deleted
+        """
+        increments = AnalyticsService._message_increments(platform, messages, -1)
+        AnalyticsService._increment(increments)
+        AnalyticsService.invalidate_platform_stats(user_id for user_id, _, _ in increments)
+
+    @staticmethod
+    def _message_increments(
+        platform: str,
+        messages: Iterable[Message],
+        step: int
+    ) -> Dict[Tuple[Any, str, date], Dict[str, int]]:
+        increments = {}
+        for message in messages:
+            day = timezone.localdate(message.sent_at)
+            field = 'incoming_messages' if message.is_incoming else 'outgoing_messages'
+            for key in ((message.user_id, platform, day), (message.user_id, 'all', day)):
+                counts = increments.setdefault(key, {'total_messages': 0, 'incoming_messages': 0, 'outgoing_messages': 0})
+                counts['total_messages'] += step
+                counts[field] += step
+        return increments
+
+    @staticmethod
+    def record_conversations(conversations: Iterable[Conversation]):
+        """
+        Add newly created conversations to the new_conversations counters of their day
+
+        Args:
+            conversations: Conversation instances that were just inserted,
+                           with platform_account loaded
+        """
+        increments = {}
+        for conversation in conversations:
+            day = timezone.localdate(conversation.created_at)
+            platform = conversation.platform_account.platform
+            for key in ((conversation.user_id, platform, day), (conversation.user_id, 'all', day)):
+                counts = increments.setdefault(key, {'new_conversations': 0})
+                counts['new_conversations'] += 1
+        AnalyticsService._increment(increments)
+        AnalyticsService.invalidate_platform_stats(user_id for user_id, _, _ in increments)
+
+    @staticmethod
+    def _increment(increments: Dict[Tuple[Any, str, date], Dict[str, int]]):
+        """
+        Add to DailyAnalytics counters with one UPDATE per row, creating missing rows
+
+        Rows are updated in key order, so concurrent writers lock them in the
+        same order.
+        """
+        if not increments:
+            return
+
+        now = timezone.now()
+        keys = sorted(increments, key=lambda key: (str(key[0]), key[1], key[2]))
+
+        def update(key):
+            user_id, platform, day = key
+            return DailyAnalytics.objects.filter(user_id=user_id, platform=platform, date=day).update(
+                updated_at=now,
+                **{field: F(field) + count for field, count in increments[key].items()}
+            )
+
+        try:
+            with transaction.atomic():
+                missing = [key for key in keys if not update(key)]
+                # A missing row has nothing to take away; the recount fixes its day
+                missing = [key for key in missing if all(count > 0 for count in increments[key].values())]
+                if missing:
+                    # Rows created concurrently are skipped, then updated like the others
+                    DailyAnalytics.objects.bulk_create([
+                        DailyAnalytics(user_id=user_id, platform=platform, date=day)
+                        for user_id, platform, day in missing
+                    ], ignore_conflicts=True)
+                    for key in missing:
+                        update(key)
+        except DatabaseError as e:
+            # Counters are recounted for closed days; never fail the message write over them
+            logger.error(f'Error updating analytics counters: {e}')
+
+    @staticmethod
+    def aggregate_day(target_date: date, finalize: bool = False) -> int:
+        """
+        Recompute the DailyAnalytics rows of a day for all users
+
+        Args:
+            target_date: Day to aggregate
+            finalize: Mark the day as finalized, so later runs skip it
+
+        Returns:
+            Number of rows written
+        """
+        rows = AnalyticsService.build_rows(target_date, AnalyticsService.count_day(target_date))
+        now = timezone.now()
+
+        with transaction.atomic():
+            DailyAnalytics.objects.bulk_create(
+                rows,
+                batch_size=settings.ANALYTICS_UPSERT_BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=['user', 'platform', 'date'],
+                update_fields=AGGREGATED_FIELDS,
+            )
+            AnalyticsDay.objects.update_or_create(
+                date=target_date,
+                defaults={
+                    'rows': len(rows),
+                    'aggregated_at': now,
+                    'finalized_at': now if finalize else None,
+                }
+            )
+
+        logger.debug(f'Aggregated {len(rows)} analytics rows for {target_date}')
+        return len(rows)
+
+    @staticmethod
+    def pending_days() -> List[Tuple[date, bool]]:
+        """
+        Get the closed days that still need aggregating
+
+        The last ANALYTICS_AGGREGATION_DAYS closed days are aggregated until
+        one run happens ANALYTICS_FINALIZE_AFTER_HOURS after the day ended,
+        so messages stored late by a sync are still counted.
+
+        Returns:
+            List of (day, whether this run finalizes it), oldest first
+        """
+        today = timezone.localdate()
+        days = [today - timedelta(days=offset) for offset in range(settings.ANALYTICS_AGGREGATION_DAYS, 0, -1)]
+        finalized = set(
+            AnalyticsDay.objects.filter(date__in=days, finalized_at__isnull=False).values_list('date', flat=True)
+        )
+
+        now = timezone.now()
+        grace = timedelta(hours=settings.ANALYTICS_FINALIZE_AFTER_HOURS)
+        return [
+            (day, now >= AnalyticsService.day_bounds(day)[1] + grace)
+            for day in days
+            if day not in finalized
+        ]
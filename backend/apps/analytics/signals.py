@@ -0,0 +1,17 @@
+"""
+Analytics signal handlers
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.messages.models import Conversation
+from apps.platforms.models import PlatformAccount
+from .cache import platform_stats_cache
+
+
+@receiver(post_save, sender=PlatformAccount)
+@receiver(post_delete, sender=PlatformAccount)
+@receiver(post_delete, sender=Conversation)
+def invalidate_platform_stats(sender, instance, **kwargs):
+    """Drop the cached platform totals of the owner of a changed account or removed conversation"""
+    platform_stats_cache.invalidate([instance.user_id])
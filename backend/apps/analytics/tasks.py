@@ -3,13 +3,9 @@ Celery tasks for analytics aggregation
 """
 import logging
 from celery import shared_task
-from django.utils import timezone
-from django.db.models import Count, Q
-from datetime import date, timedelta
 
-from apps.messages.models import Message
-from apps.platforms.models import PlatformAccount
-from .models import DailyAnalytics
+from .response_times import ResponseTimeService
+from .services import AnalyticsService
 
 logger = logging.getLogger(__name__)
 
@@ -17,75 +13,29 @@ logger = logging.getLogger(__name__)
 @shared_task(name='apps.analytics.tasks.aggregate_daily_analytics')
 def aggregate_daily_analytics():
     """
-    Aggregate daily analytics for all users
+    Aggregate daily analytics of closed days for all users
     Runs every hour (configured in settings)
     """
     logger.info('Starting daily analytics aggregation')
 
-    today = date.today()
-    yesterday = today - timedelta(days=1)
-
-    # Get all users who have platform connections
-    users_with_platforms = PlatformAccount.objects.values_list('user_id', flat=True).distinct()
-
     aggregated_count = 0
+    days = []
 
-    for user_id in users_with_platforms:
+    for day, finalize in AnalyticsService.pending_days():
         try:
-            # Aggregate for each platform
-            for platform in ['instagram', 'messenger', 'whatsapp']:
-                aggregate_user_platform_analytics(user_id, platform, yesterday)
-                aggregated_count += 1
-
-            # Aggregate for all platforms combined
-            aggregate_user_platform_analytics(user_id, 'all', yesterday)
-            aggregated_count += 1
-
+            aggregated_count += AnalyticsService.aggregate_day(day, finalize=finalize)
+            days.append(str(day))
         except Exception as e:
-            logger.error(f'Error aggregating analytics for user {user_id}: {e}')
+            logger.error(f'Error aggregating analytics for {day}: {e}')
 
     logger.info(f'Aggregated analytics for {aggregated_count} user-platform combinations')
-    return {'aggregated': aggregated_count}
+    return {'aggregated': aggregated_count, 'days': days}
 
 
-def aggregate_user_platform_analytics(user_id, platform, target_date):
+@shared_task(name='apps.analytics.tasks.update_response_times')
+def update_response_times():
     """
-    Aggregate analytics for a specific user and platform on a specific date
+    Recompute response times of the users with messages stored since the last run
+    Runs every 10 minutes (configured in settings)
     """
-    # Get platform accounts for this user and platform
-    if platform == 'all':
-        platform_accounts = PlatformAccount.objects.filter(user_id=user_id)
-    else:
-        platform_accounts = PlatformAccount.objects.filter(user_id=user_id, platform=platform)
-
-    if not platform_accounts.exists():
-        return
-
-    # Get messages for this date
-    messages = Message.objects.filter(
-        platform_account__in=platform_accounts,
-        sent_at__date=target_date
-    )
-
-    # Calculate statistics
-    total_messages = messages.count()
-    incoming_messages = messages.filter(is_incoming=True).count()
-    outgoing_messages = messages.filter(is_incoming=False).count()
-
-    # Get conversation count
-    total_conversations = messages.values('conversation_id').distinct().count()
-
-    # Update or create analytics record
-    DailyAnalytics.objects.update_or_create(
-        user_id=user_id,
-        platform=platform,
-        date=target_date,
-        defaults={
-            'total_messages': total_messages,
-            'incoming_messages': incoming_messages,
-            'outgoing_messages': outgoing_messages,
-            'total_conversations': total_conversations,
-        }
-    )
-
-    logger.debug(f'Aggregated analytics for user {user_id}, platform {platform}, date {target_date}')
+    return ResponseTimeService.update()
@@ -2,12 +2,10 @@ from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Count
-from django.db.models.functions import TruncDate
 from django.utils import timezone
 from datetime import timedelta
-from apps.messages.models import Message, Conversation
-from apps.platforms.models import PlatformAccount
+from .models import DailyAnalytics
+from .services import AnalyticsService
 
 
 class AnalyticsViewSet(viewsets.ViewSet):
@@ -19,40 +17,16 @@ class AnalyticsViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'], url_path='stats/messages')
     def message_stats(self, request):
         """Get message statistics"""
-        user = request.user
-
-        # Get all user's platform accounts
-        platform_accounts = PlatformAccount.objects.filter(user=user)
-
-        # Get all conversations for user
-        conversations = Conversation.objects.filter(platform_account__in=platform_accounts)
-
-        # Get all messages for user
-        messages = Message.objects.filter(platform_account__in=platform_accounts)
-
-        # Calculate statistics
-        total_messages = messages.count()
-        unread_messages = messages.filter(is_incoming=True, is_read=False).count()
-        total_conversations = conversations.count()
-
-        # Platform breakdown
-        platform_breakdown = {}
-        for account in platform_accounts:
-            platform = account.platform.lower()
-            if platform not in platform_breakdown:
-                platform_breakdown[platform] = 0
-            platform_breakdown[platform] += Conversation.objects.filter(
-                platform_account=account
-            ).count()
+        # One query grouped by platform, cached briefly
+        stats = AnalyticsService.platform_stats(request.user.id)
 
         return Response({
-            'total_messages': total_messages,
-            'unread_messages': unread_messages,
-            'total_conversations': total_conversations,
+            'total_messages': sum(counts['messages'] for counts in stats.values()),
+            'unread_messages': sum(counts['unread'] for counts in stats.values()),
+            'total_conversations': sum(counts['conversations'] for counts in stats.values()),
             'platform_breakdown': {
-                'instagram': platform_breakdown.get('instagram', 0),
-                'messenger': platform_breakdown.get('messenger', 0),
-                'whatsapp': platform_breakdown.get('whatsapp', 0),
+                platform: stats.get(platform, {}).get('conversations', 0)
+                for platform in ('instagram', 'messenger', 'whatsapp')
             }
         })
 
@@ -62,48 +36,34 @@ class AnalyticsViewSet(viewsets.ViewSet):
         user = request.user
         days = int(request.query_params.get('days', 7))
 
-        # Get user's platform accounts
-        platform_accounts = PlatformAccount.objects.filter(user=user)
-
         # Calculate date range
-        end_date = timezone.now().date()
+        end_date = timezone.localdate()
         start_date = end_date - timedelta(days=days - 1)
 
-        # Get daily message counts
-        daily_messages = Message.objects.filter(
-            platform_account__in=platform_accounts,
-            sent_at__date__gte=start_date,
-            sent_at__date__lte=end_date
-        ).annotate(
-            date=TruncDate('sent_at')
-        ).values('date').annotate(
-            message_count=Count('id')
-        ).order_by('date')
-
-        # Get daily conversation counts (new conversations)
-        daily_conversations = Conversation.objects.filter(
-            platform_account__in=platform_accounts,
-            created_at__date__gte=start_date,
-            created_at__date__lte=end_date
-        ).annotate(
-            date=TruncDate('created_at')
-        ).values('date').annotate(
-            conversation_count=Count('id')
-        ).order_by('date')
+        # One pre-aggregated row per day, kept current as messages are stored
+        daily_rows = DailyAnalytics.objects.filter(
+            user=user,
+            platform='all',
+            date__gte=start_date,
+            date__lte=end_date
+        ).values_list('date', 'total_messages', 'new_conversations')
 
         # Create a dict for easy lookup
-        messages_by_date = {str(item['date']): item['message_count'] for item in daily_messages}
-        conversations_by_date = {str(item['date']): item['conversation_count'] for item in daily_conversations}
+        rows_by_date = {
+            str(day): (message_count, conversation_count)
+            for day, message_count, conversation_count in daily_rows
+        }
 
         # Build result for all days in range
         result = []
         current_date = start_date
         while current_date <= end_date:
             date_str = str(current_date)
+            message_count, conversation_count = rows_by_date.get(date_str, (0, 0))
             result.append({
                 'date': date_str,
-                'message_count': messages_by_date.get(date_str, 0),
-                'conversation_count': conversations_by_date.get(date_str, 0)
+                'message_count': message_count,
+                'conversation_count': conversation_count
             })
             current_date += timedelta(days=1)
 
@@ -112,30 +72,7 @@ class AnalyticsViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'])
     def platform(self, request):
         """Get platform breakdown"""
-        user = request.user
-
-        platform_accounts = PlatformAccount.objects.filter(user=user)
-
-        breakdown = {}
-        for account in platform_accounts:
-            platform = account.platform.lower()
-            if platform not in breakdown:
-                breakdown[platform] = {
-                    'conversations': 0,
-                    'messages': 0,
-                    'unread': 0
-                }
-
-            conversations = Conversation.objects.filter(platform_account=account)
-            messages = Message.objects.filter(platform_account=account)
-
-            breakdown[platform]['conversations'] += conversations.count()
-            breakdown[platform]['messages'] += messages.count()
-            breakdown[platform]['unread'] += messages.filter(
-                is_incoming=True, is_read=False
-            ).count()
-
-        return Response(breakdown)
+        return Response(AnalyticsService.platform_stats(request.user.id))
 
     @action(detail=False, methods=['get'])
     def export(self, request):
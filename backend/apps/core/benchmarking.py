@@ -0,0 +1,146 @@
+"""
+Seeding and cleanup helpers for the benchmark and check management commands
+"""
+import uuid
+from contextlib import contextmanager
+from typing import Iterable, List, Optional, Sequence, Tuple
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.accounts.models import User
+from apps.messages.models import Conversation, Message
+from apps.platforms import encryption
+from apps.platforms.models import PlatformAccount
+
+PLATFORMS = ['instagram', 'messenger', 'whatsapp']
+BATCH_SIZE = 2000
+
+
+@contextmanager
+def rolled_back():
+    """Run the block in a transaction that is always rolled back, so seeded rows never persist"""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def analyze(*models):
+    """
+    Refresh the PostgreSQL planner statistics after seeding, as autovacuum
+    would on a live database. Does nothing on other databases.
+
+    Args:
+        models: Models whose tables to analyze, every table if omitted
+    """
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        if not models:
+            cursor.execute('ANALYZE')
+        for model in models:
+            cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+
+def seed_users(prefix: str, count: int = 1) -> List[User]:
+    """
+    Create users with unique emails, so repeated or concurrent runs never collide
+
+    Args:
+        prefix: Start of each email and username
+        count: Number of users
+    """
+    suffix = uuid.uuid4().hex[:8]
+    return User.objects.bulk_create([
+        User(email=f'{prefix}-{suffix}-{n}@example.com', username=f'{prefix}-{suffix}-{n}')
+        for n in range(count)
+    ], batch_size=BATCH_SIZE)
+
+
+@contextmanager
+def committed_users(prefix: str, count: int = 1):
+    """
+    Yield users created outside any transaction, for runs that need committed
+    rows (threads, worker processes, on_commit hooks), and delete them with
+    everything they own on exit
+    """
+    users = seed_users(prefix, count)
+    try:
+        yield users
+    finally:
+        # Messages first: the user cascade would otherwise collect them row by row
+        Message.objects.filter(user__in=users).delete()
+        User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+
+def seed_accounts(prefix: str, owners: Iterable[Tuple[User, str]]) -> List[PlatformAccount]:
+    """
+    Create one platform account per (user, platform) pair
+
+    bulk_create skips PlatformAccount.save(), so the shared token is encrypted here.
+    """
+    suffix = uuid.uuid4().hex[:8]
+    access_token = encryption.encrypt_token('benchmark-token')
+    return PlatformAccount.objects.bulk_create([
+        PlatformAccount(
+            user=user,
+            platform=platform,
+            platform_user_id=f'page_{prefix}_{suffix}_{n}',
+            access_token=access_token,
+        )
+        for n, (user, platform) in enumerate(owners)
+    ], batch_size=BATCH_SIZE)
+
+
+def seed_account(prefix: str, platform: str = 'messenger', user: Optional[User] = None) -> PlatformAccount:
+    """Create one platform account, and a user for it unless one is given"""
+    return seed_accounts(prefix, [(user or seed_users(prefix)[0], platform)])[0]
+
+
+def seed_conversations(accounts: Sequence[PlatformAccount], count: int, **fields) -> List[Conversation]:
+    """
+    Create count conversations per account, with customers psid_0, psid_1, ...
+
+    Args:
+        accounts: Accounts to add conversations to
+        count: Conversations per account
+        fields: Field values; callables are called with the conversation's index in its account
+    """
+    now = timezone.now()
+    conversations = []
+    for account in accounts:
+        for c in range(count):
+            values = {
+                'platform_conversation_id': f't_{account.pk.hex}_{c}',
+                'participant_id': f'psid_{c}',
+                'participant_name': f'Customer {c}',
+                'last_message_at': now,
+            }
+            values.update({name: value(c) if callable(value) else value for name, value in fields.items()})
+            conversations.append(Conversation(platform_account=account, user_id=account.user_id, **values))
+    return Conversation.objects.bulk_create(conversations, batch_size=BATCH_SIZE)
+
+
+def build_message(conversation: Conversation, platform_message_id: Optional[str] = None, **fields) -> Message:
+    """
+    An unsaved incoming message from the conversation's customer, sent now
+
+    Args:
+        conversation: Conversation the message belongs to
+        platform_message_id: Platform ID, a random unique one if omitted
+        fields: Other field values, overriding the defaults
+    """
+    values = {
+        'content': 'Message',
+        'sender_id': conversation.participant_id,
+        'sender_name': conversation.participant_name,
+        'is_incoming': True,
+        'sent_at': timezone.now(),
+    }
+    values.update(fields)
+    return Message(
+        conversation=conversation,
+        platform_account_id=conversation.platform_account_id,
+        user_id=conversation.user_id,
+        platform_message_id=platform_message_id or f'm_{uuid.uuid4().hex}',
+        **values,
+    )
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Conversation, Message
+from .models import Conversation, Message, SyncCheckpoint
 
 
 @admin.register(Conversation)
@@ -18,3 +18,12 @@ class MessageAdmin(admin.ModelAdmin):
     search_fields = ['content', 'sender_name', 'platform_message_id']
     readonly_fields = ['id', 'created_at', 'updated_at', 'received_at']
     ordering = ['-sent_at']
+
+
+@admin.register(SyncCheckpoint)
+class SyncCheckpointAdmin(admin.ModelAdmin):
+    list_display = ['platform_account', 'platform_conversation_id', 'updated_time', 'newest_message_at', 'updated_at']
+    list_filter = ['platform_account__platform']
+    search_fields = ['platform_conversation_id']
+    readonly_fields = ['id', 'created_at', 'updated_at']
+    ordering = ['-updated_at']
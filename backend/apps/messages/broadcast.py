@@ -0,0 +1,110 @@
+"""
+Coalesced WebSocket fan-out of new messages
+"""
+import atexit
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, List
+from django.conf import settings
+
+from .stream import event_stream
+
+logger = logging.getLogger(__name__)
+
+
+class MessageBroadcaster:
+    """
+    Buffer new-message events per user and send them with one channel layer
+    call per user instead of one per message.
+
+    Inside `collect()` (a webhook payload, a sync run) events are held until
+    the block exits. Outside of it they are held for WEBSOCKET_BATCH_WINDOW
+    seconds, so a burst of webhook tasks on one worker shares the sends.
+    A user receiving a single message still gets a `new_message` event;
+    several messages arrive as one `messages_batch` event holding up to
+    WEBSOCKET_BATCH_MAX_MESSAGES of them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(list)
+        self._timer = None
+        self._scopes = threading.local()
+
+    @contextmanager
+    def collect(self):
+        """Hold the events added in this thread until the outermost block exits"""
+        stack = self._scopes.__dict__.setdefault('stack', [])
+        stack.append(defaultdict(list))
+        try:
+            yield
+        finally:
+            collected = stack.pop()
+            if stack:
+                for user_id, payloads in collected.items():
+                    stack[-1][user_id].extend(payloads)
+            else:
+                self.send(collected)
+
+    def add(self, user_id, payload: Dict[str, Any]):
+        """
+        Queue a new-message event for a user
+
+        Args:
+            user_id: Owner of the message
+            payload: Message data as sent to the client
+        """
+        stack = getattr(self._scopes, 'stack', None)
+        if stack:
+            stack[-1][str(user_id)].append(payload)
+            return
+
+        window = settings.WEBSOCKET_BATCH_WINDOW
+        if window <= 0:
+            self.send({str(user_id): [payload]})
+            return
+
+        with self._lock:
+            self._pending[str(user_id)].append(payload)
+            if self._timer is None:
+                self._timer = threading.Timer(window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Send the events held by the time window"""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(list)
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not pending:
+            return
+        try:
+            self.send(pending)
+        except Exception as e:
+            # Runs in the timer thread, where an exception would vanish with the events
+            logger.error(f'Error sending {sum(map(len, pending.values()))} buffered message events: {e}')
+
+    def send(self, groups: Dict[str, List[Dict[str, Any]]]):
+        """
+        Send buffered events, one group_send per user and batch
+
+        Args:
+            groups: Dict of user_id -> list of message payloads
+        """
+        events = []
+        size = settings.WEBSOCKET_BATCH_MAX_MESSAGES
+        for user_id, payloads in groups.items():
+            if len(payloads) == 1:
+                events.append((user_id, {'type': 'new_message', 'message': payloads[0]}))
+                continue
+            for i in range(0, len(payloads), size):
+                events.append((user_id, {'type': 'messages_batch', 'messages': payloads[i:i + size]}))
+        event_stream.publish(events)
+
+
+message_broadcaster = MessageBroadcaster()
+atexit.register(message_broadcaster.flush)
@@ -2,13 +2,21 @@
 WebSocket consumers for real-time message updates
 """
 import json
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 
+from .stream import event_stream, parse_event_id
+
 
 class MessageConsumer(AsyncWebsocketConsumer):
     """
     WebSocket consumer for real-time message updates
+
+    Events carry the `event_id` of the user's event stream. A client
+    reconnecting with `?since=<event_id>` first receives the events it
+    missed, or a `resync` event when they can no longer be replayed.
     """
 
     async def connect(self):
@@ -31,12 +39,32 @@ class MessageConsumer(AsyncWebsocketConsumer):
 
         await self.accept()
 
+        # Live events queue up on the channel until the replay is sent
+        query_params = parse_qs(self.scope.get('query_string', b'').decode())
+        since = query_params.get('since', [None])[0]
+        self.replayed_until = parse_event_id(since)
+        head, missed = await sync_to_async(event_stream.replay)(self.user.id, since)
+
         # Send connection success message
         await self.send(text_data=json.dumps({
             'type': 'connection_established',
-            'message': 'Connected to message updates'
+            'message': 'Connected to message updates',
+            'event_id': head
         }))
 
+        if since is None:
+            return
+        if missed is None:
+            self.replayed_until = None
+            await self.send(text_data=json.dumps({'type': 'resync'}))
+            return
+        for event in missed:
+            handler = getattr(self, event['type'], None)
+            if handler:
+                await handler(event)
+        if missed:
+            self.replayed_until = parse_event_id(missed[-1]['event_id'])
+
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection"""
         # Leave room group
@@ -63,13 +91,30 @@ class MessageConsumer(AsyncWebsocketConsumer):
                 'message': 'Invalid JSON'
             }))
 
+    async def send_event(self, data, event):
+        """Send an event with its stream ID, skipping those the client already has"""
+        event_id = parse_event_id(event.get('event_id'))
+        if event_id:
+            if self.replayed_until and event_id <= self.replayed_until:
+                return
+            data['event_id'] = event['event_id']
+        await self.send(text_data=json.dumps(data))
+
     # Handler for new message events
     async def new_message(self, event):
         """Send new message to WebSocket"""
-        await self.send(text_data=json.dumps({
+        await self.send_event({
             'type': 'new_message',
             'message': event['message']
-        }))
+        }, event)
+
+    # Handler for coalesced new message events
+    async def messages_batch(self, event):
+        """Send several new messages to WebSocket in one frame"""
+        await self.send_event({
+            'type': 'messages_batch',
+            'messages': event['messages']
+        }, event)
 
     # Handler for message read events
     async def message_read(self, event):
@@ -79,6 +124,22 @@ class MessageConsumer(AsyncWebsocketConsumer):
             'message_id': event['message_id']
         }))
 
+    # Handler for outbound message status events
+    async def message_status(self, event):
+        """Send outbound message delivery status to WebSocket"""
+        await self.send_event({
+            'type': 'message_status',
+            'message': event['message']
+        }, event)
+
+    # Handler for batched delivery/read receipts
+    async def message_receipts(self, event):
+        """Send delivery and read receipts of outbound messages to WebSocket"""
+        await self.send_event({
+            'type': 'message_receipts',
+            'receipts': event['receipts']
+        }, event)
+
     # Handler for sync events
     async def sync_update(self, event):
         """Send sync update to WebSocket"""
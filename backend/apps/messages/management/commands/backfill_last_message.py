@@ -0,0 +1,38 @@
+"""
+Fill the last-message snapshot of existing conversations
+"""
+from django.core.management.base import BaseCommand
+
+from apps.messages.models import Conversation
+from apps.messages.services import MessageService
+
+
+class Command(BaseCommand):
+    help = (
+        'Set the last-message snapshot of every conversation from its newest stored message. '
+        'Run once after migrating; safe to re-run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--missing-only', action='store_true',
+            help='Only fill conversations that have no snapshot yet'
+        )
+
+    def handle(self, *args, **options):
+        queryset = Conversation.objects.order_by('pk')
+        if options['missing_only']:
+            queryset = queryset.filter(last_message_id__isnull=True)
+
+        updated = 0
+        batch = []
+        for pk in queryset.values_list('pk', flat=True).iterator():
+            batch.append(pk)
+            if len(batch) >= options['batch_size']:
+                updated += MessageService.refresh_last_message(batch)
+                batch = []
+
+        if batch:
+            updated += MessageService.refresh_last_message(batch)
+        self.stdout.write(f'Refreshed the last-message snapshot of {updated} conversations')
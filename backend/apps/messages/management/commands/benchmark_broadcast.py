@@ -0,0 +1,132 @@
+"""
+Count Redis commands and round trips spent on new-message WebSocket fan-out
+"""
+import random
+import time
+import uuid
+from unittest.mock import patch
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.utils import timezone
+from redis.asyncio.connection import AbstractConnection as AsyncConnection
+from redis.connection import AbstractConnection
+
+from apps.messages.broadcast import message_broadcaster
+
+
+class Command(BaseCommand):
+    help = (
+        'Broadcast new-message events for a burst of messages through the Redis channel layer, one '
+        'group_send per message (previous behaviour) and through the coalescing broadcaster, and '
+        'report Redis commands and round trips per 1k messages, event stream writes included. Needs the '
+        'Redis behind CHANNEL_LAYERS and CACHES.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--connections', type=int, default=2, help='Open WebSocket channels per user')
+
+    def handle(self, *args, **options):
+        layers = {'default': {**settings.CHANNEL_LAYERS['default']}}
+        layers['default']['CONFIG'] = {**layers['default'].get('CONFIG', {}), 'prefix': 'benchmark-broadcast'}
+
+        with override_settings(CHANNEL_LAYERS=layers):
+            channel_layer = get_channel_layer()
+            users = [str(uuid.uuid4()) for _ in range(options['users'])]
+            channels = [
+                (f'messages_{user_id}', f'benchmark-broadcast.{user_id}.{i}')
+                for user_id in users for i in range(options['connections'])
+            ]
+            for group, channel in channels:
+                async_to_sync(channel_layer.group_add)(group, channel)
+
+            payloads = [(random.choice(users), self._payload(i)) for i in range(options['messages'])]
+            try:
+                self._run('one group_send per message', len(payloads), lambda: self._per_message(payloads))
+                self._run('coalesced, one webhook batch', len(payloads), lambda: self._collected(payloads))
+                self._run('coalesced, time window', len(payloads), lambda: self._windowed(payloads))
+            finally:
+                for group, channel in channels:
+                    async_to_sync(channel_layer.group_discard)(group, channel)
+
+    def _run(self, name, count, func):
+        # Channel layer traffic goes through redis.asyncio, the event stream through redis
+        counts = {'commands': 0, 'round_trips': 0}
+        pack_command = AbstractConnection.pack_command
+        pack_commands = AbstractConnection.pack_commands
+        send_packed_command = AbstractConnection.send_packed_command
+        async_pack_command = AsyncConnection.pack_command
+        async_send_packed_command = AsyncConnection.send_packed_command
+
+        def counted_pack(connection, *args):
+            counts['commands'] += 1
+            return pack_command(connection, *args)
+
+        def counted_pack_many(connection, commands):
+            commands = list(commands)
+            counts['commands'] += len(commands)
+            return pack_commands(connection, commands)
+
+        def counted_send(connection, *args, **kwargs):
+            counts['round_trips'] += 1
+            return send_packed_command(connection, *args, **kwargs)
+
+        def async_counted_pack(connection, *args):
+            counts['commands'] += 1
+            return async_pack_command(connection, *args)
+
+        async def async_counted_send(connection, *args, **kwargs):
+            counts['round_trips'] += 1
+            return await async_send_packed_command(connection, *args, **kwargs)
+
+        with patch.object(AbstractConnection, 'pack_command', counted_pack), \
+                patch.object(AbstractConnection, 'pack_commands', counted_pack_many), \
+                patch.object(AbstractConnection, 'send_packed_command', counted_send), \
+                patch.object(AsyncConnection, 'pack_command', async_counted_pack), \
+                patch.object(AsyncConnection, 'send_packed_command', async_counted_send):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+
+        per_1k = 1000 / count
+        self.stdout.write(
+            f'{name:>30}: {counts["commands"] * per_1k:7.0f} commands, '
+            f'{counts["round_trips"] * per_1k:7.0f} round trips per 1k messages, {elapsed * 1000:7.1f}ms'
+        )
+
+    def _per_message(self, payloads):
+        # What MessageService._broadcast_message used to do for every stored message
+        channel_layer = get_channel_layer()
+        for user_id, payload in payloads:
+            async_to_sync(channel_layer.group_send)(
+                f'messages_{user_id}', {'type': 'new_message', 'message': payload}
+            )
+
+    def _collected(self, payloads):
+        with message_broadcaster.collect():
+            for user_id, payload in payloads:
+                message_broadcaster.add(user_id, payload)
+
+    def _windowed(self, payloads):
+        for user_id, payload in payloads:
+            message_broadcaster.add(user_id, payload)
+        # Wait for the window to close and its flush to finish
+        timer = message_broadcaster._timer
+        if timer is not None:
+            timer.join()
+
+    def _payload(self, i):
+        return {
+            'id': str(uuid.uuid4()),
+            'conversation_id': str(uuid.uuid4()),
+            'platform': 'Messenger',
+            'sender_name': f'Customer {i % 50}',
+            'content': f'Message {i}',
+            'message_type': 'text',
+            'is_incoming': True,
+            'sent_at': timezone.now().isoformat(),
+        }
@@ -0,0 +1,69 @@
+"""
+Count database queries and wall time of the conversation list endpoint
+"""
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.core.benchmarking import build_message, rolled_back, seed_account, seed_conversations
+from apps.messages.models import Message
+from apps.messages.services import MessageService
+from apps.messages.views import ConversationViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark GET /api/conversations/ at several page sizes and fail if the number of '
+        'queries grows with the page size'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conversations', type=int, default=100)
+        parser.add_argument('--messages', type=int, default=20, help='Messages per conversation')
+        parser.add_argument('--page-sizes', type=int, nargs='+', default=[10, 50, 100])
+
+    def handle(self, *args, **options):
+        counts = set()
+
+        with rolled_back():
+            user = self._populate(options['conversations'], options['messages'])
+            view = ConversationViewSet.as_view({'get': 'list'})
+            factory = APIRequestFactory()
+
+            for page_size in options['page_sizes']:
+                request = factory.get('/api/conversations/', {'page_size': page_size}, HTTP_HOST='localhost')
+                force_authenticate(request, user=user)
+
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    response = view(request)
+                    response.render()
+                    elapsed = (time.perf_counter() - start) * 1000
+
+                counts.add(len(queries.captured_queries))
+                self.stdout.write(
+                    f'page_size={page_size:>4}: {len(queries.captured_queries)} queries, '
+                    f'{elapsed:.1f}ms, {len(response.data["results"])} conversations'
+                )
+
+        if len(counts) > 1:
+            raise CommandError('Query count depends on the page size (N+1 in the conversation list)')
+        self.stdout.write('OK: constant query count')
+
+    def _populate(self, conversation_count, message_count):
+        account = seed_account('list')
+        conversations = seed_conversations([account], conversation_count)
+        Message.objects.bulk_create([
+            build_message(
+                conversation,
+                content=f'Message {j}',
+                sent_at=conversation.last_message_at - timedelta(minutes=j),
+            )
+            for conversation in conversations
+            for j in range(message_count)
+        ])
+        MessageService.refresh_last_message([conversation.pk for conversation in conversations])
+        return account.user
@@ -0,0 +1,109 @@
+"""
+Measure how fast WhatsApp delivery/read statuses are applied in batches
+"""
+import random
+import time
+from datetime import timedelta
+from unittest.mock import patch
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.core.benchmarking import build_message, rolled_back, seed_accounts, seed_conversations, seed_users
+from apps.messages.models import Message
+from apps.messages.receipts import StatusService
+from apps.messages.stream import event_stream
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed outbound WhatsApp messages (rolled back afterwards), replay shuffled sent/delivered/read '
+        'statuses for them through the batched status pipeline and compare with one UPDATE per event.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=10000)
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--batch-size', type=int, default=2000, help='Events per flush')
+        parser.add_argument('--naive', type=int, default=3000, help='Events replayed one UPDATE at a time')
+
+    def handle(self, *args, **options):
+        channel_layer = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+        with override_settings(CHANNEL_LAYERS=channel_layer), rolled_back():
+            message_ids = self._populate(options['messages'], options['users'])
+            events = self._events(message_ids)
+            self.stdout.write(f'Seeded {len(message_ids)} messages, {len(events)} status events')
+
+            broadcasts = []
+            count_broadcasts = lambda events: broadcasts.extend(len(event['receipts']) for _, event in events)
+            with patch.object(event_stream, 'publish', count_broadcasts), \
+                    CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                changed = 0
+                for i in range(0, len(events), options['batch_size']):
+                    changed += StatusService.apply_statuses(events[i:i + options['batch_size']])[0]
+                elapsed = time.perf_counter() - start
+
+            final = {}
+            for status in Message.objects.filter(platform_message_id__in=message_ids).values_list('status', flat=True):
+                final[status] = final.get(status, 0) + 1
+            missing_times = Message.objects.filter(
+                platform_message_id__in=message_ids, read_at__isnull=True
+            ).count()
+
+            self.stdout.write(
+                f'batched: {len(events)} events in {elapsed:.2f}s ({len(events) / elapsed:.0f} events/s), '
+                f'{changed} row updates, {len(broadcasts)} broadcasts carrying {sum(broadcasts)} receipts, '
+                f'{len(queries)} queries, final statuses={final}, {missing_times} without read_at'
+            )
+
+            naive = events[:options['naive']]
+            start = time.perf_counter()
+            for event in naive:
+                Message.objects.filter(platform_message_id=event['message_id'], is_incoming=False).update(
+                    status=event['status'], updated_at=timezone.now()
+                )
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f'one UPDATE per event: {len(naive)} events in {elapsed:.2f}s ({len(naive) / elapsed:.0f} events/s)'
+            )
+
+    def _populate(self, message_count, user_count):
+        now = timezone.now()
+        per_user = max(1, message_count // user_count)
+        accounts = seed_accounts('status', [(user, 'whatsapp') for user in seed_users('status', user_count)])
+        conversations = seed_conversations(accounts, 50)
+        messages = Message.objects.bulk_create([
+            build_message(
+                conversations[a * 50 + i % 50],
+                f'wamid.status_{account.pk.hex}_{i}',
+                content=f'Reply {i}',
+                sender_id=account.platform_user_id,
+                sender_name='Me',
+                is_incoming=False,
+                is_read=True,
+                status='sent',
+                sent_at=now - timedelta(seconds=i),
+            )
+            for a, account in enumerate(accounts)
+            for i in range(per_user)
+        ], batch_size=5000)
+        return [message.platform_message_id for message in messages]
+
+    def _events(self, message_ids):
+        # Webhook deliveries arrive out of order, so shuffle all statuses together
+        base = int(time.time())
+        events = []
+        for message_id in message_ids:
+            for offset, status in enumerate(('sent', 'delivered', 'read')):
+                events.append({
+                    'platform': 'whatsapp',
+                    'event_type': 'status',
+                    'message_id': message_id,
+                    'status': status,
+                    'timestamp': str(base + offset + random.randint(0, 2)),
+                })
+        random.shuffle(events)
+        return events
@@ -0,0 +1,172 @@
+"""
+Measure send-message request latency and outbound delivery throughput against a stub Graph API
+"""
+import json
+import multiprocessing
+import random
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from config.celery import app
+from apps.core.benchmarking import committed_users, seed_account, seed_conversations
+from apps.messages.models import Message
+from apps.messages.outbound import OutboundService
+from apps.messages.tasks import send_outbound_message
+from apps.messages.views import ConversationViewSet
+
+
+def deliver(message_id):
+    """Run the delivery task in a worker process, as a prefork Celery worker would"""
+    send_outbound_message(message_id)
+
+
+class StubSendHandler(BaseHTTPRequestHandler):
+    """Graph API stub answering sends after a fixed latency, failing a share of them with 500"""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    latency = 0.0
+    error_rate = 0.0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.latency)
+
+        if random.random() < self.error_rate:
+            status, payload = 500, {'error': {'message': 'Stub failure', 'code': 2}}
+        elif '/messages' in self.path:
+            status, payload = 200, {'recipient_id': 'psid_benchmark', 'message_id': f'm_{uuid.uuid4().hex}'}
+        else:
+            status, payload = 404, {'error': {'message': 'Unknown path', 'code': 100}}
+
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Queue messages through POST /api/messages/conversations/{id}/send-message/ and drain them '
+        'with a pool of forked worker processes against a local Graph API stub. Needs a database that '
+        'allows concurrent writers (PostgreSQL); the seeded rows are deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=8, help='Delivery worker processes')
+        parser.add_argument('--latency-ms', type=float, default=100, help='Stub Graph API response time')
+        parser.add_argument('--error-rate', type=float, default=0.05, help='Share of stub calls failing with 500')
+        parser.add_argument('--rate-limit', action='store_true', help='Keep the shared Graph API rate limiter on')
+
+    def handle(self, *args, **options):
+        StubSendHandler.latency = options['latency_ms'] / 1000
+        StubSendHandler.error_rate = options['error_rate']
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StubSendHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        # Tasks are published to an in-memory broker and run by the pool below
+        app.conf.broker_write_url = 'memory://'
+
+        overrides = {
+            'META_GRAPH_API_URL': f'http://127.0.0.1:{server.server_address[1]}',
+            'OUTBOUND_RETRY_BACKOFF_BASE': 0,
+            'CHANNEL_LAYERS': {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+        }
+        if not options['rate_limit']:
+            overrides['META_RATE_LIMIT_ENABLED'] = False
+
+        try:
+            with override_settings(**overrides), committed_users('outbound') as (user,):
+                conversation = seed_conversations([seed_account('outbound', user=user)], 1)[0]
+                message_ids = self._queue(user, conversation, options['messages'])
+                self._deliver(message_ids, options['workers'])
+                self._inline(conversation, min(options['messages'], 20))
+        finally:
+            server.shutdown()
+
+    def _queue(self, user, conversation, count):
+        factory = APIRequestFactory()
+        view = ConversationViewSet.as_view({'post': 'send_message'})
+        path = f'/api/messages/conversations/{conversation.pk}/send-message/'
+
+        timings, message_ids = [], []
+        for i in range(count):
+            request = factory.post(
+                path, {'content': f'Reply {i}', 'client_message_id': f'bench-{i}'},
+                format='json', HTTP_HOST='localhost'
+            )
+            force_authenticate(request, user=user)
+            start = time.perf_counter()
+            response = view(request, pk=str(conversation.pk))
+            timings.append((time.perf_counter() - start) * 1000)
+            message_ids.append(response.data['data']['id'])
+
+        # A retried request with the same key must not queue a second message
+        request = factory.post(path, {'content': 'Reply 0', 'client_message_id': 'bench-0'},
+                               format='json', HTTP_HOST='localhost')
+        force_authenticate(request, user=user)
+        duplicate = view(request, pk=str(conversation.pk))
+        queued = Message.objects.filter(conversation=conversation).count()
+
+        self.stdout.write(
+            f'queue: n={count} p50={statistics.median(timings):.2f}ms max={max(timings):.2f}ms; '
+            f'repeated key -> HTTP {duplicate.status_code}, {queued} messages stored'
+        )
+        return message_ids
+
+    def _deliver(self, message_ids, workers):
+        start = time.perf_counter()
+        rounds = 0
+        pending = message_ids
+        # Forked workers must open their own database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as pool:
+            # Retries are published with a countdown; re-run whatever is pending
+            while pending and rounds < 20:
+                list(pool.map(deliver, pending, chunksize=16))
+                rounds += 1
+                pending = [str(pk) for pk in Message.objects.filter(
+                    pk__in=message_ids, status='pending'
+                ).values_list('id', flat=True)]
+        elapsed = time.perf_counter() - start
+
+        statuses = {}
+        attempts = 0
+        for status, metadata in Message.objects.filter(pk__in=message_ids).values_list('status', 'metadata'):
+            statuses[status] = statuses.get(status, 0) + 1
+            attempts += metadata.get('send_attempts', 0)
+
+        self.stdout.write(
+            f'deliver: {len(message_ids)} messages, {workers} workers, {elapsed:.2f}s '
+            f'({statuses.get("sent", 0) / elapsed:.0f} sent/s), {rounds} rounds, '
+            f'{attempts} failed attempts, statuses={statuses}'
+        )
+
+    def _inline(self, conversation, count):
+        # What every send request used to wait for before the queue
+        timings = []
+        for i in range(count):
+            message, _ = OutboundService.queue_message(conversation, content=f'Inline {i}')
+            message = OutboundService.claim(str(message.pk))
+            start = time.perf_counter()
+            try:
+                OutboundService.send_to_platform(message)
+            except Exception:
+                pass
+            timings.append((time.perf_counter() - start) * 1000)
+
+        self.stdout.write(f'inline send (previous request path): p50={statistics.median(timings):.2f}ms')
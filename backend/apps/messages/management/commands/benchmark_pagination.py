@@ -0,0 +1,90 @@
+"""
+Compare page latency of offset and keyset pagination at increasing depth
+"""
+import statistics
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.core.benchmarking import analyze, build_message, rolled_back, seed_account, seed_conversations
+from apps.messages.models import Message
+from apps.messages.pagination import MessagePagination
+from apps.messages.views import MessageViewSet
+
+
+class OffsetPagination(PageNumberPagination):
+    """The page-number pagination the message list used before keyset pagination"""
+
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a large inbox and time GET /api/messages/ at page 1 and at deep pages, with '
+        'offset and with keyset pagination. Rows are rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=200000)
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--pages', type=int, nargs='+', default=[1, 100, 1000, 10000])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        page_size = options['page_size']
+        factory = APIRequestFactory()
+
+        with rolled_back():
+            user, conversation = self._populate(options['messages'])
+            offset_view = MessageViewSet.as_view({'get': 'list'}, pagination_class=OffsetPagination)
+            keyset_view = MessageViewSet.as_view({'get': 'list'})
+            ordered = MessagePagination().order(Message.objects.filter(conversation=conversation))
+
+            for page in options['pages']:
+                if (page - 1) * page_size >= options['messages']:
+                    continue
+
+                params = {'page_size': page_size}
+                offset_ms = self._time(factory, offset_view, user, {**params, 'page': page}, options['repeat'])
+
+                # Cursor a client would hold after walking to this page
+                if page > 1:
+                    params['cursor'] = MessagePagination().encode_cursor(ordered[(page - 1) * page_size - 1])
+                keyset_ms = self._time(factory, keyset_view, user, params, options['repeat'])
+
+                self.stdout.write(f'page {page:>6}: offset {offset_ms:8.1f}ms   keyset {keyset_ms:6.1f}ms')
+
+    def _time(self, factory, view, user, params, repeat):
+        timings = []
+        for _ in range(repeat):
+            request = factory.get('/api/messages/', params, HTTP_HOST='localhost')
+            force_authenticate(request, user=user)
+            start = time.perf_counter()
+            response = view(request)
+            response.render()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    def _populate(self, message_count):
+        account = seed_account('pagination')
+        conversation = seed_conversations([account], 1)[0]
+        now = conversation.last_message_at
+
+        for start in range(0, message_count, 5000):
+            Message.objects.bulk_create([
+                build_message(
+                    conversation,
+                    f'm_pagination_{conversation.pk.hex}_{i}',
+                    content=f'Message {i}',
+                    # Pairs of messages share a timestamp so the id tie-break is exercised
+                    sent_at=now - timedelta(seconds=i // 2),
+                )
+                for i in range(start, min(start + 5000, message_count))
+            ])
+
+        analyze(Message)
+        return account.user, conversation
@@ -0,0 +1,119 @@
+"""
+Time search_messages on a large seeded messages table
+"""
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.core.benchmarking import analyze, rolled_back, seed_account, seed_conversations
+from apps.messages.models import Conversation, Message
+from apps.messages.views import search_messages
+
+# Frequent words of the seeded vocabulary; the tail is synthetic (w100 ... wN)
+COMMON_WORDS = [
+    'hello', 'thanks', 'order', 'delivery', 'price', 'available', 'please', 'refund',
+    'payment', 'shipping', 'size', 'color', 'today', 'tomorrow', 'address', 'invoice',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a multi-million row messages table (rolled back afterwards) and time '
+        'GET /api/messages/search/ against the previous icontains implementation. PostgreSQL only.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=2000000)
+        parser.add_argument('--vocabulary', type=int, default=20000, help='Distinct words in the seeded text')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--queries', nargs='+',
+            default=['refund', 'deliv', 'invoice address', 'w15000', 'Customer 42', 'nomatch'],
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Full-text search needs PostgreSQL')
+
+        factory = APIRequestFactory()
+
+        with rolled_back():
+            start = time.perf_counter()
+            user, account = self._populate(options['messages'], options['vocabulary'])
+            self.stdout.write(f'Seeded {options["messages"]} messages in {time.perf_counter() - start:.0f}s')
+
+            for text in options['queries']:
+                request = factory.get('/api/messages/search/', {'q': text}, HTTP_HOST='localhost')
+                force_authenticate(request, user=user)
+                data = search_messages(request).data['results']
+                search_ms = self._time(lambda: self._search(factory, user, text), options['repeat'])
+
+                cursor_ms = None
+                if data['messages_cursor']:
+                    cursor_ms = self._time(
+                        lambda: self._search(factory, user, text, data['messages_cursor']), options['repeat']
+                    )
+
+                icontains_ms = self._time(lambda: self._icontains(account, text), 1)
+
+                self.stdout.write(
+                    f'{text!r:>18}: search {search_ms:6.1f}ms'
+                    + (f', page 2 {cursor_ms:6.1f}ms' if cursor_ms is not None else ' ' * 17)
+                    + f', icontains {icontains_ms:8.1f}ms, total~{data["total_messages"]}'
+                )
+
+    def _search(self, factory, user, text, cursor=None):
+        params = {'q': text}
+        if cursor:
+            params['cursor'] = cursor
+        request = factory.get('/api/messages/search/', params, HTTP_HOST='localhost')
+        force_authenticate(request, user=user)
+        search_messages(request).render()
+
+    def _icontains(self, account, text):
+        matches = Message.objects.filter(platform_account=account).filter(
+            Q(content__icontains=text) | Q(sender_name__icontains=text)
+        ).order_by('-sent_at')[:20]
+        list(matches)
+        matches.count()
+
+    def _time(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    def _populate(self, message_count, vocabulary):
+        account = seed_account('search')
+        # The insert below picks the conversation by this ID
+        seed_conversations([account], 1000, platform_conversation_id=lambda c: f't_search_{c}')
+        now = timezone.now()
+
+        words = COMMON_WORDS + [f'w{i}' for i in range(len(COMMON_WORDS), vocabulary)]
+        with connection.cursor() as cursor:
+            # Eight words per message, skewed towards the start of the vocabulary
+            cursor.execute(f"""
+                INSERT INTO {Message._meta.db_table} (
+                    id, conversation_id, platform_account_id, user_id, platform_message_id, message_type,
+                    content, sender_id, sender_name, is_incoming, is_read, status, sent_at, received_at,
+                    metadata, created_at, updated_at
+                )
+                SELECT
+                    gen_random_uuid(), c.id, c.platform_account_id, c.user_id, 'm_search_' || g, 'text',
+                    (SELECT string_agg((%(words)s::text[])[1 + floor(power(random(), 3) * %(size)s)::int], ' ')
+                     FROM generate_series(1, 8) WHERE g > 0),
+                    c.participant_id, c.participant_name, g %% 2 = 0, true, 'sent',
+                    %(now)s - g * interval '1 second', %(now)s, '{{}}', %(now)s, %(now)s
+                FROM generate_series(1, %(count)s) g
+                JOIN {Conversation._meta.db_table} c
+                  ON c.platform_account_id = %(account)s AND c.platform_conversation_id = 't_search_' || (g %% 1000)
+            """, {'words': words, 'size': len(words), 'now': now, 'count': message_count, 'account': account.pk})
+        analyze(Message, Conversation)
+
+        return account.user, account
@@ -0,0 +1,143 @@
+"""
+Time WebSocket catch-up from the event stream against refetching the lists
+"""
+import statistics
+import time
+import uuid
+from datetime import timedelta
+import redis
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.core.benchmarking import build_message, rolled_back, seed_account, seed_conversations
+from apps.messages.consumers import MessageConsumer
+from apps.messages.models import Message
+from apps.messages.stream import event_stream
+from apps.messages.views import ConversationViewSet, MessageViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        'Disconnect a WebSocket client, publish events while it is away and time the replay on '
+        'reconnect with ?since=, against refetching the conversation and message lists. Needs the '
+        'Redis behind CACHES; seeded rows are rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--gaps', type=int, nargs='+', default=[1, 10, 100, 1000])
+        parser.add_argument('--conversations', type=int, default=200)
+        parser.add_argument('--messages', type=int, default=20, help='Messages per conversation')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        channel_layer = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+        with override_settings(CHANNEL_LAYERS=channel_layer), rolled_back():
+            user, conversation = self._populate(options['conversations'], options['messages'])
+            try:
+                event_stream._redis().ping()
+            except redis.RedisError as e:
+                raise CommandError(f'The event stream needs Redis: {e}')
+
+            try:
+                refetch_ms = self._time(lambda: self._refetch(user, conversation), options['repeat'])
+                self.stdout.write(f'refetch conversation and message lists: {refetch_ms:.1f}ms')
+
+                for gap in options['gaps']:
+                    timings = []
+                    for _ in range(options['repeat']):
+                        elapsed, frames = async_to_sync(self._resume)(user, gap)
+                        if frames != ['new_message'] * gap:
+                            raise CommandError(f'Expected {gap} replayed events, got {frames[:5]}...')
+                        timings.append(elapsed)
+                    self.stdout.write(
+                        f'resume after {gap:>5} missed events: {statistics.median(timings):7.1f}ms'
+                    )
+
+                # Events beyond the stream cap cannot be replayed
+                elapsed, frames = async_to_sync(self._resume)(user, settings.WEBSOCKET_STREAM_MAXLEN + 500)
+                self.stdout.write(
+                    f'resume after {settings.WEBSOCKET_STREAM_MAXLEN + 500} missed events: {frames}'
+                )
+            finally:
+                event_stream._redis().delete(event_stream._key(user.id))
+
+    async def _connect(self, user, since=None):
+        path = '/ws/messages/' + (f'?since={since}' if since else '')
+        communicator = WebsocketCommunicator(MessageConsumer.as_asgi(), path)
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        assert connected
+        established = await communicator.receive_json_from()
+        return communicator, established['event_id']
+
+    async def _resume(self, user, gap):
+        # The client has seen at least one event before it drops
+        await self._publish(user, 1)
+        communicator, head = await self._connect(user)
+        await communicator.disconnect()
+
+        await self._publish(user, gap)
+
+        start = time.perf_counter()
+        communicator, _ = await self._connect(user, since=head)
+        frames = []
+        caught_up = time.perf_counter()
+        while not await communicator.receive_nothing(timeout=0.05):
+            frame = await communicator.receive_json_from()
+            caught_up = time.perf_counter()
+            frames.append(frame['type'])
+        await communicator.disconnect()
+        return (caught_up - start) * 1000, frames
+
+    async def _publish(self, user, count):
+        events = [
+            (user.id, {'type': 'new_message', 'message': {'id': str(uuid.uuid4()), 'content': f'Missed {i}'}})
+            for i in range(count)
+        ]
+        await sync_to_async(event_stream.publish)(events)
+
+    def _refetch(self, user, conversation):
+        # What the frontend did after every reconnect
+        factory = APIRequestFactory()
+        request = factory.get('/api/messages/conversations/', HTTP_HOST='localhost')
+        force_authenticate(request, user=user)
+        ConversationViewSet.as_view({'get': 'list'})(request).render()
+
+        request = factory.get(f'/api/messages/conversations/{conversation.pk}/', HTTP_HOST='localhost')
+        force_authenticate(request, user=user)
+        ConversationViewSet.as_view({'get': 'retrieve'})(request, pk=str(conversation.pk)).render()
+
+        request = factory.get('/api/messages/messages/', HTTP_HOST='localhost')
+        force_authenticate(request, user=user)
+        MessageViewSet.as_view({'get': 'list'})(request).render()
+
+    def _time(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    def _populate(self, conversation_count, message_count):
+        account = seed_account('replay')
+        now = timezone.now()
+        conversations = seed_conversations(
+            [account], conversation_count, last_message_at=lambda c: now - timedelta(minutes=c)
+        )
+        Message.objects.bulk_create([
+            build_message(
+                conversation,
+                content=f'Message {i}',
+                is_incoming=i % 2 == 0,
+                sent_at=now - timedelta(minutes=c, seconds=i),
+            )
+            for c, conversation in enumerate(conversations)
+            for i in range(message_count)
+        ])
+        return account.user, conversations[0]
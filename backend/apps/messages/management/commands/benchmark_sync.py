@@ -0,0 +1,171 @@
+"""
+Count database queries, Graph API calls and wall time per synced account
+"""
+import json
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.core.benchmarking import rolled_back, seed_account
+from apps.platforms.services import MessengerService
+from apps.messages.services import MessageService
+
+
+class FakeGraphService:
+    """In-process stand-in for MessengerService returning deterministic, paged data"""
+
+    def __init__(self, page_id, conversations, messages):
+        self.page_id = page_id
+        self.conversations = conversations
+        self.messages = messages
+        self.started = timezone.now()
+
+    @staticmethod
+    def _page(items, limit, after):
+        offset = int(after or 0)
+        response = {'data': items[offset:offset + limit], 'paging': {}}
+        if offset + limit < len(items):
+            response['paging'] = {'cursors': {'after': str(offset + limit)}, 'next': 'https://graph.invalid/next'}
+        return response
+
+    def get_conversations_page(self, page_id, access_token, limit=50, after=None):
+        conversations = [
+            {
+                'id': f't_{i}',
+                'updated_time': (self.started - timedelta(minutes=i)).isoformat(),
+                'participants': {'data': [
+                    {'id': f'psid_{i}', 'name': f'Customer {i}'},
+                    {'id': self.page_id, 'name': 'Page'},
+                ]},
+            }
+            for i in range(self.conversations)
+        ]
+        return self._page(conversations, limit, after)
+
+    def get_conversation_messages_page(self, conversation_id, access_token, limit=50, after=None):
+        customer = conversation_id.replace('t_', 'psid_')
+        messages = [
+            {
+                'id': f'm_{conversation_id}_{j}',
+                'message': f'Message {j}',
+                'from': {'id': customer if j % 2 else self.page_id, 'name': 'Someone'},
+                'created_time': (self.started - timedelta(minutes=j)).isoformat(),
+            }
+            for j in range(self.messages)
+        ]
+        return self._page(messages, limit, after)
+
+    def get_conversation_messages_pages(self, pages, access_token, limit=50):
+        return [
+            self.get_conversation_messages_page(conversation_id, access_token, limit, after)
+            for conversation_id, after in pages
+        ]
+
+    def get_user_profiles(self, user_ids, access_token):
+        return {user_id: {'id': user_id, 'name': f'Customer {user_id}'} for user_id in user_ids}
+
+
+def serve_fake_graph(fake, latency_ms):
+    """Serve a FakeGraphService over local keep-alive HTTP with injected latency"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def _get(self, path):
+            url = urlparse(path)
+            params = {key: values[0] for key, values in parse_qs(url.query).items()}
+            node, edge = url.path.strip('/').split('/')[-2:]
+            limit, after = int(params.get('limit', 50)), params.get('after')
+
+            if edge == 'conversations':
+                return fake.get_conversations_page(node, '', limit, after)
+            return fake.get_conversation_messages_page(node, '', limit, after)
+
+        def _respond(self, data):
+            time.sleep(latency_ms / 1000)
+            body = json.dumps(data).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self._respond(self._get(self.path))
+
+        def do_POST(self):
+            # Graph API batch request: one response item per operation
+            form = parse_qs(self.rfile.read(int(self.headers['Content-Length'])).decode())
+            operations = json.loads(form['batch'][0])
+            self._respond([
+                {'code': 200, 'body': json.dumps(self._get('/' + operation['relative_url']))}
+                for operation in operations
+            ])
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class Command(BaseCommand):
+    help = 'Benchmark queries, API calls and wall time per synced account for MessageService.sync_platform_messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conversations', type=int, default=50)
+        parser.add_argument('--messages', type=int, default=50)
+        parser.add_argument(
+            '--graph-latency-ms', type=float, default=0,
+            help='Serve the fake Graph API over local HTTP with this much latency per call'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=None,
+            help='SYNC_FETCH_CONCURRENCY values to compare (bulk path only)'
+        )
+
+    def handle(self, *args, **options):
+        if options['concurrency']:
+            runs = [(True, width) for width in options['concurrency']]
+        else:
+            runs = [(False, None), (True, None)]
+
+        for bulk, width in runs:
+            label = ('bulk' if bulk else 'per-row') + (f' x{width}' if width else '')
+            overrides = {'SYNC_FETCH_CONCURRENCY': width} if width else {}
+
+            with rolled_back(), override_settings(**overrides):
+                account = seed_account('sync')
+                fake = FakeGraphService(account.platform_user_id, options['conversations'], options['messages'])
+                service, server = fake, None
+
+                if options['graph_latency_ms']:
+                    server = serve_fake_graph(fake, options['graph_latency_ms'])
+                    service = MessengerService()
+                    service.base_url = f'http://127.0.0.1:{server.server_address[1]}/v18.0'
+
+                try:
+                    for run in ('initial', 'idle'):
+                        with CaptureQueriesContext(connection) as queries:
+                            start = time.perf_counter()
+                            stats = MessageService.sync_platform_messages(account, service, bulk=bulk)
+                            elapsed = (time.perf_counter() - start) * 1000
+
+                        self.stdout.write(
+                            f'{label:>12} {run:>7}: {len(queries.captured_queries)} queries, '
+                            f'{stats.get("api_calls")} API calls, {elapsed:.1f}ms, '
+                            f'new_messages={stats.get("new_messages")}'
+                        )
+                finally:
+                    if server:
+                        server.shutdown()
+
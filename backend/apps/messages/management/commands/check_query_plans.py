@@ -0,0 +1,110 @@
+"""
+Check that user-scoped list, unread and search queries are served by the owner indexes
+"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.core.benchmarking import analyze, build_message, rolled_back, seed_accounts, seed_conversations, seed_users
+from apps.messages.models import Conversation, Message
+from apps.messages.pagination import ConversationPagination, MessagePagination
+from apps.messages.search import SearchService
+from apps.messages.views import ConversationViewSet, MessageViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        'EXPLAIN the main user-scoped queries against a small seeded tenant set and fail if one '
+        'scans a whole table or misses its composite index. PostgreSQL only; rows are rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--conversations', type=int, default=500, help='Conversations per user')
+        parser.add_argument('--messages', type=int, default=2000, help='Messages per user')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Query plan checks need PostgreSQL')
+
+        failures = 0
+        with rolled_back():
+            user = self._populate(options['users'], options['conversations'], options['messages'])
+            # A seq scan is then only chosen when no index can serve the query at all
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for name, queryset, indexes in self._checks(user):
+                plan = queryset.explain()
+                used = [index for index in indexes if index in plan]
+                seq_scans = [line.strip() for line in plan.splitlines() if 'Seq Scan' in line]
+
+                if used and not seq_scans:
+                    self.stdout.write(f'OK   {name}: {used[0]}')
+                    continue
+
+                failures += 1
+                self.stdout.write(f'FAIL {name}: expected one of {", ".join(indexes)}')
+                self.stdout.write(plan)
+
+        if failures:
+            raise CommandError(f'{failures} queries are not served by their index')
+
+    def _populate(self, user_count, conversation_count, message_count):
+        """Seed several tenants so the planner sees realistic selectivity, return one of them"""
+        now = timezone.now()
+        users = seed_users('plan-check', user_count)
+        for account in seed_accounts('plan', [(user, 'messenger') for user in users]):
+            conversations = seed_conversations(
+                [account], conversation_count,
+                last_message_at=lambda c: now - timedelta(minutes=c),
+                is_archived=lambda c: c % 10 == 0,
+            )
+            Message.objects.bulk_create([
+                build_message(
+                    conversations[i % conversation_count],
+                    content=f'refund order {i}' if i % 20 == 0 else f'message {i}',
+                    sender_id=f'psid_{i % 50}',
+                    sender_name=f'Customer {i % 50}',
+                    is_incoming=i % 2 == 0,
+                    is_read=i % 10 != 0,
+                    sent_at=now - timedelta(seconds=i),
+                )
+                for i in range(message_count)
+            ])
+
+        analyze(Conversation, Message)
+        return users[-1]
+
+    def _view_queryset(self, viewset, user, params):
+        request = APIRequestFactory().get('/', params, HTTP_HOST='localhost')
+        force_authenticate(request, user=user)
+        view = viewset(action_map={'get': 'list'})
+        view.request = view.initialize_request(request)
+        view.format_kwarg = None
+        return view.get_queryset()
+
+    def _checks(self, user):
+        conversations = self._view_queryset(ConversationViewSet, user, {})
+        active_conversations = self._view_queryset(ConversationViewSet, user, {'is_archived': 'false'})
+        archived_conversations = self._view_queryset(ConversationViewSet, user, {'is_archived': 'true'})
+        messages = self._view_queryset(MessageViewSet, user, {})
+        matches = SearchService.filter_messages(Message.objects.filter(user=user), 'refund')
+
+        return [
+            ('conversation list', ConversationPagination().order(conversations)[:51],
+             ['conversations_user_recent_idx']),
+            # Most conversations are active, so filtering the recency index is as good a plan
+            ('active conversation list', ConversationPagination().order(active_conversations)[:51],
+             ['conversations_user_archive_idx', 'conversations_user_recent_idx']),
+            ('archived conversation list', ConversationPagination().order(archived_conversations)[:51],
+             ['conversations_user_archive_idx']),
+            ('message list', MessagePagination().order(messages)[:51],
+             ['messages_user_recent_idx']),
+            ('unread messages', Message.objects.filter(user=user, is_incoming=True, is_read=False),
+             ['messages_user_unread_idx']),
+            ('message search', MessagePagination().order(matches)[:21],
+             ['messages_search_vector_idx', 'messages_user_recent_idx']),
+        ]
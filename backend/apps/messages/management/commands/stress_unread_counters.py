@@ -0,0 +1,132 @@
+"""
+Check that concurrent webhooks and mark-read requests never lose unread count updates
+"""
+import random
+import threading
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.core.benchmarking import committed_users, seed_account
+from apps.messages.models import Conversation, Message
+from apps.messages.services import MessageService
+from apps.messages.views import ConversationViewSet, MessageViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        'Hammer one conversation with concurrent webhook messages, mark-read and mark-all-read '
+        'requests, then verify unread_count equals the number of unread incoming messages and the '
+        'last-message snapshot matches the last message. Writes to the '
+        'configured database and deletes its rows afterwards; use PostgreSQL for real contention.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--mark-all', type=int, default=2, help='Threads repeatedly marking all read')
+        parser.add_argument('--messages', type=int, default=50, help='Webhook messages per writer')
+
+    def handle(self, *args, **options):
+        with committed_users('stress') as (user,):
+            account = seed_account('stress', user=user)
+            errors = []
+
+            # Create the conversation up front so every thread updates the same row
+            MessageService.process_webhook_batch('messenger', [self._event(account, 'seed')])
+            conversation = Conversation.objects.get(platform_account=account)
+            done = threading.Event()
+            halfway = threading.Event()
+            written = [0]
+            considered = set()
+            lock = threading.Lock()
+
+            def writer(index):
+                try:
+                    for i in range(options['messages']):
+                        MessageService.process_webhook_batch('messenger', [self._event(account, f'{index}_{i}')])
+                        with lock:
+                            written[0] += 1
+                            if written[0] * 2 >= options['writers'] * options['messages']:
+                                halfway.set()
+                except Exception as e:
+                    errors.append(e)
+                finally:
+                    connection.close()
+
+            def reader():
+                view = MessageViewSet.as_view({'post': 'mark_read'})
+                factory = APIRequestFactory()
+                try:
+                    while not done.is_set():
+                        unread = conversation.messages.filter(is_read=False).values_list('pk', flat=True)[:50]
+                        with lock:
+                            # Every message gets one chance, so about half stay unread
+                            candidates = [pk for pk in unread if pk not in considered]
+                            considered.update(candidates)
+                        for pk in candidates:
+                            if random.random() < 0.5:
+                                continue
+                            request = factory.post(f'/api/messages/{pk}/mark-read/')
+                            force_authenticate(request, user=user)
+                            view(request, pk=pk)
+                except Exception as e:
+                    errors.append(e)
+                finally:
+                    connection.close()
+
+            def mark_all():
+                view = ConversationViewSet.as_view({'post': 'mark_all_read'})
+                factory = APIRequestFactory()
+                try:
+                    # Stop halfway: a later reset would hide an increment lost by an earlier one
+                    while not (halfway.is_set() or done.is_set()):
+                        request = factory.post(f'/api/conversations/{conversation.pk}/mark-all-read/')
+                        force_authenticate(request, user=user)
+                        view(request, pk=str(conversation.pk))
+                        time.sleep(random.uniform(0, 0.02))
+                except Exception as e:
+                    errors.append(e)
+                finally:
+                    connection.close()
+
+            writers = [threading.Thread(target=writer, args=(i,)) for i in range(options['writers'])]
+            readers = [threading.Thread(target=reader) for _ in range(options['readers'])]
+            readers += [threading.Thread(target=mark_all) for _ in range(options['mark_all'])]
+            for thread in writers + readers:
+                thread.start()
+            for thread in writers:
+                thread.join()
+            done.set()
+            for thread in readers:
+                thread.join()
+
+            conversation.refresh_from_db()
+            expected = conversation.messages.filter(is_incoming=True, is_read=False).count()
+            stored = conversation.messages.count()
+            last_is_read = Message.objects.filter(pk=conversation.last_message_id).values_list('is_read', flat=True).first()
+
+            self.stdout.write(
+                f'messages={stored} unread_count={conversation.unread_count} '
+                f'unread_messages={expected} last_message_is_read={conversation.last_message_is_read} '
+                f'(message: {last_is_read}) thread_errors={len(errors)}'
+            )
+            for e in errors[:5]:
+                self.stderr.write(f'  {type(e).__name__}: {e}')
+
+            if conversation.unread_count != expected:
+                raise CommandError(f'Lost updates: unread_count is {conversation.unread_count}, expected {expected}')
+            if conversation.last_message_is_read != last_is_read:
+                raise CommandError('last_message_is_read disagrees with the last message')
+            self.stdout.write('OK: no lost unread count updates')
+
+    def _event(self, account, suffix):
+        return {
+            'platform': 'messenger',
+            'sender_id': 'stress-customer',
+            'recipient_id': account.platform_user_id,
+            'message_id': f'stress.{account.pk}.{suffix}',
+            'message_text': 'stress',
+            'is_echo': False,
+        }
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.1 on 2026-10-16 23:33
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_messages', '0001_initial'),
+        ('platforms', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncCheckpoint',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('platform_conversation_id', models.CharField(blank=True, default='', help_text='Conversation ID from platform, empty for the account checkpoint', max_length=255)),
+                ('updated_time', models.DateTimeField(blank=True, help_text='Last seen updated_time', null=True)),
+                ('newest_message_at', models.DateTimeField(blank=True, help_text='Newest message already stored', null=True)),
+                ('cursor', models.TextField(blank=True, help_text='Paging cursor to resume from', null=True)),
+                ('cursor_until', models.DateTimeField(blank=True, help_text='Where the resumed paging stops', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('platform_account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_checkpoints', to='platforms.platformaccount')),
+            ],
+            options={
+                'verbose_name': 'Sync Checkpoint',
+                'verbose_name_plural': 'Sync Checkpoints',
+                'db_table': 'sync_checkpoints',
+                'unique_together': {('platform_account', 'platform_conversation_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.1 on 2026-10-16 23:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_messages', '0003_conversation_last_message'),
+        ('platforms', '0002_platformaccount_routing_key'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['-last_message_at', '-id'], name='conversatio_last_me_554408_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['-sent_at', '-id'], name='messages_sent_at_83ab96_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', '-sent_at', '-id'], name='messages_convers_a3af8e_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='conversation',
+            name='conversatio_last_me_99c95c_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='message',
+            name='messages_sent_at_cea072_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='message',
+            name='messages_convers_1401f8_idx',
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.0.1 on 2026-10-16 23:58
+
+import logging
+import django.contrib.postgres.search
+from django.db import DatabaseError, migrations, transaction
+
+logger = logging.getLogger(__name__)
+
+# Name columns searched with ILIKE '%q%', served by trigram indexes
+TRIGRAM_INDEXES = [
+    ('conversations_participant_name_trgm', 'conversations', 'participant_name'),
+    ('conversations_participant_id_trgm', 'conversations', 'participant_id'),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute("""
+        CREATE TRIGGER messages_search_vector_update
+        BEFORE INSERT OR UPDATE OF content, sender_name ON messages
+        FOR EACH ROW EXECUTE FUNCTION
+        tsvector_update_trigger(search_vector, 'pg_catalog.simple', content, sender_name)
+    """)
+    schema_editor.execute("""
+        UPDATE messages
+        SET search_vector = to_tsvector('pg_catalog.simple', coalesce(content, '') || ' ' || sender_name)
+    """)
+    schema_editor.execute('CREATE INDEX messages_search_vector_idx ON messages USING gin (search_vector)')
+
+    # pg_trgm ships with the contrib package, which not every server has
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            for name, table, column in TRIGRAM_INDEXES:
+                schema_editor.execute(f'CREATE INDEX {name} ON {table} USING gin ({column} gin_trgm_ops)')
+    except DatabaseError as e:
+        logger.warning(f'pg_trgm unavailable, name search will scan conversations: {e}')
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+    schema_editor.execute('DROP INDEX IF EXISTS messages_search_vector_idx')
+    schema_editor.execute('DROP TRIGGER IF EXISTS messages_search_vector_update ON messages')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_messages', '0004_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
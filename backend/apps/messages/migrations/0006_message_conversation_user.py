@@ -0,0 +1,73 @@
+# Generated by Django 5.0.1 on 2026-10-17 00:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_owners(apps, schema_editor):
+    PlatformAccount = apps.get_model('platforms', 'PlatformAccount')
+    Conversation = apps.get_model('chat_messages', 'Conversation')
+    Message = apps.get_model('chat_messages', 'Message')
+
+    # One statement per account and table, each served by the platform_account indexes
+    for account_id, user_id in PlatformAccount.objects.values_list('id', 'user_id').iterator():
+        Conversation.objects.filter(platform_account_id=account_id).update(user_id=user_id)
+        Message.objects.filter(platform_account_id=account_id).update(user_id=user_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_messages', '0005_message_search_vector'),
+        ('platforms', '0002_platformaccount_routing_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='user',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='conversations', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='user',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_owners, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='conversation',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='conversations', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['user', '-last_message_at', '-id'], name='conversations_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['user', 'is_archived', '-last_message_at', '-id'], name='conversations_user_archive_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['user', '-sent_at', '-id'], name='messages_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('is_incoming', True), ('is_read', False)), fields=['user', '-sent_at', '-id'], name='messages_user_unread_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='conversation',
+            name='conversatio_last_me_554408_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='message',
+            name='messages_sent_at_83ab96_idx',
+        ),
+    ]
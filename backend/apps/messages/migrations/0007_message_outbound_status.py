@@ -0,0 +1,39 @@
+# Generated by Django 5.0.1 on 2026-10-17 00:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_messages', '0006_message_conversation_user'),
+        ('platforms', '0002_platformaccount_routing_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='client_message_id',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('delivered', 'Delivered'), ('read', 'Read'), ('failed', 'Failed')], default='sent', help_text='Delivery state of outbound messages; incoming messages are stored as sent', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='platform_message_id',
+            field=models.CharField(blank=True, help_text='Message ID from platform, empty until an outbound message is sent', max_length=255, null=True, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'sending'])), fields=['updated_at'], name='messages_outbound_queue_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='message',
+            constraint=models.UniqueConstraint(condition=models.Q(('client_message_id__isnull', False)), fields=('user', 'client_message_id'), name='messages_user_client_message_id_uniq'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.0.1 on 2026-10-17 01:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_messages', '0007_message_outbound_status'),
+        ('platforms', '0002_platformaccount_routing_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sent_at'], name='messages_sent_at_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.0.1 on 2026-10-17 01:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_messages', '0009_conversation_created_at_index'),
+        ('platforms', '0002_platformaccount_routing_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['created_at'], name='messages_created_at_idx'),
+        ),
+    ]
@@ -2,6 +2,7 @@
 Message and conversation models
 """
 import uuid
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.conf import settings
 
@@ -16,6 +17,13 @@ class Conversation(models.Model):
         on_delete=models.CASCADE,
         related_name='conversations'
     )
+    # Owner of platform_account, copied so user-scoped queries need no join or subquery
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='conversations',
+        db_index=False
+    )
     platform_conversation_id = models.CharField(max_length=255, help_text="Conversation ID from platform")
 
     # Participant info
@@ -28,6 +36,13 @@ class Conversation(models.Model):
     unread_count = models.IntegerField(default=0)
     is_archived = models.BooleanField(default=False)
 
+    # Snapshot of the newest message, so listings need no per-row message query
+    last_message_id = models.UUIDField(blank=True, null=True)
+    last_message_preview = models.CharField(max_length=100, blank=True, default='')
+    last_message_sender_name = models.CharField(max_length=255, blank=True, default='')
+    last_message_sent_at = models.DateTimeField(blank=True, null=True)
+    last_message_is_read = models.BooleanField(default=False)
+
     # Metadata
     metadata = models.JSONField(default=dict, blank=True)
 
@@ -41,13 +56,23 @@ class Conversation(models.Model):
         unique_together = [['platform_account', 'platform_conversation_id']]
         ordering = ['-last_message_at']
         indexes = [
-            models.Index(fields=['-last_message_at']),
+            models.Index(fields=['user', '-last_message_at', '-id'], name='conversations_user_recent_idx'),
+            models.Index(
+                fields=['user', 'is_archived', '-last_message_at', '-id'], name='conversations_user_archive_idx'
+            ),
             models.Index(fields=['platform_account', 'is_archived']),
+            # Day-range scans across all users, for analytics aggregation
+            models.Index(fields=['created_at'], name='conversations_created_at_idx'),
         ]
 
     def __str__(self):
         return f"{self.participant_name} - {self.platform_account.get_platform_display()}"
 
+    def save(self, *args, **kwargs):
+        if self.user_id is None and self.platform_account_id:
+            self.user_id = self.platform_account.user_id
+        super().save(*args, **kwargs)
+
 
 class Message(models.Model):
     """
@@ -63,6 +88,15 @@ class Message(models.Model):
         ('location', 'Location'),
     ]
 
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('delivered', 'Delivered'),
+        ('read', 'Read'),
+        ('failed', 'Failed'),
+    ]
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages')
     platform_account = models.ForeignKey(
@@ -70,7 +104,19 @@ class Message(models.Model):
         on_delete=models.CASCADE,
         related_name='messages'
     )
-    platform_message_id = models.CharField(max_length=255, unique=True, help_text="Message ID from platform")
+    # Owner of platform_account, copied so user-scoped queries need no join or subquery
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='messages',
+        db_index=False
+    )
+    platform_message_id = models.CharField(
+        max_length=255, unique=True, blank=True, null=True,
+        help_text="Message ID from platform, empty until an outbound message is sent"
+    )
+    # Client-generated key, so a retried send request does not send the message twice
+    client_message_id = models.CharField(max_length=64, blank=True, null=True)
 
     # Message content
     message_type = models.CharField(max_length=20, choices=MESSAGE_TYPE_CHOICES, default='text')
@@ -83,6 +129,10 @@ class Message(models.Model):
     is_incoming = models.BooleanField(default=True, help_text="True if from user, False if sent by page/business")
 
     # Status
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default='sent',
+        help_text="Delivery state of outbound messages; incoming messages are stored as sent"
+    )
     is_read = models.BooleanField(default=False)
     read_at = models.DateTimeField(blank=True, null=True)
     delivered_at = models.DateTimeField(blank=True, null=True)
@@ -94,6 +144,9 @@ class Message(models.Model):
     # Metadata
     metadata = models.JSONField(default=dict, blank=True, help_text="Additional message data")
 
+    # Full-text index of content and sender_name, kept up to date by a PostgreSQL trigger
+    search_vector = SearchVectorField(blank=True, null=True, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -103,12 +156,75 @@ class Message(models.Model):
         verbose_name_plural = 'Messages'
         ordering = ['-sent_at']
         indexes = [
-            models.Index(fields=['-sent_at']),
-            models.Index(fields=['conversation', '-sent_at']),
+            models.Index(fields=['user', '-sent_at', '-id'], name='messages_user_recent_idx'),
+            models.Index(
+                fields=['user', '-sent_at', '-id'],
+                condition=models.Q(is_incoming=True, is_read=False),
+                name='messages_user_unread_idx'
+            ),
+            models.Index(fields=['conversation', '-sent_at', '-id']),
             models.Index(fields=['platform_account', 'is_read']),
             models.Index(fields=['platform_message_id']),
+            # Day-range scans across all users, for analytics aggregation
+            models.Index(fields=['sent_at'], name='messages_sent_at_idx'),
+            # Messages stored since a checkpoint, for incremental analytics
+            models.Index(fields=['created_at'], name='messages_created_at_idx'),
+            models.Index(
+                fields=['updated_at'],
+                condition=models.Q(status__in=['pending', 'sending']),
+                name='messages_outbound_queue_idx'
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'client_message_id'],
+                condition=models.Q(client_message_id__isnull=False),
+                name='messages_user_client_message_id_uniq'
+            ),
         ]
 
     def __str__(self):
         content_preview = self.content[:50] if self.content else f"[{self.message_type}]"
         return f"{self.sender_name}: {content_preview}"
+
+    def save(self, *args, **kwargs):
+        if self.user_id is None and self.platform_account_id:
+            self.user_id = self.platform_account.user_id
+        super().save(*args, **kwargs)
+
+
+class SyncCheckpoint(models.Model):
+    """
+    Model to remember how far polling sync got for an account or conversation.
+    The account-level checkpoint uses an empty platform_conversation_id.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    platform_account = models.ForeignKey(
+        'platforms.PlatformAccount',
+        on_delete=models.CASCADE,
+        related_name='sync_checkpoints'
+    )
+    platform_conversation_id = models.CharField(
+        max_length=255, blank=True, default='',
+        help_text="Conversation ID from platform, empty for the account checkpoint"
+    )
+
+    # Graph API state seen on the last sync
+    updated_time = models.DateTimeField(blank=True, null=True, help_text="Last seen updated_time")
+    newest_message_at = models.DateTimeField(blank=True, null=True, help_text="Newest message already stored")
+
+    # Unfinished catch-up after hitting the page limit
+    cursor = models.TextField(blank=True, null=True, help_text="Paging cursor to resume from")
+    cursor_until = models.DateTimeField(blank=True, null=True, help_text="Where the resumed paging stops")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'sync_checkpoints'
+        verbose_name = 'Sync Checkpoint'
+        verbose_name_plural = 'Sync Checkpoints'
+        unique_together = [['platform_account', 'platform_conversation_id']]
+
+    def __str__(self):
+        return f"{self.platform_account_id} - {self.platform_conversation_id or 'account'}"
@@ -0,0 +1,358 @@
+"""
+Outbound message queue
+"""
+import logging
+import random
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import requests
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from apps.analytics.services import AnalyticsService
+from apps.platforms.services import InstagramService, MessengerService, RateLimitDeferred, WhatsAppService
+from apps.platforms.services.rate_limit import THROTTLE_ERROR_CODES
+from .models import Conversation, Message
+from .services import MessageService
+from .stream import event_stream
+
+logger = logging.getLogger(__name__)
+
+
+class OutboundSendError(Exception):
+    """Raised when the platform accepted a send request but returned no message ID"""
+
+
+class OutboundService:
+    """
+    Queue outbound messages and deliver them from Celery workers.
+
+    The send endpoint stores the message as `pending` and returns at once.
+    A worker claims it (`sending`), calls the platform API and marks it
+    `sent` or `failed`, putting it back to `pending` between retries. The
+    outcome is pushed to the owner's WebSocket group as a `message_status`
+    event.
+    """
+
+    @staticmethod
+    def queue_message(
+        conversation: Conversation,
+        content: str,
+        message_type: str = 'text',
+        media_url: Optional[str] = None,
+        client_message_id: Optional[str] = None
+    ) -> Tuple[Message, bool]:
+        """
+        Store a pending outbound message
+
+        A client_message_id already used by the same user returns the
+        message created for it instead of queueing a second copy.
+
+        Args:
+            conversation: Conversation to send in
+            content: Message text, or the caption of a media message
+            message_type: Message type (text, image, video, audio, file)
+            media_url: URL of the attachment for media messages
+            client_message_id: Idempotency key chosen by the client
+
+        Returns:
+            Tuple of (message, created)
+        """
+        if client_message_id:
+            existing = Message.objects.filter(
+                user_id=conversation.user_id, client_message_id=client_message_id
+            ).first()
+            if existing:
+                return existing, False
+
+        platform_account = conversation.platform_account
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                message = Message.objects.create(
+                    conversation=conversation,
+                    platform_account=platform_account,
+                    user_id=conversation.user_id,
+                    client_message_id=client_message_id,
+                    message_type=message_type,
+                    content=content,
+                    media_url=media_url,
+                    sender_id=platform_account.platform_user_id,
+                    sender_name=platform_account.platform_username or 'Me',
+                    is_incoming=False,
+                    is_read=True,
+                    status='pending',
+                    sent_at=now
+                )
+                AnalyticsService.record_messages(platform_account.platform, [message])
+
+                # Update conversation last_message_at without overwriting concurrent webhook updates
+                Conversation.objects.filter(pk=conversation.pk).update(
+                    last_message_at=Greatest(F('last_message_at'), Value(message.sent_at)),
+                    updated_at=now,
+                    **MessageService.last_message_update(message)
+                )
+        except IntegrityError:
+            # A concurrent request with the same key won the race
+            if not client_message_id:
+                raise
+            return Message.objects.get(user_id=conversation.user_id, client_message_id=client_message_id), False
+
+        return message, True
+
+    @staticmethod
+    def claim(message_id: str) -> Optional[Message]:
+        """
+        Take a pending message for delivery
+
+        A message left in `sending` by a worker that died is claimed again
+        once OUTBOUND_SEND_CLAIM_TIMEOUT has passed.
+
+        Args:
+            message_id: Message ID
+
+        Returns:
+            The claimed message, or None if it is not waiting to be sent
+        """
+        now = timezone.now()
+        stale = now - timedelta(seconds=settings.OUTBOUND_SEND_CLAIM_TIMEOUT)
+        claimed = Message.objects.filter(
+            Q(status='pending') | Q(status='sending', updated_at__lt=stale),
+            pk=message_id,
+            is_incoming=False
+        ).update(status='sending', updated_at=now)
+        if not claimed:
+            return None
+        return Message.objects.select_related('conversation', 'platform_account').get(pk=message_id)
+
+    @staticmethod
+    def send_to_platform(message: Message) -> str:
+        """
+        Send a message through its platform's API
+
+        Args:
+            message: Claimed outbound message
+
+        Returns:
+            Platform message ID
+
+        Raises:
+            requests.RequestException: If the API call fails
+            OutboundSendError: If the response has no message ID
+        """
+        conversation = message.conversation
+        platform_account = message.platform_account
+        access_token = platform_account.get_decrypted_access_token()
+
+        if platform_account.platform == 'instagram':
+            response_data = InstagramService().send_message(
+                recipient_id=conversation.participant_id,
+                message_text=message.content,
+                ig_account_id=platform_account.platform_user_id,
+                access_token=access_token
+            )
+            platform_message_id = response_data.get('id')
+
+        elif platform_account.platform == 'messenger':
+            service = MessengerService()
+            if message.message_type == 'text':
+                response_data = service.send_message(
+                    recipient_id=conversation.participant_id,
+                    message_text=message.content,
+                    page_id=platform_account.platform_user_id,
+                    access_token=access_token
+                )
+            else:
+                response_data = service.send_message_with_attachment(
+                    recipient_id=conversation.participant_id,
+                    attachment_type=message.message_type,
+                    attachment_url=message.media_url,
+                    page_id=platform_account.platform_user_id,
+                    access_token=access_token
+                )
+            platform_message_id = response_data.get('message_id')
+
+        elif platform_account.platform == 'whatsapp':
+            service = WhatsAppService()
+            if message.message_type == 'text':
+                response_data = service.send_text_message(
+                    recipient_phone=conversation.participant_id,
+                    message_text=message.content,
+                    phone_number_id=platform_account.platform_user_id,
+                    access_token=access_token
+                )
+            else:
+                response_data = service.send_media_message(
+                    recipient_phone=conversation.participant_id,
+                    media_type=message.message_type,
+                    media_url=message.media_url,
+                    caption=message.content or None,
+                    phone_number_id=platform_account.platform_user_id,
+                    access_token=access_token
+                )
+            messages_data = response_data.get('messages') or [{}]
+            platform_message_id = messages_data[0].get('id')
+
+        else:
+            raise OutboundSendError(f'Unsupported platform: {platform_account.platform}')
+
+        if not platform_message_id:
+            raise OutboundSendError('Platform API returned no message ID')
+        return platform_message_id
+
+    @staticmethod
+    def retry_delay(error: Exception, attempt: int) -> Optional[float]:
+        """
+        Decide whether a failed send is retried
+
+        Network errors, timeouts, 5xx responses and throttling are retried
+        with exponential backoff and jitter; other API errors mean the
+        platform rejected the message and are final.
+
+        Args:
+            error: Exception raised by send_to_platform
+            attempt: Number of failed attempts so far, including this one
+
+        Returns:
+            Seconds to wait before the next attempt, or None to give up
+        """
+        if isinstance(error, RateLimitDeferred):
+            return error.retry_after + random.uniform(0, 1)
+
+        if attempt >= settings.OUTBOUND_SEND_MAX_ATTEMPTS:
+            return None
+
+        if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+            response = error.response
+            try:
+                code = response.json().get('error', {}).get('code')
+            except (ValueError, AttributeError):
+                code = None
+            if response.status_code < 500 and response.status_code != 429 and code not in THROTTLE_ERROR_CODES:
+                return None
+        elif not isinstance(error, requests.exceptions.RequestException):
+            return None
+
+        backoff = min(
+            settings.OUTBOUND_RETRY_BACKOFF_MAX,
+            settings.OUTBOUND_RETRY_BACKOFF_BASE * 2 ** (attempt - 1)
+        )
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+    @staticmethod
+    def mark_sent(message: Message, platform_message_id: str) -> None:
+        """
+        Record a successful send and notify the user
+
+        The webhook echo of the message can be stored before this runs; that
+        copy is dropped, and taken out of the analytics counters, so the
+        queued message keeps the platform ID and is counted once.
+
+        Args:
+            message: Claimed outbound message
+            platform_message_id: Message ID returned by the platform
+        """
+        def record():
+            return Message.objects.filter(pk=message.pk, status='sending').update(
+                status='sent',
+                platform_message_id=platform_message_id,
+                updated_at=timezone.now()
+            )
+
+        try:
+            with transaction.atomic():
+                updated = record()
+        except IntegrityError:
+            with transaction.atomic():
+                echoes = list(Message.objects.filter(
+                    platform_message_id=platform_message_id, is_incoming=False
+                ).exclude(pk=message.pk).select_for_update())
+                # The echo was counted when stored, and so was the queued message
+                AnalyticsService.unrecord_messages(message.platform_account.platform, echoes)
+                Message.objects.filter(pk__in=[echo.pk for echo in echoes]).delete()
+                updated = record()
+                MessageService.refresh_last_message([message.conversation_id])
+
+        if updated:
+            message.status = 'sent'
+            message.platform_message_id = platform_message_id
+            OutboundService.broadcast_status(message)
+
+    @staticmethod
+    def mark_attempt_failed(message: Message, error: Exception) -> Optional[float]:
+        """
+        Record a failed send attempt
+
+        The message goes back to `pending` if it will be retried and to
+        `failed` otherwise. Waiting for the rate limiter does not count as
+        an attempt.
+
+        Args:
+            message: Claimed outbound message
+            error: Exception raised by send_to_platform
+
+        Returns:
+            Seconds until the next attempt, or None if the message failed
+        """
+        attempts = message.metadata.get('send_attempts', 0)
+        if not isinstance(error, RateLimitDeferred):
+            attempts += 1
+        delay = OutboundService.retry_delay(error, attempts)
+
+        message.status = 'pending' if delay is not None else 'failed'
+        message.metadata = {**message.metadata, 'send_attempts': attempts, 'send_error': str(error)[:500]}
+        updated = Message.objects.filter(pk=message.pk, status='sending').update(
+            status=message.status,
+            metadata=message.metadata,
+            updated_at=timezone.now()
+        )
+        if updated and delay is None:
+            OutboundService.broadcast_status(message)
+        return delay
+
+    @staticmethod
+    def stalled_message_ids(limit: int = 1000) -> List[str]:
+        """
+        Get outbound messages whose delivery task was lost
+
+        These are pending messages older than any retry backoff (their task
+        was never enqueued, or the broker dropped it) and sends claimed by a
+        worker that died.
+
+        Args:
+            limit: Maximum number of IDs to return
+
+        Returns:
+            Message IDs to enqueue again
+        """
+        now = timezone.now()
+        claim_timeout = timedelta(seconds=settings.OUTBOUND_SEND_CLAIM_TIMEOUT)
+        pending_timeout = claim_timeout + timedelta(seconds=settings.OUTBOUND_RETRY_BACKOFF_MAX)
+        return [
+            str(pk) for pk in Message.objects.filter(
+                Q(status='pending', updated_at__lt=now - pending_timeout) |
+                Q(status='sending', updated_at__lt=now - claim_timeout)
+            ).values_list('id', flat=True)[:limit]
+        ]
+
+    @staticmethod
+    def broadcast_status(message: Message) -> None:
+        """
+        Send a message_status event to the owner's WebSocket group
+
+        Args:
+            message: Message with its new status set
+        """
+        event: Dict[str, Any] = {
+            'message_id': str(message.id),
+            'conversation_id': str(message.conversation_id),
+            'status': message.status,
+            'platform_message_id': message.platform_message_id,
+        }
+        if message.status == 'failed':
+            event['error'] = message.metadata.get('send_error')
+
+        event_stream.publish([(message.user_id, {'type': 'message_status', 'message': event})])
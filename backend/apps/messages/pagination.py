@@ -0,0 +1,148 @@
+"""
+Keyset pagination for conversation and message lists
+"""
+import base64
+import json
+import uuid
+from typing import Any, Dict, Optional
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on (ordering_field, id), newest first.
+
+    Each page continues strictly after the last row of the previous page,
+    so fetching a page is an index range scan of page_size rows no matter
+    how deep it is, and no COUNT(*) is run. The id breaks ties between rows
+    with the same timestamp. Responses carry a `next` link only.
+    """
+
+    ordering_field = None
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def encode_cursor(self, instance) -> str:
+        """
+        Build the cursor continuing after a row
+
+        Args:
+            instance: Last row of a page
+
+        Returns:
+            Opaque, URL-safe cursor
+        """
+        position = [getattr(instance, self.ordering_field).isoformat(), str(instance.pk)]
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def decode_cursor(self, cursor: str):
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            value = parse_datetime(value)
+            pk = uuid.UUID(str(pk))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if value is None:
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk
+
+    def order(self, queryset):
+        return queryset.order_by(f'-{self.ordering_field}', '-id')
+
+    def apply_cursor(self, queryset, cursor: Optional[str]):
+        """
+        Restrict an ordered queryset to the rows after a cursor
+
+        Written as a range plus an exclusion of the tied rows already seen,
+        which keeps the (ordering_field, id) index usable as a range scan.
+
+        Args:
+            queryset: Queryset ordered by order()
+            cursor: Cursor from encode_cursor, or None for the first page
+
+        Returns:
+            Filtered queryset
+
+        Raises:
+            NotFound: If the cursor is malformed
+        """
+        if not cursor:
+            return queryset
+        value, pk = self.decode_cursor(cursor)
+        return queryset.filter(**{f'{self.ordering_field}__lte': value}).exclude(
+            **{self.ordering_field: value, 'id__gte': pk}
+        )
+
+    def paginate(self, queryset, cursor: Optional[str], page_size: int):
+        """
+        Fetch one page of an unordered queryset
+
+        Args:
+            queryset: Queryset to page through
+            cursor: Cursor of the page, None for the first page
+            page_size: Number of rows per page
+
+        Returns:
+            Tuple of (rows, cursor of the next page or None)
+        """
+        rows = list(self.apply_cursor(self.order(queryset), cursor)[:page_size + 1])
+        if len(rows) <= page_size:
+            return rows, None
+        rows = rows[:page_size]
+        return rows, self.encode_cursor(rows[-1])
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        rows, self.next_cursor = self.paginate(
+            queryset,
+            request.query_params.get(self.cursor_query_param),
+            self.get_page_size(request)
+        )
+        return rows
+
+    def get_next_link(self) -> Optional[str]:
+        if not self.next_cursor:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data) -> Response:
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class ConversationPagination(KeysetPagination):
+    """Conversations by most recent activity"""
+
+    ordering_field = 'last_message_at'
+
+
+class MessagePagination(KeysetPagination):
+    """Messages newest first"""
+
+    ordering_field = 'sent_at'
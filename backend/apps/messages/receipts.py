@@ -0,0 +1,204 @@
+"""
+Delivery and read receipts for outbound messages
+"""
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import redis
+from django.conf import settings
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Coalesce, Least
+from django.utils import timezone
+
+from config.redis import get_redis, redis_failed
+from .models import Message
+from .stream import event_stream
+
+logger = logging.getLogger(__name__)
+
+# Order of delivery states; a receipt only ever moves a message forward.
+# A late "failed" does not undo a delivery, a late "sent" does not undo a failure.
+STATUS_RANK = {'pending': 0, 'sending': 1, 'sent': 2, 'failed': 3, 'delivered': 4, 'read': 5}
+
+
+def _parse_timestamp(value) -> Optional[datetime]:
+    try:
+        return datetime.fromtimestamp(int(value), tz=dt_timezone.utc)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+class StatusService:
+    """
+    Apply platform status events (sent/delivered/read/failed) to outbound messages.
+
+    Events are folded per platform_message_id first, then written with one
+    UPDATE per distinct (status, delivered_at, read_at) combination. Status
+    webhooks carry second-resolution timestamps, so a batch collected over a
+    short window needs only a handful of statements however many events it
+    holds. Owners get one `message_receipts` WebSocket event per batch.
+    """
+
+    @staticmethod
+    def fold(events: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Reduce status events to the furthest state seen per message
+
+        Args:
+            events: Parsed status events with message_id, status and timestamp
+
+        Returns:
+            Dict of platform_message_id -> {'status', 'delivered_at', 'read_at', 'error'}
+        """
+        receipts = {}
+        for event in events:
+            status = event.get('status')
+            message_id = event.get('message_id')
+            if status not in STATUS_RANK or not message_id:
+                continue
+
+            receipt = receipts.setdefault(
+                message_id, {'status': status, 'delivered_at': None, 'read_at': None, 'error': None}
+            )
+            if STATUS_RANK[status] > STATUS_RANK[receipt['status']]:
+                receipt['status'] = status
+
+            at = _parse_timestamp(event.get('timestamp'))
+            if status == 'failed':
+                receipt['error'] = event.get('error') or receipt['error']
+            elif at and status in ('delivered', 'read'):
+                # Reading implies delivery; keep the earliest time of each
+                receipt['delivered_at'] = min(filter(None, [receipt['delivered_at'], at]))
+                if status == 'read':
+                    receipt['read_at'] = min(filter(None, [receipt['read_at'], at]))
+        return receipts
+
+    @staticmethod
+    def apply_statuses(events: List[Dict[str, Any]]) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Write a batch of status events and broadcast the resulting changes
+
+        Args:
+            events: Parsed status events
+
+        Returns:
+            Tuple of (messages changed, events whose message is not stored yet)
+        """
+        receipts = StatusService.fold(events)
+        if not receipts:
+            return 0, []
+
+        rows = list(Message.objects.filter(
+            platform_message_id__in=list(receipts), is_incoming=False
+        ).values_list('id', 'platform_message_id', 'user_id', 'conversation_id', 'status', 'delivered_at', 'read_at'))
+
+        groups = defaultdict(list)
+        changes = defaultdict(list)
+        for pk, platform_message_id, user_id, conversation_id, status, delivered_at, read_at in rows:
+            receipt = receipts[platform_message_id]
+            advances = STATUS_RANK[receipt['status']] > STATUS_RANK.get(status, 0)
+            earlier_delivery = receipt['delivered_at'] and (not delivered_at or receipt['delivered_at'] < delivered_at)
+            earlier_read = receipt['read_at'] and (not read_at or receipt['read_at'] < read_at)
+            if not (advances or earlier_delivery or earlier_read):
+                continue
+
+            groups[(receipt['status'], receipt['delivered_at'], receipt['read_at'])].append(pk)
+            if advances:
+                changes[user_id].append({
+                    'message_id': str(pk),
+                    'conversation_id': str(conversation_id),
+                    'status': receipt['status'],
+                    'delivered_at': receipt['delivered_at'].isoformat() if receipt['delivered_at'] else None,
+                    'read_at': receipt['read_at'].isoformat() if receipt['read_at'] else None,
+                    'error': receipt['error'],
+                })
+
+        now = timezone.now()
+        for (status, delivered_at, read_at), pks in groups.items():
+            lower = [name for name, rank in STATUS_RANK.items() if rank < STATUS_RANK[status]]
+            update = {
+                # Re-checked in SQL, so concurrent flushes cannot move a message backwards
+                'status': Case(When(status__in=lower, then=Value(status)), default=F('status')),
+                'updated_at': now,
+            }
+            if delivered_at:
+                update['delivered_at'] = Least(Coalesce(F('delivered_at'), Value(delivered_at)), Value(delivered_at))
+            if read_at:
+                update['read_at'] = Least(Coalesce(F('read_at'), Value(read_at)), Value(read_at))
+            Message.objects.filter(pk__in=pks).update(**update)
+
+        event_stream.publish([
+            (user_id, {'type': 'message_receipts', 'receipts': user_changes})
+            for user_id, user_changes in changes.items()
+        ])
+
+        stored = {row[1] for row in rows}
+        unmatched = [event for event in events if event.get('message_id') not in stored]
+        return sum(len(pks) for pks in groups.values()), unmatched
+
+
+class StatusBuffer:
+    """
+    Redis list collecting status events from webhook deliveries until the
+    next flush. The first push of a window claims the flush, so one
+    flush_message_statuses task is scheduled per MESSAGE_STATUS_FLUSH_INTERVAL.
+    """
+
+    KEY_PREFIX = 'message_statuses'
+
+    def _redis(self) -> Optional[redis.Redis]:
+        return get_redis()
+
+    def _redis_failed(self, e: Exception):
+        redis_failed(e, 'applying statuses inline')
+
+    def push(self, events: List[Dict[str, Any]]) -> Optional[bool]:
+        """
+        Add status events to the buffer
+
+        Args:
+            events: Parsed status events
+
+        Returns:
+            True if the caller must schedule the flush, False if one is
+            already scheduled, None if Redis is unavailable
+        """
+        client = self._redis()
+        if client is None:
+            return None
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.rpush(f'{self.KEY_PREFIX}:events', *[json.dumps(event) for event in events])
+            pipe.set(
+                f'{self.KEY_PREFIX}:flush', 1, nx=True,
+                px=max(1, int(settings.MESSAGE_STATUS_FLUSH_INTERVAL * 1000))
+            )
+            return bool(pipe.execute()[1])
+        except redis.RedisError as e:
+            self._redis_failed(e)
+            return None
+
+    def pop(self, limit: int) -> List[Dict[str, Any]]:
+        """
+        Take up to `limit` events from the front of the buffer
+
+        Returns:
+            Parsed status events, empty when the buffer is empty or unavailable
+        """
+        client = self._redis()
+        if client is None:
+            return []
+        try:
+            pipe = client.pipeline(transaction=True)
+            pipe.lrange(f'{self.KEY_PREFIX}:events', 0, limit - 1)
+            pipe.ltrim(f'{self.KEY_PREFIX}:events', limit, -1)
+            values = pipe.execute()[0]
+        except redis.RedisError as e:
+            self._redis_failed(e)
+            return []
+        return [json.loads(value) for value in values]
+
+
+status_buffer = StatusBuffer()
@@ -0,0 +1,176 @@
+"""
+Search services
+"""
+import base64
+import json
+import math
+import re
+import uuid
+from typing import Any, List, Optional, Tuple
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, FloatField, Q, QuerySet
+from django.db.models.functions import Cast
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+
+from .pagination import MessagePagination
+
+# Text search configuration the messages search_vector trigger indexes with
+SEARCH_CONFIG = 'simple'
+
+# Terms beyond this are ignored, they only make the query slower
+MAX_SEARCH_TERMS = 8
+
+
+class SearchService:
+    """
+    Ranked full-text search over messages and name search over conversations.
+
+    On PostgreSQL messages are matched against the GIN-indexed search_vector
+    column, every term as a prefix, and ordered by ts_rank unless the search
+    is too broad to rank cheaply. Other databases fall back to unranked
+    icontains scans.
+    """
+
+    @staticmethod
+    def is_full_text(queryset: QuerySet) -> bool:
+        return connections[queryset.db].vendor == 'postgresql'
+
+    @staticmethod
+    def build_query(text: str) -> Optional[SearchQuery]:
+        """
+        Build a prefix-matching tsquery from user input
+
+        Args:
+            text: Search text as typed
+
+        Returns:
+            SearchQuery matching rows that contain every term (as a prefix),
+            or None if the text has no searchable terms
+        """
+        terms = re.findall(r'[^\W_]+', text)[:MAX_SEARCH_TERMS]
+        if not terms:
+            return None
+        return SearchQuery(' & '.join(f'{term}:*' for term in terms), search_type='raw', config=SEARCH_CONFIG)
+
+    @staticmethod
+    def filter_messages(queryset: QuerySet, text: str) -> QuerySet:
+        """
+        Restrict messages to those matching the search text
+
+        Args:
+            queryset: Messages the user may see
+            text: Search text
+
+        Returns:
+            Unordered queryset of matching messages
+        """
+        if not SearchService.is_full_text(queryset):
+            return queryset.filter(Q(content__icontains=text) | Q(sender_name__icontains=text))
+
+        query = SearchService.build_query(text)
+        if query is None:
+            return queryset.none()
+        return queryset.filter(search_vector=query)
+
+    @staticmethod
+    def search_messages(
+        matches: QuerySet,
+        text: str,
+        cursor: Optional[str],
+        limit: int,
+        rank: bool = True
+    ) -> Tuple[List[Any], Optional[str]]:
+        """
+        Get one page of search results
+
+        Ranking reads every match, so broad searches are ordered by recency
+        instead, which the (sent_at, id) index serves without visiting all
+        matches. A cursor keeps the order of the page it was issued for.
+
+        Args:
+            matches: Messages returned by filter_messages for the same text
+            text: Search text
+            cursor: Cursor returned with the previous page, None for the first
+            limit: Page size
+            rank: Order by relevance rather than recency (full-text search only)
+
+        Returns:
+            Tuple of (messages, cursor of the next page or None)
+
+        Raises:
+            NotFound: If the cursor is malformed
+        """
+        position = SearchService._decode_cursor(cursor) if cursor else None
+        if position is not None:
+            rank = len(position) == 3
+
+        query = SearchService.build_query(text)
+        if not rank or query is None or not SearchService.is_full_text(matches):
+            return MessagePagination().paginate(matches, cursor, limit)
+
+        # ts_rank is a float4, whose text form does not round-trip; compare it as float8
+        ranked = matches.annotate(
+            rank=Cast(SearchRank(F('search_vector'), query), FloatField())
+        ).order_by('-rank', '-sent_at', '-id')
+        if position is not None:
+            rank_value, sent_at, pk = position
+            ranked = ranked.filter(
+                Q(rank__lt=rank_value) |
+                Q(rank=rank_value, sent_at__lt=sent_at) |
+                Q(rank=rank_value, sent_at=sent_at, id__lt=pk)
+            )
+
+        rows = list(ranked[:limit + 1])
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        last = rows[-1]
+        position = [last.rank, last.sent_at.isoformat(), str(last.pk)]
+        return rows, base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> list:
+        # Ranked cursors are [rank, sent_at, id]; recency cursors are checked by MessagePagination
+        invalid = NotFound(MessagePagination.invalid_cursor_message)
+        try:
+            position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except ValueError:
+            raise invalid
+        if not isinstance(position, list) or len(position) not in (2, 3):
+            raise invalid
+        if len(position) == 2:
+            return position
+
+        try:
+            rank_value, sent_at, pk = float(position[0]), parse_datetime(position[1]), uuid.UUID(str(position[2]))
+        except (TypeError, ValueError):
+            raise invalid
+        if sent_at is None or not math.isfinite(rank_value):
+            raise invalid
+        return [rank_value, sent_at, pk]
+
+    @staticmethod
+    def estimate_count(queryset: QuerySet) -> int:
+        """
+        Count the rows of a queryset, estimating large counts
+
+        Counts exactly up to SEARCH_RANK_LIMIT rows. Beyond that the
+        PostgreSQL planner's row estimate is used, so broad searches do not
+        pay for counting every match.
+
+        Args:
+            queryset: Unsliced queryset
+
+        Returns:
+            Exact count, or an estimate above SEARCH_RANK_LIMIT
+        """
+        exact_limit = settings.SEARCH_RANK_LIMIT
+        count = queryset.order_by()[:exact_limit + 1].count()
+        if count <= exact_limit or not SearchService.is_full_text(queryset):
+            return count
+
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        return max(int(plan[0]['Plan']['Plan Rows']), count)
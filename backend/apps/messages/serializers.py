@@ -26,12 +26,14 @@ class MessageSerializer(serializers.ModelSerializer):
             'sender_name',
             'is_incoming',
             'is_read',
+            'status',
+            'client_message_id',
             'read_at',
             'delivered_at',
             'sent_at',
             'created_at',
         ]
-        read_only_fields = ['id', 'platform_message_id', 'created_at', 'sent_at']
+        read_only_fields = ['id', 'platform_message_id', 'status', 'client_message_id', 'created_at', 'sent_at']
 
 
 class ConversationSerializer(serializers.ModelSerializer):
@@ -58,15 +60,14 @@ class ConversationSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'platform_conversation_id', 'created_at']
 
     def get_last_message(self, obj):
-        """Get the last message in the conversation"""
-        last_msg = obj.messages.order_by('-sent_at').first()
-        if last_msg:
+        """Get the last message in the conversation from its stored snapshot"""
+        if obj.last_message_id:
             return {
-                'id': str(last_msg.id),
-                'content': last_msg.content[:100],  # Preview
-                'sender_name': last_msg.sender_name,
-                'sent_at': last_msg.sent_at,
-                'is_read': last_msg.is_read,
+                'id': str(obj.last_message_id),
+                'content': obj.last_message_preview,
+                'sender_name': obj.last_message_sender_name,
+                'sent_at': obj.last_message_sent_at,
+                'is_read': obj.last_message_is_read,
             }
         return None
 
@@ -75,15 +76,22 @@ class ConversationDetailSerializer(ConversationSerializer):
     """Detailed serializer with recent messages"""
 
     messages = serializers.SerializerMethodField()
+    messages_cursor = serializers.SerializerMethodField()
 
     class Meta(ConversationSerializer.Meta):
-        fields = ConversationSerializer.Meta.fields + ['messages']
+        fields = ConversationSerializer.Meta.fields + ['messages', 'messages_cursor']
 
     def get_messages(self, obj):
-        """Get recent messages with optional limit from context"""
-        messages_limit = self.context.get('messages_limit', 50)
-        recent_messages = obj.messages.all().order_by('-sent_at')[:messages_limit]
-        return MessageSerializer(recent_messages, many=True).data
+        """Get the page of messages from context, or the most recent ones"""
+        messages = self.context.get('messages')
+        if messages is None:
+            messages_limit = self.context.get('messages_limit', 50)
+            messages = obj.messages.all().order_by('-sent_at', '-id')[:messages_limit]
+        return MessageSerializer(messages, many=True).data
+
+    def get_messages_cursor(self, obj):
+        """Get the cursor of the next batch of older messages, if any"""
+        return self.context.get('messages_cursor')
 
 
 class SendMessageSerializer(serializers.Serializer):
@@ -96,6 +104,10 @@ class SendMessageSerializer(serializers.Serializer):
         help_text="Type of message"
     )
     media_url = serializers.URLField(required=False, allow_blank=True, help_text="URL for media messages")
+    client_message_id = serializers.CharField(
+        required=False, max_length=64,
+        help_text="Idempotency key; resending with the same key returns the first message"
+    )
 
     def validate(self, data):
         """Validate that media_url is provided for non-text messages"""
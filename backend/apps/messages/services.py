@@ -2,16 +2,36 @@
 Message processing and storage services
 """
 import logging
-from typing import Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest, Left
 from django.utils import timezone
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from dateutil import parser as date_parser
 
-from .models import Conversation, Message
+from .broadcast import message_broadcaster
+from .models import Conversation, Message, SyncCheckpoint
+from apps.analytics.services import AnalyticsService
+from apps.platforms.cache import account_resolver
 from apps.platforms.models import PlatformAccount
+from apps.platforms.services import GRAPH_BATCH_LIMIT, token_concurrency_slot
 
 logger = logging.getLogger(__name__)
 
+# Platform display names sent with WebSocket events
+PLATFORM_NAMES = dict(PlatformAccount.PLATFORM_CHOICES)
+
+# Conversation columns holding the snapshot of its newest message
+LAST_MESSAGE_FIELDS = [
+    'last_message_id',
+    'last_message_preview',
+    'last_message_sender_name',
+    'last_message_sent_at',
+    'last_message_is_read',
+]
+
 
 class MessageService:
     """
@@ -31,183 +51,307 @@ class MessageService:
             Created Message instance or None
         """
         try:
-            # Find the platform account
-            if platform in ['instagram', 'messenger']:
-                # For Instagram and Messenger, match by platform_user_id
-                recipient_id = event_data.get('recipient_id')
-                platform_account = PlatformAccount.objects.filter(
-                    platform=platform,
-                    platform_user_id__in=[recipient_id, event_data.get('sender_id')]
-                ).first()
-            elif platform == 'whatsapp':
-                # For WhatsApp, match by phone number in metadata
-                platform_account = PlatformAccount.objects.filter(
-                    platform='whatsapp',
-                    is_active=True
-                ).first()
-            else:
-                logger.error(f'Unknown platform: {platform}')
-                return None
+            messages = MessageService.process_webhook_batch(platform, [event_data])
+            return messages[0] if messages else None
+
+        except Exception as e:
+            logger.error(f'Error processing webhook message: {e}')
+            return None
+
+    @staticmethod
+    def process_webhook_batch(platform: str, events: Iterable[Dict[str, Any]]) -> List[Message]:
+        """
+        Store every message of a webhook payload in one transaction
+
+        Conversations and messages are written with bulk inserts, so the number
+        of queries grows with the number of conversations touched rather than
+        with the number of messages in the payload.
 
+        Args:
+            platform: Platform name (instagram, messenger, whatsapp)
+            events: Parsed events from the platform service's parse_webhook_events
+
+        Returns:
+            List of newly created Message instances
+        """
+        if platform not in ['instagram', 'messenger', 'whatsapp']:
+            logger.error(f'Unknown platform: {platform}')
+            return []
+
+        # Resolve account and conversation key for each message event
+        accounts = {}
+        resolved = []
+        for event_data in events:
+            if event_data.get('event_type') == 'status' or not event_data.get('message_id'):
+                continue
+
+            platform_account = MessageService._resolve_platform_account(platform, event_data, accounts)
             if not platform_account:
                 logger.warning(f'No platform account found for {platform} event')
-                return None
+                continue
 
-            # Get or create conversation
-            conversation = MessageService._get_or_create_conversation(
-                platform_account, event_data
-            )
+            platform_conversation_id = event_data.get('conversation_id') or event_data.get('sender_id')
+            if not platform_conversation_id:
+                logger.error('No conversation_id or sender_id in event data')
+                continue
 
-            if not conversation:
-                logger.error('Failed to create/get conversation')
-                return None
-
-            # Check if message already exists (prevent duplicates)
-            message_id = event_data.get('message_id')
-            if Message.objects.filter(platform_message_id=message_id).exists():
-                logger.debug(f'Message {message_id} already exists, skipping')
-                return None
-
-            # Determine message type
-            message_type = event_data.get('message_type', 'text')
-            if message_type not in ['text', 'image', 'video', 'audio', 'file', 'sticker', 'location']:
-                message_type = 'text'
-
-            # Create message
-            message = Message.objects.create(
-                conversation=conversation,
-                platform_account=platform_account,
-                platform_message_id=message_id,
-                message_type=message_type,
-                content=event_data.get('message_text', ''),
-                media_url=event_data.get('media_url'),
-                sender_id=event_data.get('sender_id'),
-                sender_name=event_data.get('sender_name', event_data.get('sender_id')),
-                is_incoming=not event_data.get('is_echo', False),
-                sent_at=timezone.now(),
-            )
+            resolved.append((platform_account, platform_conversation_id, event_data))
 
-            # Update conversation
-            conversation.last_message_at = message.sent_at
-            if message.is_incoming and not message.is_read:
-                conversation.unread_count += 1
-            conversation.save()
+        if not resolved:
+            return []
 
-            # Broadcast message via WebSocket
-            MessageService._broadcast_message(platform_account.user_id, message)
+        with transaction.atomic():
+            wanted = {}
+            for platform_account, platform_conversation_id, event_data in resolved:
+                sender_id = event_data.get('sender_id')
+                wanted.setdefault((platform_account.id, platform_conversation_id), (platform_account, {
+                    'participant_id': sender_id or 'unknown',
+                    'participant_name': event_data.get('sender_name', sender_id) or 'Unknown User',
+                }))
+            conversations = MessageService._get_or_create_conversations(wanted)
+
+            # Check which messages already exist (prevent duplicates)
+            seen_ids = set(Message.objects.filter(
+                platform_message_id__in=[event_data['message_id'] for _, _, event_data in resolved]
+            ).values_list('platform_message_id', flat=True))
+
+            now = timezone.now()
+            messages = []
+            for platform_account, platform_conversation_id, event_data in resolved:
+                message_id = event_data['message_id']
+                if message_id in seen_ids:
+                    logger.debug(f'Message {message_id} already exists, skipping')
+                    continue
+                seen_ids.add(message_id)
+
+                # Determine message type
+                message_type = event_data.get('message_type', 'text')
+                if message_type not in ['text', 'image', 'video', 'audio', 'file', 'sticker', 'location']:
+                    message_type = 'text'
+
+                messages.append(Message(
+                    conversation=conversations[(platform_account.id, platform_conversation_id)],
+                    platform_account=platform_account,
+                    user_id=platform_account.user_id,
+                    platform_message_id=message_id,
+                    message_type=message_type,
+                    content=event_data.get('message_text', ''),
+                    media_url=event_data.get('media_url'),
+                    sender_id=event_data.get('sender_id'),
+                    sender_name=event_data.get('sender_name', event_data.get('sender_id')),
+                    is_incoming=not event_data.get('is_echo', False),
+                    sent_at=now,
+                ))
+
+            # Redeliveries racing this one are dropped here and must not be counted or broadcast again
+            messages = MessageService._insert_new_messages(messages)
+            AnalyticsService.record_messages(platform, messages)
+
+            # Update conversations, one statement per conversation touched
+            touched = {}
+            for message in messages:
+                latest, unread = touched.get(message.conversation_id, (message, 0))
+                if message.is_incoming and not message.is_read:
+                    unread += 1
+                if message.sent_at >= latest.sent_at:
+                    latest = message
+                touched[message.conversation_id] = (latest, unread)
+
+            for conversation_id, (latest, unread) in touched.items():
+                Conversation.objects.filter(pk=conversation_id).update(
+                    last_message_at=Greatest(F('last_message_at'), Value(latest.sent_at)),
+                    unread_count=F('unread_count') + unread,
+                    updated_at=now,
+                    **MessageService.last_message_update(latest),
+                )
+
+        # Broadcast messages via WebSocket, one event per user
+        with message_broadcaster.collect():
+            for message in messages:
+                MessageService._broadcast_message(message.user_id, message, platform)
+
+        logger.info(f'Stored {len(messages)} of {len(resolved)} {platform} webhook messages')
+        return messages
+
+    @staticmethod
+    def _insert_new_messages(messages: List[Message]) -> List[Message]:
+        """
+        Bulk insert messages, skipping platform_message_ids stored concurrently
 
-            logger.info(f'Stored message {message_id} from {platform}')
-            return message
+        Args:
+            messages: Unsaved Message instances
 
-        except Exception as e:
-            logger.error(f'Error processing webhook message: {e}')
-            return None
+        Returns:
+            The messages that were inserted by this call
+        """
+        if not messages:
+            return []
+        Message.objects.bulk_create(messages, ignore_conflicts=True)
+        # Primary keys are generated here, so a matching one means this call inserted the row
+        inserted = set(
+            Message.objects.filter(pk__in=[message.pk for message in messages]).values_list('pk', flat=True)
+        )
+        if len(inserted) < len(messages):
+            logger.debug(f'Skipped {len(messages) - len(inserted)} messages stored concurrently')
+        return [message for message in messages if message.pk in inserted]
 
     @staticmethod
-    def _get_or_create_conversation(
-        platform_account: PlatformAccount,
-        event_data: Dict[str, Any]
-    ) -> Optional[Conversation]:
+    def _resolve_platform_account(
+        platform: str,
+        event_data: Dict[str, Any],
+        accounts: Dict[Any, Optional[PlatformAccount]]
+    ) -> Optional[PlatformAccount]:
         """
-        Get or create a conversation for a message
+        Find the platform account a webhook event belongs to
 
         Args:
-            platform_account: PlatformAccount instance
-            event_data: Event data containing conversation info
+            platform: Platform name (instagram, messenger, whatsapp)
+            event_data: Parsed event data from platform service
+            accounts: Per-batch memo of lookups already made
 
         Returns:
-            Conversation instance or None
+            PlatformAccount instance or None
         """
-        try:
-            # Extract conversation identifier
-            conversation_id = event_data.get('conversation_id')
-            sender_id = event_data.get('sender_id')
-            sender_name = event_data.get('sender_name', sender_id)
+        if platform in ['instagram', 'messenger']:
+            # For Instagram and Messenger, match by platform_user_id; the
+            # account is the recipient, or the sender for echoes
+            routing_keys = [event_data.get('recipient_id'), event_data.get('sender_id')]
+        else:
+            # For WhatsApp, route by the phone number ID the webhook was sent to
+            routing_keys = [event_data.get('phone_number_id')]
+
+        for routing_key in filter(None, routing_keys):
+            key = (platform, routing_key)
+            if key not in accounts:
+                accounts[key] = account_resolver.get_account(platform, routing_key)
+            if accounts[key]:
+                return accounts[key]
+        return None
 
-            if not conversation_id and not sender_id:
-                logger.error('No conversation_id or sender_id in event data')
-                return None
+    @staticmethod
+    def _get_or_create_conversations(
+        wanted: Dict[Tuple[Any, str], Tuple[PlatformAccount, Dict[str, Any]]]
+    ) -> Dict[Tuple[Any, str], Conversation]:
+        """
+        Get or create many conversations with a constant number of queries
 
-            # Use sender_id as conversation_id if not provided
-            platform_conversation_id = conversation_id or sender_id
+        Args:
+            wanted: (platform account, defaults) keyed by
+                    (platform account id, platform conversation id)
 
-            # Get or create conversation
-            conversation, created = Conversation.objects.get_or_create(
-                platform_account=platform_account,
-                platform_conversation_id=platform_conversation_id,
-                defaults={
-                    'participant_id': sender_id or 'unknown',
-                    'participant_name': sender_name or 'Unknown User',
-                    'last_message_at': timezone.now(),
-                }
+        Returns:
+            Conversations keyed by (platform account id, platform conversation id)
+        """
+        def fetch(keys):
+            found = Conversation.objects.filter(
+                platform_account_id__in={account_id for account_id, _ in keys},
+                platform_conversation_id__in={conversation_id for _, conversation_id in keys},
             )
+            return {
+                (conversation.platform_account_id, conversation.platform_conversation_id): conversation
+                for conversation in found
+                if (conversation.platform_account_id, conversation.platform_conversation_id) in keys
+            }
 
-            if created:
-                logger.info(f'Created new conversation {platform_conversation_id}')
-
-            return conversation
+        conversations = fetch(set(wanted))
+        missing = set(wanted) - set(conversations)
+
+        if missing:
+            now = timezone.now()
+            new_conversations = []
+            for key in missing:
+                platform_account, defaults = wanted[key]
+                new_conversations.append(Conversation(
+                    platform_account=platform_account,
+                    user_id=platform_account.user_id,
+                    platform_conversation_id=key[1],
+                    last_message_at=now,
+                    **defaults
+                ))
+
+            # Rows created concurrently by another worker are skipped and re-read
+            Conversation.objects.bulk_create(new_conversations, ignore_conflicts=True)
+            conversations.update(fetch(missing))
+            logger.info(f'Created {len(missing)} new conversations')
+
+        for key, conversation in conversations.items():
+            conversation.platform_account = wanted[key][0]
+
+        if missing:
+            # Primary keys are generated here, so a matching one means this worker inserted the row
+            inserted = {conversation.pk for conversation in new_conversations}
+            AnalyticsService.record_conversations(
+                conversation for conversation in conversations.values() if conversation.pk in inserted
+            )
 
-        except Exception as e:
-            logger.error(f'Error creating conversation: {e}')
-            return None
+        return conversations
 
     @staticmethod
-    def _broadcast_message(user_id: str, message: Message):
+    def _broadcast_message(user_id: str, message: Message, platform: str):
         """
         Broadcast new message via WebSocket to the user
 
+        The event is buffered by message_broadcaster and sent together with
+        the user's other new messages.
+
         Args:
             user_id: User ID to send message to
             message: Message instance
+            platform: Platform name (instagram, messenger, whatsapp)
         """
-        try:
-            channel_layer = get_channel_layer()
-            room_group_name = f'messages_{user_id}'
-
-            # Prepare message data
-            message_data = {
-                'id': str(message.id),
-                'conversation_id': str(message.conversation_id),
-                'platform': message.platform_account.get_platform_display(),
-                'sender_name': message.sender_name,
-                'content': message.content,
-                'message_type': message.message_type,
-                'is_incoming': message.is_incoming,
-                'sent_at': message.sent_at.isoformat(),
-            }
-
-            # Send to WebSocket group
-            async_to_sync(channel_layer.group_send)(
-                room_group_name,
-                {
-                    'type': 'new_message',
-                    'message': message_data
-                }
-            )
-
-            logger.debug(f'Broadcasted message {message.id} to user {user_id}')
-
-        except Exception as e:
-            logger.error(f'Error broadcasting message: {e}')
+        message_broadcaster.add(user_id, {
+            'id': str(message.id),
+            'conversation_id': str(message.conversation_id),
+            'platform': PLATFORM_NAMES.get(platform, platform),
+            'sender_name': message.sender_name,
+            'content': message.content,
+            'message_type': message.message_type,
+            'is_incoming': message.is_incoming,
+            'sent_at': message.sent_at.isoformat(),
+        })
 
     @staticmethod
-    def sync_platform_messages(platform_account: PlatformAccount, service_instance, limit: int = 50) -> Dict[str, Any]:
+    def sync_platform_messages(
+        platform_account: PlatformAccount,
+        service_instance,
+        limit: int = 50,
+        bulk: bool = True
+    ) -> Dict[str, Any]:
         """
-        Sync messages from a platform using its service with improved error handling
+        Incrementally sync messages from a platform using its service
+
+        Sync checkpoints remember the last seen updated_time of the account and
+        of every conversation. Conversations whose updated_time did not change
+        are skipped, and message pages are followed through paging.next only
+        until already stored messages are reached.
 
         Args:
             platform_account: PlatformAccount instance
             service_instance: Platform service instance (InstagramService, etc.)
-            limit: Maximum number of messages to fetch
+            limit: Page size for conversations and messages
+            bulk: Persist with set-based queries; False keeps the per-row path
 
         Returns:
             Sync result dictionary
         """
+        # New messages of the whole run reach the user as a few batched events
+        with message_broadcaster.collect():
+            return MessageService._sync_platform_messages(platform_account, service_instance, limit, bulk)
+
+    @staticmethod
+    def _sync_platform_messages(
+        platform_account: PlatformAccount,
+        service_instance,
+        limit: int,
+        bulk: bool
+    ) -> Dict[str, Any]:
         try:
             stats = {
                 'conversations_synced': 0,
+                'conversations_skipped': 0,
                 'messages_synced': 0,
                 'new_messages': 0,
+                'api_calls': 0,
                 'errors': 0,
             }
 
@@ -218,150 +362,194 @@ class MessageService:
                 logger.error(f'No access token for platform {platform_account.id}')
                 return {'error': 'No access token available'}
 
-            # Fetch conversations based on platform
-            conversations = []
-            try:
-                if platform_account.platform == 'instagram':
-                    ig_account_id = platform_account.metadata.get('ig_account_id')
-                    if not ig_account_id:
-                        logger.error('No Instagram account ID in metadata')
-                        return {'error': 'No Instagram account ID configured'}
-                    conversations = service_instance.get_conversations(ig_account_id, access_token, limit)
-                elif platform_account.platform == 'messenger':
-                    page_id = platform_account.platform_user_id
-                    conversations = service_instance.get_conversations(page_id, access_token, limit)
-                else:
-                    logger.warning(f'Sync not implemented for {platform_account.platform}')
-                    return {'error': f'Sync not supported for {platform_account.platform}'}
-            except Exception as e:
-                logger.error(f'Error fetching conversations: {e}')
-                return {'error': f'Failed to fetch conversations: {str(e)}'}
+            if platform_account.platform == 'instagram':
+                account_id = platform_account.metadata.get('ig_account_id')
+                if not account_id:
+                    logger.error('No Instagram account ID in metadata')
+                    return {'error': 'No Instagram account ID configured'}
+            elif platform_account.platform == 'messenger':
+                account_id = platform_account.platform_user_id
+            else:
+                logger.warning(f'Sync not implemented for {platform_account.platform}')
+                return {'error': f'Sync not supported for {platform_account.platform}'}
+
+            checkpoints = {
+                checkpoint.platform_conversation_id: checkpoint
+                for checkpoint in SyncCheckpoint.objects.filter(platform_account=platform_account)
+            }
+            account_checkpoint = checkpoints.get('') or SyncCheckpoint(
+                platform_account=platform_account, platform_conversation_id=''
+            )
+
+            # Fetch conversations updated since the last sync
+            conversations = MessageService._page_conversations(
+                service_instance, account_id, access_token, limit, account_checkpoint.updated_time, stats
+            )
+            if conversations is None:
+                return {'error': 'Failed to fetch conversations'}
 
             stats['conversations_synced'] = len(conversations)
 
-            # Process each conversation
+            wanted = {}
+            changed = []
             for conv_data in conversations:
+                conversation_id = conv_data.get('id')
+                if not conversation_id:
+                    logger.warning('Conversation missing ID, skipping')
+                    stats['errors'] += 1
+                    continue
+
+                # Skip conversations that did not change since the last sync
+                updated_time = MessageService._parse_graph_time(conv_data.get('updated_time'))
+                checkpoint = checkpoints.get(conversation_id)
+                if (checkpoint and not checkpoint.cursor and updated_time
+                        and checkpoint.updated_time == updated_time):
+                    stats['conversations_skipped'] += 1
+                    continue
+
+                # Extract participant info from conversation data
+                participants = conv_data.get('participants', {}).get('data', [])
+                participant_id = 'unknown'
+                participant_name = 'Unknown'
+
+                # Find the other participant (not the page/business account)
+                for participant in participants:
+                    if participant.get('id') != platform_account.platform_user_id:
+                        participant_id = participant.get('id', 'unknown')
+                        participant_name = participant.get('name') or participant.get('username', 'Unknown')
+                        break
+
+                wanted[(platform_account.id, conversation_id)] = (platform_account, {
+                    'participant_id': participant_id,
+                    'participant_name': participant_name,
+                })
+                changed.append((conversation_id, updated_time, checkpoint or SyncCheckpoint(
+                    platform_account=platform_account, platform_conversation_id=conversation_id
+                )))
+
+            # Look up names the conversation list did not include in one batch
+            unnamed = {
+                key: defaults for key, (_, defaults) in wanted.items()
+                if defaults['participant_name'] == 'Unknown' and defaults['participant_id'] != 'unknown'
+            }
+            if unnamed:
+                participant_ids = sorted({defaults['participant_id'] for defaults in unnamed.values()})
+                profiles = service_instance.get_user_profiles(participant_ids, access_token)
+                stats['api_calls'] += -(-len(participant_ids) // GRAPH_BATCH_LIMIT)
+                for defaults in unnamed.values():
+                    profile = profiles.get(defaults['participant_id']) or {}
+                    defaults['participant_name'] = profile.get('name') or profile.get('username') or 'Unknown'
+
+            local_conversations = MessageService._get_or_create_conversations(wanted) if bulk else {}
+            touched_conversation_ids = []
+            saved_checkpoints = []
+
+            # Fetch messages newer than the checkpoints in batches and store
+            # each conversation as soon as its pages arrive
+            fetched = MessageService._fetch_conversation_messages(
+                service_instance, changed, access_token, limit, stats
+            )
+            for conversation_id, updated_time, checkpoint, messages in fetched:
+                key = (platform_account.id, conversation_id)
                 try:
-                    conversation_id = conv_data.get('id')
-                    if not conversation_id:
-                        logger.warning('Conversation missing ID, skipping')
+                    if messages is None:
                         stats['errors'] += 1
                         continue
 
-                    # Extract participant info from conversation data
-                    participants = conv_data.get('participants', {}).get('data', [])
-                    participant_id = 'unknown'
-                    participant_name = 'Unknown'
-
-                    # Find the other participant (not the page/business account)
-                    for participant in participants:
-                        if participant.get('id') != platform_account.platform_user_id:
-                            participant_id = participant.get('id', 'unknown')
-                            participant_name = participant.get('name') or participant.get('username', 'Unknown')
-                            break
-
-                    # Get or create conversation
-                    conversation, created = Conversation.objects.get_or_create(
-                        platform_account=platform_account,
-                        platform_conversation_id=conversation_id,
-                        defaults={
-                            'participant_id': participant_id,
-                            'participant_name': participant_name,
-                            'last_message_at': timezone.now(),
-                        }
-                    )
-
-                    # Fetch messages for this conversation
-                    try:
-                        messages = service_instance.get_conversation_messages(
-                            conversation_id,
-                            access_token,
-                            limit=limit
+                    if bulk:
+                        conversation = local_conversations[key]
+                    else:
+                        conversation, created = Conversation.objects.get_or_create(
+                            platform_account=platform_account,
+                            platform_conversation_id=conversation_id,
+                            defaults={**wanted[key][1], 'last_message_at': timezone.now()}
                         )
-                    except Exception as e:
-                        logger.error(f'Error fetching messages for conversation {conversation_id}: {e}')
-                        stats['errors'] += 1
-                        continue
+                        if created:
+                            AnalyticsService.record_conversations([conversation])
 
                     stats['messages_synced'] += len(messages)
 
                     # Store new messages
-                    for msg_data in messages:
-                        try:
-                            message_id = msg_data.get('id')
-                            if not message_id:
-                                continue
-
-                            # Skip if already exists
-                            if Message.objects.filter(platform_message_id=message_id).exists():
+                    if bulk:
+                        stored = MessageService._store_synced_messages(platform_account, conversation, messages, stats)
+                        for message in stored:
+                            MessageService._broadcast_message(message.user_id, message, platform_account.platform)
+                    else:
+                        for msg_data in messages:
+                            try:
+                                message_id = msg_data.get('id')
+                                if not message_id:
+                                    continue
+
+                                # Skip if already exists
+                                if Message.objects.filter(platform_message_id=message_id).exists():
+                                    continue
+
+                                message = MessageService._build_synced_message(platform_account, conversation, msg_data)
+                                message.save()
+                                AnalyticsService.record_messages(platform_account.platform, [message])
+                                stats['new_messages'] += 1
+                                MessageService._broadcast_message(
+                                    message.user_id, message, platform_account.platform
+                                )
+
+                            except Exception as e:
+                                logger.error(f'Error creating message {msg_data.get("id")}: {e}')
+                                stats['errors'] += 1
                                 continue
 
-                            # Extract message details
-                            from_data = msg_data.get('from', {})
-                            sender_id = from_data.get('id', 'unknown')
-                            sender_name = from_data.get('name') or from_data.get('username', 'Unknown')
-
-                            # Determine if incoming (from customer) or outgoing (from page/business)
-                            is_incoming = sender_id != platform_account.platform_user_id
-
-                            # Parse timestamp
-                            created_time = msg_data.get('created_time')
-                            sent_at = timezone.now()
-                            if created_time:
-                                from dateutil import parser as date_parser
-                                try:
-                                    sent_at = date_parser.parse(created_time)
-                                except Exception:
-                                    pass
-
-                            # Determine message type and content
-                            message_text = msg_data.get('message', '')
-                            attachments = msg_data.get('attachments', {}).get('data', [])
-                            message_type = 'text'
-                            media_url = None
-
-                            if attachments:
-                                attachment = attachments[0]
-                                attachment_type = attachment.get('type', '').lower()
-                                if attachment_type in ['image', 'video', 'audio', 'file']:
-                                    message_type = attachment_type
-                                media_url = attachment.get('url') or attachment.get('image_data', {}).get('url')
-
-                            # Create message
-                            Message.objects.create(
-                                conversation=conversation,
-                                platform_account=platform_account,
-                                platform_message_id=message_id,
-                                message_type=message_type,
-                                content=message_text,
-                                media_url=media_url,
-                                sender_id=sender_id,
-                                sender_name=sender_name,
-                                is_incoming=is_incoming,
-                                sent_at=sent_at,
-                            )
-
-                            stats['new_messages'] += 1
-
-                        except Exception as e:
-                            logger.error(f'Error creating message {msg_data.get("id")}: {e}')
-                            stats['errors'] += 1
-                            continue
-
-                    # Update conversation with latest message time
                     if messages:
+                        touched_conversation_ids.append(conversation.pk)
+
+                    checkpoint.updated_time = updated_time
+                    saved_checkpoints.append(checkpoint)
+
+                except Exception as e:
+                    logger.error(f'Error processing conversation {conversation_id}: {e}')
+                    stats['errors'] += 1
+                    continue
+
+            # Update conversations with latest message time
+            if touched_conversation_ids:
+                if bulk:
+                    MessageService.refresh_last_message(touched_conversation_ids)
+                else:
+                    for conversation in Conversation.objects.filter(pk__in=touched_conversation_ids):
                         latest_message = Message.objects.filter(
                             conversation=conversation
                         ).order_by('-sent_at').first()
 
                         if latest_message:
                             conversation.last_message_at = latest_message.sent_at
-                            conversation.save()
-
-                except Exception as e:
-                    logger.error(f'Error processing conversation {conv_data.get("id")}: {e}')
-                    stats['errors'] += 1
-                    continue
+                            conversation.last_message_id = latest_message.id
+                            conversation.last_message_preview = (latest_message.content or '')[:100]
+                            conversation.last_message_sender_name = latest_message.sender_name or ''
+                            conversation.last_message_sent_at = latest_message.sent_at
+                            conversation.last_message_is_read = latest_message.is_read
+                            conversation.save(update_fields=[
+                                'last_message_at', *LAST_MESSAGE_FIELDS, 'updated_at'
+                            ])
+
+            # Only move the account checkpoint forward when nothing was missed
+            if not stats['errors']:
+                newest_updated_time = max(
+                    filter(None, [account_checkpoint.updated_time] + [
+                        MessageService._parse_graph_time(conv_data.get('updated_time'))
+                        for conv_data in conversations
+                    ]),
+                    default=None
+                )
+                if newest_updated_time:
+                    account_checkpoint.updated_time = newest_updated_time
+                    saved_checkpoints.append(account_checkpoint)
+
+            if saved_checkpoints:
+                SyncCheckpoint.objects.bulk_create(
+                    saved_checkpoints,
+                    update_conflicts=True,
+                    unique_fields=['platform_account', 'platform_conversation_id'],
+                    update_fields=['updated_time', 'newest_message_at', 'cursor', 'cursor_until', 'updated_at'],
+                )
 
             logger.info(f'Sync completed for {platform_account.platform}: {stats}')
             return stats
@@ -369,3 +557,385 @@ class MessageService:
         except Exception as e:
             logger.error(f'Error syncing platform messages: {e}')
             return {'error': str(e)}
+
+    @staticmethod
+    def _parse_graph_time(value: Optional[str]):
+        """Parse a Graph API timestamp, returning None when missing or invalid"""
+        if not value:
+            return None
+        try:
+            return date_parser.parse(value)
+        except Exception:
+            return None
+
+    @staticmethod
+    def _page_conversations(
+        service_instance,
+        account_id: str,
+        access_token: str,
+        limit: int,
+        until,
+        stats: Dict[str, Any]
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Fetch conversations updated after `until`, following paging.next
+
+        Without a checkpoint only the first page is fetched.
+
+        Args:
+            service_instance: Platform service instance
+            account_id: Instagram account ID or Page ID
+            access_token: Page access token
+            limit: Page size
+            until: updated_time of the account checkpoint, or None
+            stats: Sync stats to update
+
+        Returns:
+            List of conversation objects, or None if the first page failed
+        """
+        conversations = []
+        after = None
+
+        for _ in range(settings.SYNC_MAX_PAGES):
+            response = service_instance.get_conversations_page(account_id, access_token, limit, after=after)
+            stats['api_calls'] += 1
+            if 'data' not in response:
+                if not conversations:
+                    return None
+                stats['errors'] += 1
+                break
+
+            page = response['data']
+            conversations.extend(page)
+
+            # Conversations come most recently updated first
+            reached_checkpoint = until is None or any(
+                (MessageService._parse_graph_time(conv_data.get('updated_time')) or until) <= until
+                for conv_data in page
+            )
+            after = response.get('paging', {}).get('cursors', {}).get('after')
+            if reached_checkpoint or not response.get('paging', {}).get('next') or not after:
+                break
+
+        return conversations
+
+    @staticmethod
+    def _fetch_conversation_messages(
+        service_instance,
+        changed: List[Tuple[str, Any, SyncCheckpoint]],
+        access_token: str,
+        limit: int,
+        stats: Dict[str, Any]
+    ) -> Iterator[Tuple[str, Any, SyncCheckpoint, Optional[List[Dict[str, Any]]]]]:
+        """
+        Fetch the messages newer than their checkpoint for many conversations
+
+        Pages are fetched in rounds: every round requests the next page of all
+        unfinished conversations with Graph API batch requests, so N
+        conversations cost ceil(N/50) calls per round instead of N.
+        A conversation is finished once a message at or before its
+        newest_message_at is reached. If SYNC_MAX_PAGES runs out first, the
+        cursor is kept on the checkpoint and the catch-up resumes from it on
+        the next sync. Checkpoints are updated in place but not saved.
+
+        Args:
+            service_instance: Platform service instance
+            changed: (platform conversation id, updated_time, checkpoint) tuples
+            access_token: Page access token
+            limit: Page size
+            stats: Sync stats to update
+
+        Yields:
+            (platform conversation id, updated_time, checkpoint, messages or None)
+            as conversations finish
+        """
+        pending = [
+            {
+                'item': item,
+                'messages': [],
+                'after': None,
+                'until': item[2].newest_message_at,
+                'pages': 0,
+                'resuming': False,
+            }
+            for item in changed
+        ]
+
+        while pending:
+            responses = MessageService._fetch_message_pages(
+                service_instance, [(state['item'][0], state['after']) for state in pending],
+                access_token, limit, stats
+            )
+
+            unfinished = []
+            for state, response in zip(pending, responses):
+                if MessageService._advance_message_paging(state, response):
+                    yield (*state['item'], state['messages'])
+                else:
+                    unfinished.append(state)
+            pending = unfinished
+
+    @staticmethod
+    def _fetch_message_pages(
+        service_instance,
+        pages: List[Tuple[str, Optional[str]]],
+        access_token: str,
+        limit: int,
+        stats: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        """
+        Fetch one message page per conversation, one batch request per 50
+
+        Up to SYNC_FETCH_CONCURRENCY batches are sent at once, and no more than
+        META_MAX_CONCURRENCY_PER_TOKEN of them share one token.
+
+        Args:
+            service_instance: Platform service instance
+            pages: (platform conversation id, after) tuples
+            access_token: Page access token
+            limit: Page size
+            stats: Sync stats to update
+
+        Returns:
+            One Graph API response per tuple, in order; empty dict on error
+        """
+        chunks = [pages[start:start + GRAPH_BATCH_LIMIT] for start in range(0, len(pages), GRAPH_BATCH_LIMIT)]
+
+        def fetch(chunk):
+            with token_concurrency_slot(access_token):
+                return service_instance.get_conversation_messages_pages(chunk, access_token, limit)
+
+        width = min(settings.SYNC_FETCH_CONCURRENCY, len(chunks))
+        if width <= 1:
+            results = list(map(fetch, chunks))
+        else:
+            with ThreadPoolExecutor(max_workers=width, thread_name_prefix='sync-fetch') as executor:
+                results = list(executor.map(fetch, chunks))
+
+        stats['api_calls'] += len(chunks)
+        return [response for chunk_responses in results for response in chunk_responses]
+
+    @staticmethod
+    def _advance_message_paging(state: Dict[str, Any], response: Dict[str, Any]) -> bool:
+        """
+        Apply one fetched message page to a conversation's paging state
+
+        Args:
+            state: Paging state built by _fetch_conversation_messages
+            response: Graph API response for the page, empty dict on error
+
+        Returns:
+            True when the conversation is finished; state['messages'] is None
+            if its pages could not be fetched
+        """
+        conversation_id, _, checkpoint = state['item']
+
+        if 'data' not in response:
+            logger.error(f'Error fetching messages: failed to fetch messages for conversation {conversation_id}')
+            state['messages'] = None
+            return True
+
+        page = response['data']
+        state['messages'].extend(page)
+        state['pages'] += 1
+
+        # Messages come newest first; without a checkpoint take one page
+        until = state['until']
+        reached = until is None or any(
+            (MessageService._parse_graph_time(msg_data.get('created_time')) or until) <= until
+            for msg_data in page
+        )
+        after = response.get('paging', {}).get('cursors', {}).get('after')
+        if reached or not response.get('paging', {}).get('next') or not after:
+            after = None
+        elif state['pages'] < settings.SYNC_MAX_PAGES:
+            state['after'] = after
+            return False
+
+        if not state['resuming']:
+            if after:
+                # Head pass ran out of pages, resume below it next time
+                if not checkpoint.cursor:
+                    checkpoint.cursor_until = checkpoint.newest_message_at
+                checkpoint.cursor = after
+            elif checkpoint.cursor:
+                # Continue the catch-up left unfinished by an earlier sync
+                state.update(after=checkpoint.cursor, until=checkpoint.cursor_until, pages=0, resuming=True)
+                return False
+        else:
+            checkpoint.cursor = after
+            if not after:
+                checkpoint.cursor_until = None
+
+        checkpoint.newest_message_at = max(
+            filter(None, [checkpoint.newest_message_at] + [
+                MessageService._parse_graph_time(msg_data.get('created_time'))
+                for msg_data in state['messages']
+            ]),
+            default=None
+        )
+        return True
+
+    @staticmethod
+    def _build_synced_message(
+        platform_account: PlatformAccount,
+        conversation: Conversation,
+        msg_data: Dict[str, Any]
+    ) -> Message:
+        """
+        Build an unsaved Message from a Graph API message object
+
+        Args:
+            platform_account: PlatformAccount instance
+            conversation: Conversation the message belongs to
+            msg_data: Message object returned by get_conversation_messages
+
+        Returns:
+            Unsaved Message instance
+        """
+        # Extract message details
+        from_data = msg_data.get('from', {})
+        sender_id = from_data.get('id', 'unknown')
+        sender_name = from_data.get('name') or from_data.get('username', 'Unknown')
+
+        # Determine if incoming (from customer) or outgoing (from page/business)
+        is_incoming = sender_id != platform_account.platform_user_id
+
+        # Parse timestamp
+        created_time = msg_data.get('created_time')
+        sent_at = timezone.now()
+        if created_time:
+            try:
+                sent_at = date_parser.parse(created_time)
+            except Exception:
+                pass
+
+        # Determine message type and content
+        message_text = msg_data.get('message', '')
+        attachments = msg_data.get('attachments', {}).get('data', [])
+        message_type = 'text'
+        media_url = None
+
+        if attachments:
+            attachment = attachments[0]
+            attachment_type = attachment.get('type', '').lower()
+            if attachment_type in ['image', 'video', 'audio', 'file']:
+                message_type = attachment_type
+            media_url = attachment.get('url') or attachment.get('image_data', {}).get('url')
+
+        return Message(
+            conversation=conversation,
+            platform_account=platform_account,
+            user_id=platform_account.user_id,
+            platform_message_id=msg_data.get('id'),
+            message_type=message_type,
+            content=message_text,
+            media_url=media_url,
+            sender_id=sender_id,
+            sender_name=sender_name,
+            is_incoming=is_incoming,
+            sent_at=sent_at,
+        )
+
+    @staticmethod
+    def _store_synced_messages(
+        platform_account: PlatformAccount,
+        conversation: Conversation,
+        messages: List[Dict[str, Any]],
+        stats: Dict[str, Any]
+    ) -> List[Message]:
+        """
+        Insert the messages of a fetched page that are not stored yet
+
+        Existing ids are prefetched with a single IN query and the rest is
+        written with one bulk insert.
+
+        Args:
+            platform_account: PlatformAccount instance
+            conversation: Conversation the page belongs to
+            messages: Message objects returned by get_conversation_messages
+            stats: Sync stats to update
+
+        Returns:
+            List of created Message instances
+        """
+        message_ids = [msg_data.get('id') for msg_data in messages if msg_data.get('id')]
+        seen_ids = set(Message.objects.filter(
+            platform_message_id__in=message_ids
+        ).values_list('platform_message_id', flat=True))
+
+        new_messages = []
+        for msg_data in messages:
+            message_id = msg_data.get('id')
+            if not message_id or message_id in seen_ids:
+                continue
+            seen_ids.add(message_id)
+
+            try:
+                new_messages.append(MessageService._build_synced_message(platform_account, conversation, msg_data))
+            except Exception as e:
+                logger.error(f'Error creating message {message_id}: {e}')
+                stats['errors'] += 1
+
+        new_messages = MessageService._insert_new_messages(new_messages)
+        AnalyticsService.record_messages(platform_account.platform, new_messages)
+        stats['new_messages'] += len(new_messages)
+        return new_messages
+
+    @staticmethod
+    def last_message_update(message: Message) -> Dict[str, Any]:
+        """
+        Build update() arguments that move the last-message snapshot to a message
+
+        The snapshot only moves forward: a conversation that already shows a
+        newer message keeps it, so concurrent writers cannot roll it back.
+
+        Args:
+            message: Newly stored message
+
+        Returns:
+            Dict of conditional expressions for Conversation.objects.update()
+        """
+        newer = Q(last_message_sent_at__isnull=True) | Q(last_message_sent_at__lte=message.sent_at)
+        snapshot = {
+            'last_message_id': message.id,
+            'last_message_preview': (message.content or '')[:100],
+            'last_message_sender_name': message.sender_name or '',
+            'last_message_sent_at': message.sent_at,
+            'last_message_is_read': message.is_read,
+        }
+        return {
+            field: Case(When(newer, then=Value(value)), default=F(field))
+            for field, value in snapshot.items()
+        }
+
+    @staticmethod
+    def refresh_last_message(conversation_ids: List[Any]) -> int:
+        """
+        Set last_message_at and the last-message snapshot from the newest
+        stored message, in one statement
+
+        Args:
+            conversation_ids: Conversation primary keys to update
+
+        Returns:
+            Number of conversations updated
+        """
+        latest = Message.objects.filter(
+            conversation=OuterRef('pk')
+        ).order_by('-sent_at', '-created_at')
+
+        def newest(field):
+            return Subquery(latest.values(field)[:1])
+
+        return Conversation.objects.filter(pk__in=conversation_ids).update(
+            last_message_at=Coalesce(newest('sent_at'), F('last_message_at')),
+            last_message_id=newest('id'),
+            last_message_preview=Coalesce(
+                Subquery(latest.annotate(preview=Left('content', 100)).values('preview')[:1]), Value('')
+            ),
+            last_message_sender_name=Coalesce(newest('sender_name'), Value('')),
+            last_message_sent_at=newest('sent_at'),
+            last_message_is_read=Coalesce(newest('is_read'), Value(False)),
+            updated_at=timezone.now(),
+        )
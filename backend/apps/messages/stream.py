@@ -0,0 +1,144 @@
+"""
+Replayable per-user stream of WebSocket events
+"""
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+import redis
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from config.redis import get_redis, redis_failed
+
+logger = logging.getLogger(__name__)
+
+EVENT_ID_RE = re.compile(r'^\d+-\d+$')
+
+
+def parse_event_id(event_id: Optional[str]) -> Optional[Tuple[int, int]]:
+    """Turn a stream entry ID ("<ms>-<seq>") into a comparable tuple"""
+    if not event_id or not EVENT_ID_RE.match(event_id):
+        return None
+    ms, seq = event_id.split('-')
+    return int(ms), int(seq)
+
+
+class UserEventStream:
+    """
+    Capped Redis Stream of the WebSocket events sent to each user.
+
+    Every event published to a user's `messages_{user_id}` group is first
+    appended to `message_events:{user_id}` and carries the entry ID as
+    `event_id`. Streams are trimmed to about WEBSOCKET_STREAM_MAXLEN entries
+    and expire WEBSOCKET_STREAM_TTL seconds after their last event. Entry IDs
+    only grow, and trimming removes the oldest entries, so a client that
+    still finds its last seen ID in the stream can be sent exactly the
+    events it missed.
+    """
+
+    KEY_PREFIX = 'message_events'
+
+    def _redis(self) -> Optional[redis.Redis]:
+        return get_redis()
+
+    def _redis_failed(self, e: Exception):
+        redis_failed(e, 'sending events without replay')
+
+    def _key(self, user_id) -> str:
+        return f'{self.KEY_PREFIX}:{user_id}'
+
+    def publish(self, events: List[Tuple[Any, Dict[str, Any]]]):
+        """
+        Record events in their users' streams and send them to the users' groups
+
+        Args:
+            events: List of (user_id, channel layer event) tuples, sent in order
+        """
+        if not events:
+            return
+        self._append(events)
+        try:
+            # One event loop bridge for all of them
+            async_to_sync(self._send_all)(events)
+        except Exception as e:
+            logger.error(f'Error broadcasting events: {e}')
+
+    def _append(self, events: List[Tuple[Any, Dict[str, Any]]]):
+        client = self._redis()
+        if client is None:
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            for user_id, event in events:
+                pipe.xadd(
+                    self._key(user_id),
+                    {'event': json.dumps(event, cls=DjangoJSONEncoder)},
+                    maxlen=settings.WEBSOCKET_STREAM_MAXLEN,
+                    approximate=True
+                )
+            for user_id in {str(user_id) for user_id, _ in events}:
+                pipe.expire(self._key(user_id), settings.WEBSOCKET_STREAM_TTL)
+            event_ids = pipe.execute()[:len(events)]
+        except redis.RedisError as e:
+            self._redis_failed(e)
+            return
+
+        for (_, event), event_id in zip(events, event_ids):
+            event['event_id'] = event_id.decode()
+
+    @staticmethod
+    async def _send_all(events):
+        channel_layer = get_channel_layer()
+        for user_id, event in events:
+            try:
+                await channel_layer.group_send(f'messages_{user_id}', event)
+            except Exception as e:
+                logger.error(f'Error broadcasting {event["type"]} to user {user_id}: {e}')
+
+    def replay(self, user_id, since: Optional[str] = None) -> Tuple[Optional[str], Optional[List[Dict[str, Any]]]]:
+        """
+        Get the newest event ID of a user's stream and the events after `since`
+
+        Args:
+            user_id: User ID
+            since: Last event ID the client received, if it is resuming
+
+        Returns:
+            Tuple of (newest event ID or None, events after `since`). The
+            events are None when they cannot be replayed: `since` was trimmed
+            or expired, more than WEBSOCKET_REPLAY_MAX events were missed, or
+            Redis is unavailable.
+        """
+        client = self._redis()
+        if client is None:
+            return None, None
+        key = self._key(user_id)
+        resuming = since is not None and parse_event_id(since) is not None
+        try:
+            pipe = client.pipeline(transaction=True)
+            pipe.xrevrange(key, count=1)
+            if resuming:
+                pipe.xrange(key, since, since)
+                pipe.xrange(key, f'({since}', '+', count=settings.WEBSOCKET_REPLAY_MAX + 1)
+            results = pipe.execute()
+        except redis.RedisError as e:
+            self._redis_failed(e)
+            return None, None
+
+        head = results[0][0][0].decode() if results[0] else None
+        if not resuming:
+            return head, None
+
+        anchor, entries = results[1], results[2]
+        if not anchor or len(entries) > settings.WEBSOCKET_REPLAY_MAX:
+            return head, None
+        return head, [
+            {**json.loads(fields[b'event']), 'event_id': entry_id.decode()}
+            for entry_id, fields in entries
+        ]
+
+
+event_stream = UserEventStream()
@@ -3,16 +3,37 @@ Celery tasks for message synchronization
 """
 import logging
 from celery import shared_task
+from django.conf import settings
 from django.utils import timezone
 
 from apps.platforms.models import PlatformAccount
-from apps.platforms.services import InstagramService, MessengerService, WhatsAppService
+from apps.platforms.services import (
+    InstagramService, MessengerService, WhatsAppService, get_rate_limit_scopes, rate_limiter
+)
 from .models import Conversation, Message
+from .outbound import OutboundService
+from .receipts import StatusService, status_buffer
 from .services import MessageService
 
 logger = logging.getLogger(__name__)
 
 
+def _defer_if_rate_limited(task, platform):
+    """
+    Re-schedule a sync task while the account's Graph API bucket is blocked
+
+    Returns:
+        Task result for a deferred sync, or None to sync now
+    """
+    delay = rate_limiter.get_delay(get_rate_limit_scopes(platform.get_decrypted_access_token() or ''))
+    if not delay:
+        return None
+
+    task.apply_async(args=[platform.id], countdown=int(delay) + 1)
+    logger.info(f'Sync for platform {platform.id} deferred {delay:.0f}s by Graph API rate limit')
+    return {'status': 'deferred', 'retry_in': delay}
+
+
 @shared_task(name='apps.messages.tasks.sync_all_platforms')
 def sync_all_platforms():
     """
@@ -45,6 +66,11 @@ def sync_instagram_messages(platform_account_id):
     """
     try:
         platform = PlatformAccount.objects.get(id=platform_account_id, platform='instagram')
+
+        deferred = _defer_if_rate_limited(sync_instagram_messages, platform)
+        if deferred:
+            return deferred
+
         instagram_service = InstagramService()
 
         # Use MessageService to sync
@@ -52,7 +78,7 @@ def sync_instagram_messages(platform_account_id):
 
         # Update last sync time
         platform.last_sync_at = timezone.now()
-        platform.save()
+        platform.save(update_fields=['last_sync_at', 'updated_at'])
 
         logger.info(f'Instagram sync completed for {platform_account_id}: {stats}')
         return {'status': 'success', **stats}
@@ -72,6 +98,11 @@ def sync_messenger_messages(platform_account_id):
     """
     try:
         platform = PlatformAccount.objects.get(id=platform_account_id, platform='messenger')
+
+        deferred = _defer_if_rate_limited(sync_messenger_messages, platform)
+        if deferred:
+            return deferred
+
         messenger_service = MessengerService()
 
         # Use MessageService to sync
@@ -79,7 +110,7 @@ def sync_messenger_messages(platform_account_id):
 
         # Update last sync time
         platform.last_sync_at = timezone.now()
-        platform.save()
+        platform.save(update_fields=['last_sync_at', 'updated_at'])
 
         logger.info(f'Messenger sync completed for {platform_account_id}: {stats}')
         return {'status': 'success', **stats}
@@ -106,7 +137,7 @@ def sync_whatsapp_messages(platform_account_id):
 
         # Update last sync time
         platform.last_sync_at = timezone.now()
-        platform.save()
+        platform.save(update_fields=['last_sync_at', 'updated_at'])
 
         return {'status': 'success', 'note': 'WhatsApp uses webhooks'}
 
@@ -116,3 +147,82 @@ def sync_whatsapp_messages(platform_account_id):
     except Exception as e:
         logger.error(f'Error in WhatsApp sync task: {e}')
         return {'status': 'error', 'message': str(e)}
+
+
+@shared_task(
+    name='apps.messages.tasks.send_outbound_message',
+    acks_late=True,
+    reject_on_worker_lost=True,
+    ignore_result=True,
+)
+def send_outbound_message(message_id):
+    """
+    Deliver a queued outbound message through its platform's API.
+    Retryable failures re-schedule the task with backoff. Attempts are
+    counted on the message, so a duplicate or re-queued task cannot send
+    it twice or retry it more often than OUTBOUND_SEND_MAX_ATTEMPTS.
+    """
+    message = OutboundService.claim(message_id)
+    if message is None:
+        return
+
+    try:
+        platform_message_id = OutboundService.send_to_platform(message)
+    except Exception as e:
+        delay = OutboundService.mark_attempt_failed(message, e)
+        if delay is None:
+            logger.warning(f'Outbound message {message_id} failed: {e}')
+            return
+        send_outbound_message.apply_async(args=[message_id], countdown=delay)
+        logger.info(f'Outbound message {message_id} will be retried in {delay:.0f}s: {e}')
+        return
+
+    OutboundService.mark_sent(message, platform_message_id)
+
+
+@shared_task(name='apps.messages.tasks.requeue_outbound_messages')
+def requeue_outbound_messages():
+    """
+    Enqueue outbound messages whose delivery task was lost
+    Runs every minute (configured in settings)
+    """
+    message_ids = OutboundService.stalled_message_ids()
+    for message_id in message_ids:
+        send_outbound_message.delay(message_id)
+
+    if message_ids:
+        logger.warning(f'Re-queued {len(message_ids)} stalled outbound messages')
+    return {'requeued': len(message_ids)}
+
+
+@shared_task(name='apps.messages.tasks.flush_message_statuses', ignore_result=True)
+def flush_message_statuses():
+    """
+    Apply the status events collected in the status buffer, in batches.
+    Statuses of messages that are not stored yet (their send is still
+    being recorded) go back to the buffer for a few more flushes.
+    Runs after each buffering window, and every minute as a safety net.
+    """
+    changed = 0
+    deferred = []
+    for _ in range(50):
+        events = status_buffer.pop(settings.MESSAGE_STATUS_BATCH_SIZE)
+        if not events:
+            break
+        applied, unmatched = StatusService.apply_statuses(events)
+        changed += applied
+        deferred.extend(
+            {**event, 'defers': event.get('defers', 0) + 1}
+            for event in unmatched
+            if event.get('defers', 0) < settings.MESSAGE_STATUS_MAX_DEFERS
+        )
+    else:
+        # Still busy; continue in a fresh task rather than holding this worker
+        flush_message_statuses.delay()
+
+    if deferred and status_buffer.push(deferred):
+        flush_message_statuses.apply_async(countdown=settings.MESSAGE_STATUS_FLUSH_INTERVAL)
+
+    if changed:
+        logger.info(f'Applied statuses to {changed} messages')
+    return {'changed': changed, 'deferred': len(deferred)}
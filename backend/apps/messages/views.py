@@ -2,25 +2,22 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.pagination import PageNumberPagination
+from django.conf import settings
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import Case, Exists, F, OuterRef, Q, Value, When
+from django.db.models.functions import Greatest
 import logging
 
 logger = logging.getLogger(__name__)
 
 from .models import Conversation, Message
+from .outbound import OutboundService
+from .pagination import ConversationPagination, MessagePagination
+from .search import SearchService
 from .serializers import MessageSerializer, ConversationSerializer, ConversationDetailSerializer, SendMessageSerializer
+from .tasks import send_outbound_message
+from apps.analytics.services import AnalyticsService
 from apps.platforms.models import PlatformAccount
-from apps.platforms.services.instagram import InstagramService
-from apps.platforms.services.messenger import MessengerService
-from apps.platforms.services.whatsapp import WhatsAppService
-
-
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 50
-    page_size_query_param = 'page_size'
-    max_page_size = 100
 
 
 class MessageViewSet(viewsets.ModelViewSet):
@@ -29,12 +26,11 @@ class MessageViewSet(viewsets.ModelViewSet):
     """
     permission_classes = [IsAuthenticated]
     serializer_class = MessageSerializer
-    pagination_class = StandardResultsSetPagination
+    pagination_class = MessagePagination
 
     def get_queryset(self):
         """Get messages for the current user's platform accounts"""
-        platform_accounts = PlatformAccount.objects.filter(user=self.request.user)
-        queryset = Message.objects.filter(platform_account__in=platform_accounts)
+        queryset = Message.objects.filter(user=self.request.user)
 
         # Filter by conversation if provided
         conversation_id = self.request.query_params.get('conversation', None)
@@ -51,7 +47,7 @@ class MessageViewSet(viewsets.ModelViewSet):
         if is_read is not None:
             queryset = queryset.filter(is_read=is_read.lower() == 'true')
 
-        return queryset.select_related('conversation', 'platform_account').order_by('-sent_at')
+        return queryset.select_related('conversation', 'platform_account').order_by('-sent_at', '-id')
 
     @action(detail=True, methods=['post'], url_path='mark-read')
     def mark_read(self, request, pk=None):
@@ -59,17 +55,25 @@ class MessageViewSet(viewsets.ModelViewSet):
         try:
             message = self.get_queryset().get(pk=pk)
 
-            if not message.is_read:
-                message.is_read = True
-                message.read_at = timezone.now()
-                message.save()
+            # Conditional update so concurrent requests decrement only once
+            read_at = timezone.now()
+            marked = Message.objects.filter(pk=message.pk, is_read=False).update(is_read=True, read_at=read_at)
 
-                # Update conversation unread count
-                if message.conversation:
-                    message.conversation.unread_count = max(
-                        0, message.conversation.unread_count - 1
+            if marked:
+                message.is_read = True
+                message.read_at = read_at
+
+                # Update conversation unread count in place, never below zero
+                if message.conversation_id:
+                    Conversation.objects.filter(pk=message.conversation_id).update(
+                        unread_count=Greatest(F('unread_count') - 1, Value(0)),
+                        last_message_is_read=Case(
+                            When(last_message_id=message.pk, then=Value(True)),
+                            default=F('last_message_is_read')
+                        ),
+                        updated_at=read_at
                     )
-                    message.conversation.save()
+                AnalyticsService.invalidate_platform_stats([message.user_id])
 
             return Response({
                 'message': 'Message marked as read',
@@ -87,12 +91,11 @@ class ConversationViewSet(viewsets.ModelViewSet):
     """
     permission_classes = [IsAuthenticated]
     serializer_class = ConversationSerializer
-    pagination_class = StandardResultsSetPagination
+    pagination_class = ConversationPagination
 
     def get_queryset(self):
         """Get conversations for the current user's platform accounts"""
-        platform_accounts = PlatformAccount.objects.filter(user=self.request.user)
-        queryset = Conversation.objects.filter(platform_account__in=platform_accounts)
+        queryset = Conversation.objects.filter(user=self.request.user)
 
         # Filter by platform if provided
         platform = self.request.query_params.get('platform', None)
@@ -104,19 +107,30 @@ class ConversationViewSet(viewsets.ModelViewSet):
         if is_archived is not None:
             queryset = queryset.filter(is_archived=is_archived.lower() == 'true')
 
-        return queryset.select_related('platform_account').order_by('-last_message_at')
+        return queryset.select_related('platform_account').order_by('-last_message_at', '-id')
 
     def retrieve(self, request, pk=None):
-        """Get a specific conversation with recent messages"""
+        """
+        Get a specific conversation with recent messages
+
+        Pass the returned messages_cursor back as ?messages_cursor= to load
+        the next batch of older messages.
+        """
         try:
             conversation = self.get_queryset().get(pk=pk)
 
-            # Get recent messages for this conversation
+            # Get recent messages for this conversation, continuing after the cursor if given
             messages_limit = int(request.query_params.get('messages_limit', 50))
-            recent_messages = conversation.messages.all().order_by('-sent_at')[:messages_limit]
+            messages, messages_cursor = MessagePagination().paginate(
+                conversation.messages.select_related('platform_account'),
+                request.query_params.get('messages_cursor'),
+                messages_limit
+            )
 
-            # Use ConversationDetailSerializer which will fetch messages
-            serializer = ConversationDetailSerializer(conversation, context={'messages_limit': messages_limit})
+            serializer = ConversationDetailSerializer(conversation, context={
+                'messages': messages,
+                'messages_cursor': messages_cursor,
+            })
             return Response(serializer.data)
         except Conversation.DoesNotExist:
             return Response({
@@ -129,13 +143,22 @@ class ConversationViewSet(viewsets.ModelViewSet):
         try:
             conversation = self.get_queryset().get(pk=pk)
 
-            # Mark all unread messages as read
-            unread_messages = conversation.messages.filter(is_read=False, is_incoming=True)
-            count = unread_messages.update(is_read=True, read_at=timezone.now())
-
-            # Reset unread count
-            conversation.unread_count = 0
-            conversation.save()
+            # Mark the unread messages received so far as read
+            read_at = timezone.now()
+            unread_messages = conversation.messages.filter(is_read=False, is_incoming=True, sent_at__lte=read_at)
+            count = unread_messages.update(is_read=True, read_at=read_at)
+            if count:
+                AnalyticsService.invalidate_platform_stats([conversation.user_id])
+
+            # Take off only the messages marked above: webhooks storing new ones
+            # meanwhile have already added theirs. Outgoing messages are stored
+            # read, so the snapshot is read unless a newer unread message arrived.
+            Conversation.objects.filter(pk=conversation.pk).update(
+                unread_count=Greatest(F('unread_count') - count, Value(0)),
+                last_message_is_read=~Exists(Message.objects.filter(pk=OuterRef('last_message_id'), is_read=False)),
+                updated_at=read_at
+            )
+            conversation.refresh_from_db(fields=['unread_count', 'last_message_is_read', 'updated_at'])
 
             return Response({
                 'message': f'Marked {count} messages as read',
@@ -152,7 +175,7 @@ class ConversationViewSet(viewsets.ModelViewSet):
         try:
             conversation = self.get_queryset().get(pk=pk)
             conversation.is_archived = True
-            conversation.save()
+            conversation.save(update_fields=['is_archived', 'updated_at'])
 
             return Response({
                 'message': 'Conversation archived',
@@ -169,7 +192,7 @@ class ConversationViewSet(viewsets.ModelViewSet):
         try:
             conversation = self.get_queryset().get(pk=pk)
             conversation.is_archived = False
-            conversation.save()
+            conversation.save(update_fields=['is_archived', 'updated_at'])
 
             return Response({
                 'message': 'Conversation unarchived',
@@ -227,6 +250,7 @@ class ConversationViewSet(viewsets.ModelViewSet):
             is_archived=False
         )
 
+        AnalyticsService.record_conversations([conversation])
         logger.info(f'Created new conversation: {conversation.id} for {phone_number}')
 
         return Response({
@@ -236,10 +260,16 @@ class ConversationViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['post'], url_path='send-message')
     def send_message(self, request, pk=None):
-        """Send a message in a conversation"""
+        """
+        Queue a message for sending in a conversation
+
+        The message is stored as pending and sent by a Celery worker; its
+        final status arrives as a `message_status` WebSocket event. A
+        repeated request with the same client_message_id (or Idempotency-Key
+        header) returns the message queued by the first one.
+        """
         try:
-            conversation = self.get_queryset().get(pk=pk)
-            platform_account = conversation.platform_account
+            conversation = self.get_queryset().select_related('platform_account').get(pk=pk)
 
             # Validate request data
             serializer = SendMessageSerializer(data=request.data)
@@ -250,102 +280,25 @@ class ConversationViewSet(viewsets.ModelViewSet):
                 }, status=status.HTTP_400_BAD_REQUEST)
 
             validated_data = serializer.validated_data
-            content = validated_data['content']
-            message_type = validated_data.get('message_type', 'text')
-            media_url = validated_data.get('media_url')
-
-            # Get decrypted access token
-            access_token = platform_account.get_decrypted_access_token()
-
-            # Send message based on platform
-            response_data = None
-            platform_message_id = None
-
-            if platform_account.platform == 'instagram':
-                service = InstagramService()
-                response_data = service.send_message(
-                    recipient_id=conversation.participant_id,
-                    message_text=content,
-                    ig_account_id=platform_account.platform_user_id,
-                    access_token=access_token
-                )
-                if response_data:
-                    platform_message_id = response_data.get('id')
-
-            elif platform_account.platform == 'messenger':
-                service = MessengerService()
-                if message_type == 'text':
-                    response_data = service.send_message(
-                        recipient_id=conversation.participant_id,
-                        message_text=content,
-                        page_id=platform_account.platform_user_id,
-                        access_token=access_token
-                    )
-                else:
-                    response_data = service.send_message_with_attachment(
-                        recipient_id=conversation.participant_id,
-                        attachment_type=message_type,
-                        attachment_url=media_url,
-                        page_id=platform_account.platform_user_id,
-                        access_token=access_token
-                    )
-                if response_data:
-                    platform_message_id = response_data.get('message_id')
-
-            elif platform_account.platform == 'whatsapp':
-                service = WhatsAppService()
-                if message_type == 'text':
-                    response_data = service.send_text_message(
-                        recipient_phone=conversation.participant_id,
-                        message_text=content,
-                        phone_number_id=platform_account.platform_user_id,
-                        access_token=access_token
-                    )
-                else:
-                    response_data = service.send_media_message(
-                        recipient_phone=conversation.participant_id,
-                        media_type=message_type,
-                        media_url=media_url,
-                        caption=content if content else None,
-                        phone_number_id=platform_account.platform_user_id,
-                        access_token=access_token
-                    )
-                if response_data:
-                    messages_data = response_data.get('messages', [])
-                    if messages_data:
-                        platform_message_id = messages_data[0].get('id')
-
-            # Check if message was sent successfully
-            if not response_data or not platform_message_id:
-                return Response({
-                    'error': 'Failed to send message',
-                    'details': 'Platform API returned an error'
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-            # Create message record in database
-            message = Message.objects.create(
-                conversation=conversation,
-                platform_account=platform_account,
-                platform_message_id=platform_message_id,
-                message_type=message_type,
-                content=content,
-                media_url=media_url,
-                sender_id=platform_account.platform_user_id,
-                sender_name=platform_account.platform_username or 'Me',
-                is_incoming=False,
-                is_read=True,
-                sent_at=timezone.now(),
-                delivered_at=timezone.now()
+            message, created = OutboundService.queue_message(
+                conversation,
+                content=validated_data['content'],
+                message_type=validated_data.get('message_type', 'text'),
+                media_url=validated_data.get('media_url'),
+                client_message_id=validated_data.get('client_message_id') or request.headers.get('Idempotency-Key')
             )
 
-            # Update conversation last_message_at
-            conversation.last_message_at = timezone.now()
-            conversation.save()
+            if created:
+                try:
+                    send_outbound_message.delay(str(message.id))
+                except Exception as e:
+                    # requeue_outbound_messages picks the message up later
+                    logger.error(f'Error queueing outbound message {message.id}: {e}')
 
             return Response({
-                'message': 'Message sent successfully',
+                'message': 'Message queued' if created else 'Message already queued',
                 'data': MessageSerializer(message).data
-            }, status=status.HTTP_201_CREATED)
+            }, status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK)
 
         except Conversation.DoesNotExist:
             return Response({
@@ -365,11 +318,18 @@ def search_messages(request):
     """
     Search messages and conversations
 
+    Messages are matched on content and sender name (every word as a prefix)
+    and ranked by relevance, or ordered newest first when more than
+    SEARCH_RANK_LIMIT match; totals above that limit are estimates.
+    Conversations are matched on participant name or id and only returned
+    with the first page.
+
     Query parameters:
     - q: Search query (required)
     - platform: Filter by platform (optional: instagram, messenger, whatsapp)
     - is_read: Filter by read status (optional: true, false)
     - limit: Number of results (default: 20, max: 100)
+    - cursor: messages_cursor of the previous response, for the next page of messages
     """
     query = request.query_params.get('q', '').strip()
 
@@ -379,20 +339,12 @@ def search_messages(request):
             'detail': 'Please provide a search query using the "q" parameter'
         }, status=status.HTTP_400_BAD_REQUEST)
 
-    # Get user's platform accounts
-    platform_accounts = PlatformAccount.objects.filter(user=request.user)
-
     # Search in messages
-    messages_query = Message.objects.filter(
-        platform_account__in=platform_accounts
-    ).filter(
-        Q(content__icontains=query) |
-        Q(sender_name__icontains=query)
-    )
+    messages_query = SearchService.filter_messages(Message.objects.filter(user=request.user), query)
 
     # Search in conversations
     conversations_query = Conversation.objects.filter(
-        platform_account__in=platform_accounts
+        user=request.user
     ).filter(
         Q(participant_name__icontains=query) |
         Q(participant_id__icontains=query)
@@ -411,17 +363,30 @@ def search_messages(request):
 
     # Limit results
     limit = min(int(request.query_params.get('limit', 20)), 100)
+    cursor = request.query_params.get('cursor')
 
     # Get results
-    messages = messages_query.select_related('conversation', 'platform_account').order_by('-sent_at')[:limit]
-    conversations = conversations_query.select_related('platform_account').order_by('-last_message_at')[:limit]
+    total_messages = SearchService.estimate_count(messages_query)
+    messages, messages_cursor = SearchService.search_messages(
+        messages_query.select_related('conversation', 'platform_account'),
+        query,
+        cursor,
+        limit,
+        rank=total_messages <= settings.SEARCH_RANK_LIMIT
+    )
+    conversations = []
+    if not cursor:
+        conversations = conversations_query.select_related('platform_account').order_by(
+            '-last_message_at', '-id'
+        )[:limit]
 
     return Response({
         'query': query,
         'results': {
             'messages': MessageSerializer(messages, many=True).data,
             'conversations': ConversationSerializer(conversations, many=True).data,
-            'total_messages': messages.count(),
-            'total_conversations': conversations.count(),
+            'total_messages': total_messages,
+            'total_conversations': SearchService.estimate_count(conversations_query),
+            'messages_cursor': messages_cursor,
         }
     })
@@ -6,6 +6,6 @@ from .models import PlatformAccount
 class PlatformAccountAdmin(admin.ModelAdmin):
     list_display = ['user', 'platform', 'platform_username', 'is_active', 'last_sync_at', 'created_at']
     list_filter = ['platform', 'is_active', 'created_at']
-    search_fields = ['user__email', 'platform_username', 'platform_user_id']
+    search_fields = ['user__email', 'platform_username', 'platform_user_id', 'routing_key']
     readonly_fields = ['id', 'created_at', 'updated_at']
     ordering = ['-created_at']
@@ -6,3 +6,6 @@ class PlatformsConfig(AppConfig):
     name = 'apps.platforms'
     label = 'platforms'
     verbose_name = 'Platform Connections'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,244 @@
+"""
+Cached lookup of the platform account a webhook belongs to
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, Optional, Tuple
+import redis
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import router
+
+from config.redis import get_redis, redis_failed
+from .models import PlatformAccount
+
+logger = logging.getLogger(__name__)
+
+# Columns kept in the cache, in model order; tokens and metadata are loaded
+# from the database only when a caller reads them
+CACHED_FIELDS = [
+    field for field in PlatformAccount._meta.concrete_fields
+    if field.attname in {'id', 'user_id', 'platform', 'platform_user_id', 'routing_key', 'is_active'}
+]
+
+
+class PlatformAccountResolver:
+    """
+    Two-tier routing key -> PlatformAccount cache for webhook ingestion.
+
+    A per-process LRU with a short TTL answers steady-state lookups without
+    any I/O. Misses go to one Redis key per routing key, and finally to the
+    database. Routing keys are the WhatsApp phone_number_id and the
+    Instagram/Messenger platform_user_id. Unknown keys are cached for
+    PLATFORM_ACCOUNT_MISSING_CACHE_TTL, so webhooks from customers (echoes)
+    do not hit the database either.
+
+    Only the identifying columns are cached; accounts are returned with the
+    other fields deferred. Entries are dropped from Redis and the local LRU
+    when an account is saved, deleted or deactivated; LRUs of other
+    processes catch up within PLATFORM_ACCOUNT_LOCAL_CACHE_TTL.
+    """
+
+    KEY_PREFIX = 'platform_accounts'
+
+    def __init__(self):
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'local_hits': 0, 'redis_hits': 0, 'misses': 0}
+        self._unflushed = dict(self._stats)
+        self._flushed_at = time.monotonic()
+
+    def _redis(self) -> Optional[redis.Redis]:
+        return get_redis()
+
+    def _redis_failed(self, e: Exception):
+        redis_failed(e, 'resolving webhook accounts from the database')
+
+    def _key(self, platform: str, routing_key: str) -> str:
+        return f'{self.KEY_PREFIX}:{platform}:{routing_key}'
+
+    @staticmethod
+    def _dump(account: Optional[PlatformAccount]) -> Optional[Tuple]:
+        if account is None:
+            return None
+        return tuple(field.value_from_object(account) for field in CACHED_FIELDS)
+
+    @staticmethod
+    def _build(values: Optional[Tuple]) -> Optional[PlatformAccount]:
+        """A fresh instance per lookup, so callers never share one"""
+        if values is None:
+            return None
+        return PlatformAccount.from_db(
+            router.db_for_read(PlatformAccount),
+            [field.attname for field in CACHED_FIELDS],
+            [field.to_python(value) for field, value in zip(CACHED_FIELDS, values)],
+        )
+
+    def _count(self, field: str):
+        with self._lock:
+            self._stats[field] += 1
+            self._unflushed[field] += 1
+            if time.monotonic() - self._flushed_at < 10:
+                return
+            counts, self._unflushed = self._unflushed, {key: 0 for key in self._unflushed}
+            self._flushed_at = time.monotonic()
+
+        # Counters are shared through Redis so any process can report them
+        client = self._redis()
+        if client is None:
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            for key, value in counts.items():
+                if value:
+                    pipe.hincrby(f'{self.KEY_PREFIX}:stats', key, value)
+            pipe.execute()
+        except redis.RedisError as e:
+            self._redis_failed(e)
+
+    def _remember(self, key, values: Optional[Tuple]):
+        with self._lock:
+            self._local[key] = (values, time.monotonic() + settings.PLATFORM_ACCOUNT_LOCAL_CACHE_TTL)
+            self._local.move_to_end(key)
+            while len(self._local) > settings.PLATFORM_ACCOUNT_LOCAL_CACHE_SIZE:
+                self._local.popitem(last=False)
+
+    def get_account(self, platform: str, routing_key: str) -> Optional[PlatformAccount]:
+        """
+        Get the account a webhook routing key belongs to
+
+        Args:
+            platform: Platform name
+            routing_key: WhatsApp phone_number_id, or Instagram/Messenger
+                         platform_user_id
+
+        Returns:
+            PlatformAccount instance with only the cached fields loaded, or None
+        """
+        key = (platform, routing_key)
+
+        with self._lock:
+            entry = self._local.get(key)
+            if entry and entry[1] > time.monotonic():
+                self._local.move_to_end(key)
+            else:
+                entry = None
+        if entry:
+            self._count('local_hits')
+            return self._build(entry[0])
+
+        client = self._redis()
+        if client is not None:
+            try:
+                cached = client.get(self._key(platform, routing_key))
+            except redis.RedisError as e:
+                self._redis_failed(e)
+                cached = None
+
+            if cached:
+                self._count('redis_hits')
+                values = json.loads(cached)
+                values = tuple(values) if values is not None else None
+                self._remember(key, values)
+                return self._build(values)
+
+        self._count('misses')
+        values = self._dump(self._load(platform, routing_key))
+        self._remember(key, values)
+
+        client = self._redis()
+        if client is not None:
+            try:
+                ttl = settings.PLATFORM_ACCOUNT_CACHE_TTL if values else settings.PLATFORM_ACCOUNT_MISSING_CACHE_TTL
+                client.set(self._key(platform, routing_key), json.dumps(values, cls=DjangoJSONEncoder), ex=ttl)
+            except redis.RedisError as e:
+                self._redis_failed(e)
+
+        return self._build(values)
+
+    @staticmethod
+    def _load(platform: str, routing_key: str) -> Optional[PlatformAccount]:
+        if platform == 'whatsapp':
+            return PlatformAccount.objects.filter(
+                platform=platform,
+                routing_key=routing_key,
+                is_active=True
+            ).order_by('-updated_at').first()
+
+        return PlatformAccount.objects.filter(
+            platform=platform,
+            platform_user_id=routing_key
+        ).order_by('-is_active', '-updated_at').first()
+
+    def invalidate(self, accounts: Iterable[PlatformAccount]):
+        """
+        Drop the cached routing entries of accounts
+
+        Args:
+            accounts: Accounts that were saved, deleted or deactivated
+        """
+        keys = {}
+        for account in accounts:
+            routing_keys = keys.setdefault(account.platform, set())
+            routing_keys.add(account.platform_user_id)
+            if account.routing_key:
+                routing_keys.add(account.routing_key)
+
+        if not keys:
+            return
+
+        with self._lock:
+            for platform, routing_keys in keys.items():
+                for routing_key in routing_keys:
+                    self._local.pop((platform, routing_key), None)
+
+        client = self._redis()
+        if client is None:
+            return
+        try:
+            client.delete(*[
+                self._key(platform, routing_key)
+                for platform, routing_keys in keys.items()
+                for routing_key in routing_keys
+            ])
+        except redis.RedisError as e:
+            self._redis_failed(e)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get resolver hit rates
+
+        Returns:
+            Dict with 'process' counters of this process and 'cluster'
+            counters flushed by all processes (empty without Redis), each
+            with a hit_rate over all lookups
+        """
+        def with_hit_rate(counts):
+            lookups = sum(counts.values())
+            hits = counts.get('local_hits', 0) + counts.get('redis_hits', 0)
+            return {**counts, 'hit_rate': hits / lookups if lookups else None}
+
+        with self._lock:
+            local = dict(self._stats)
+
+        cluster = {}
+        client = self._redis()
+        if client is not None:
+            try:
+                cluster = {
+                    key.decode(): int(value)
+                    for key, value in client.hgetall(f'{self.KEY_PREFIX}:stats').items()
+                }
+            except redis.RedisError as e:
+                self._redis_failed(e)
+
+        return {
+            'process': with_hit_rate(local),
+            'cluster': with_hit_rate(cluster) if cluster else {},
+        }
+
+
+account_resolver = PlatformAccountResolver()
@@ -0,0 +1,178 @@
+"""
+Encryption of platform access and refresh tokens
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional, Tuple, Union
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from django.conf import settings
+
+# Marks stored values as Fernet ciphertext, so saving never has to trial-decrypt
+ENCRYPTED_TOKEN_PREFIX = 'fernet:'
+
+# Every Fernet token starts with the base64 of its 0x80 version byte
+_FERNET_TOKEN_START = 'gAAAAA'
+
+
+@lru_cache(maxsize=4)
+def _build_cipher(key: bytes, old_keys: Tuple[str, ...]) -> Union[Fernet, MultiFernet]:
+    if not old_keys:
+        # MultiFernet costs a try/except per decrypt, only pay it while rotating
+        return Fernet(key)
+    return MultiFernet([Fernet(key)] + [Fernet(old_key) for old_key in old_keys])
+
+
+def get_cipher() -> Optional[Union[Fernet, MultiFernet]]:
+    """
+    Get the cached token cipher
+
+    Encrypts with ENCRYPTION_KEY and decrypts with it or any of
+    ENCRYPTION_OLD_KEYS, so keys can be rotated without downtime.
+
+    Returns:
+        Fernet (MultiFernet with old keys) instance, or None when no
+        ENCRYPTION_KEY is configured
+    """
+    if not settings.ENCRYPTION_KEY:
+        return None
+    return _build_cipher(settings.ENCRYPTION_KEY, tuple(settings.ENCRYPTION_OLD_KEYS))
+
+
+def is_encrypted(value: Optional[str]) -> bool:
+    """Check whether a stored token value carries the encrypted marker"""
+    return bool(value) and value.startswith(ENCRYPTED_TOKEN_PREFIX)
+
+
+def encrypt_token(token: str) -> str:
+    """
+    Encrypt a plaintext token for storage
+
+    Args:
+        token: Plaintext token
+
+    Returns:
+        Marked ciphertext, or the token unchanged when encryption is not configured
+    """
+    cipher = get_cipher()
+    if not token or cipher is None:
+        return token
+    return ENCRYPTED_TOKEN_PREFIX + cipher.encrypt(token.encode()).decode()
+
+
+def decrypt_token(value: str) -> str:
+    """
+    Decrypt a stored token value
+
+    Values without the marker are either plaintext or ciphertext stored
+    before the marker existed; both are handled.
+
+    Args:
+        value: Stored token value
+
+    Returns:
+        Plaintext token (the value itself if it is not decryptable)
+    """
+    cipher = get_cipher()
+    if not value or cipher is None:
+        return value
+
+    ciphertext = value[len(ENCRYPTED_TOKEN_PREFIX):] if is_encrypted(value) else value
+    try:
+        return cipher.decrypt(ciphertext.encode()).decode()
+    except (InvalidToken, ValueError):
+        # Not encrypted (or encrypted with an unknown key), use as is
+        return value
+
+
+def mark_legacy_ciphertext(value: str) -> Optional[str]:
+    """
+    Add the marker to ciphertext stored before the marker existed
+
+    Args:
+        value: Stored token value without the marker
+
+    Returns:
+        Marked value, or None if the value is not ciphertext of a known key
+    """
+    cipher = get_cipher()
+    if not value or cipher is None or not value.startswith(_FERNET_TOKEN_START):
+        return None
+    try:
+        cipher.decrypt(value.encode())
+    except (InvalidToken, ValueError):
+        return None
+    return ENCRYPTED_TOKEN_PREFIX + value
+
+
+def rotate_token(value: str) -> str:
+    """
+    Re-encrypt a stored token value with the current ENCRYPTION_KEY
+
+    Args:
+        value: Stored token value (marked ciphertext)
+
+    Returns:
+        Marked ciphertext under the primary key
+    """
+    cipher = get_cipher()
+    if isinstance(cipher, Fernet):
+        cipher = MultiFernet([cipher])
+
+    ciphertext = value[len(ENCRYPTED_TOKEN_PREFIX):]
+    return ENCRYPTED_TOKEN_PREFIX + cipher.rotate(ciphertext.encode()).decode()
+
+
+class DecryptedTokenCache:
+    """
+    Short-lived, size-bounded in-process cache of decrypted tokens.
+
+    Entries are keyed by account id and a hash of the stored ciphertext, so
+    a refreshed or rotated token is never served from a stale entry.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_decrypt(self, account_id, value: str) -> str:
+        """
+        Get the plaintext of a stored token value, decrypting on a miss
+
+        Args:
+            account_id: Primary key of the owning account (None if unsaved)
+            value: Stored token value
+
+        Returns:
+            Plaintext token
+        """
+        if not value or account_id is None or not settings.PLATFORM_TOKEN_CACHE_TTL:
+            return decrypt_token(value)
+
+        key = (account_id, hashlib.sha256(value.encode()).digest())
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > now:
+                self._entries.move_to_end(key)
+                return entry[0]
+
+        token = decrypt_token(value)
+
+        with self._lock:
+            self._entries[key] = (token, now + settings.PLATFORM_TOKEN_CACHE_TTL)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.PLATFORM_TOKEN_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+        return token
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+decrypted_token_cache = DecryptedTokenCache()
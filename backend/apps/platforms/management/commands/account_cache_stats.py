@@ -0,0 +1,21 @@
+"""
+Show hit rates of the webhook account resolver cache
+"""
+from django.core.management.base import BaseCommand
+
+from apps.platforms.cache import account_resolver
+
+
+class Command(BaseCommand):
+    help = 'Show local LRU / Redis / database lookups and hit rate of the account resolver across all workers'
+
+    def handle(self, *args, **options):
+        stats = account_resolver.get_stats()['cluster']
+        if not stats:
+            self.stdout.write('No resolver metrics recorded (or Redis is unavailable)')
+            return
+
+        self.stdout.write(
+            f'local_hits={stats.get("local_hits", 0)} redis_hits={stats.get("redis_hits", 0)} '
+            f'misses={stats.get("misses", 0)} hit_rate={stats["hit_rate"]:.1%}'
+        )
@@ -0,0 +1,72 @@
+"""
+Compare per-call Graph API latency with and without the shared keep-alive pool
+"""
+import json
+import statistics
+import threading
+import time
+import requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.core.management.base import BaseCommand
+
+from apps.platforms.services import MetaAPIService, get_pool_stats
+
+
+class StubGraphHandler(BaseHTTPRequestHandler):
+    """Minimal keep-alive Graph API stub answering every path with an empty page"""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = json.dumps({'data': [], 'paging': {}}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark make_api_request latency against a local stub, pooled vs. one connection per call'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+
+    def handle(self, *args, **options):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StubGraphHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_address[1]}/v18.0'
+
+        try:
+            unpooled = MetaAPIService()
+            unpooled.base_url = base_url
+            # Module-level requests functions open a new connection per call
+            unpooled.session = requests
+
+            pooled = MetaAPIService()
+            pooled.base_url = base_url
+
+            for label, service in (('unpooled', unpooled), ('pooled', pooled)):
+                timings = []
+                for _ in range(options['requests']):
+                    start = time.perf_counter()
+                    service.make_api_request('GET', 'me/conversations', 'benchmark-token')
+                    timings.append((time.perf_counter() - start) * 1000)
+
+                self.stdout.write(
+                    f'{label:>8}: n={len(timings)} mean={statistics.mean(timings):.3f}ms '
+                    f'p50={statistics.median(timings):.3f}ms'
+                )
+
+            stats = get_pool_stats()
+            self.stdout.write(
+                f'pool: requests={stats["requests"]} connections_created={stats["connections_created"]} '
+                f'idle={stats["idle_connections"]}'
+            )
+            self.stdout.write('Note: the stub is plain HTTP; TLS handshakes saved against graph.facebook.com add to the gap.')
+        finally:
+            server.shutdown()
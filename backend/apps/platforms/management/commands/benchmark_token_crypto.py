@@ -0,0 +1,61 @@
+"""
+Measure token decryption and save() cost on the message send path
+"""
+import time
+from cryptography.fernet import Fernet
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from apps.platforms import encryption
+from apps.platforms.models import PlatformAccount
+
+
+class Command(BaseCommand):
+    help = 'Benchmark get_decrypted_access_token and token encryption checks in save()'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        key = settings.ENCRYPTION_KEY or Fernet.generate_key()
+        with override_settings(ENCRYPTION_KEY=key):
+            self._run(key, options['iterations'])
+
+    def _run(self, key, iterations):
+        # An in-memory account as loaded by the send view; nothing is written
+        account = PlatformAccount(platform='messenger', platform_user_id='page_benchmark')
+        account.access_token = account._prepare_token_for_storage('EAAB' + 'x' * 180)
+        legacy_ciphertext = account.access_token[len(encryption.ENCRYPTED_TOKEN_PREFIX):]
+
+        def per_call_fernet():
+            # Previous behaviour: a new Fernet per call
+            Fernet(key).decrypt(legacy_ciphertext.encode())
+
+        def cached_cipher():
+            encryption.decrypt_token(account.access_token)
+
+        def send_path():
+            account.get_decrypted_access_token()
+
+        def save_check_trial_decrypt():
+            # Previous save(): trial decrypt to find out whether the token is encrypted
+            Fernet(key).decrypt(legacy_ciphertext.encode())
+
+        def save_check_marker():
+            account._prepare_token_for_storage(account.access_token)
+
+        encryption.decrypted_token_cache.clear()
+        account.pk = 'benchmark'
+        for label, func in (
+            ('decrypt, Fernet per call', per_call_fernet),
+            ('decrypt, cached cipher', cached_cipher),
+            ('get_decrypted_access_token', send_path),
+            ('save check, trial decrypt', save_check_trial_decrypt),
+            ('save check, marker', save_check_marker),
+        ):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                func()
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f'{label:>28}: {elapsed / iterations * 1e6:8.2f}us/op')
@@ -0,0 +1,24 @@
+"""
+Show time spent waiting on Graph API rate limits
+"""
+from django.core.management.base import BaseCommand
+
+from apps.platforms.services import rate_limiter
+
+
+class Command(BaseCommand):
+    help = 'Show Graph API rate limiter waits, throttling errors and deferred calls across all workers'
+
+    def handle(self, *args, **options):
+        stats = rate_limiter.get_stats()['cluster']
+        if not stats:
+            self.stdout.write('No rate limiter metrics recorded (or Redis is unavailable)')
+            return
+
+        waits = stats.get('waits', 0)
+        wait_seconds = stats.get('wait_seconds', 0)
+        self.stdout.write(
+            f'waits={waits:.0f} wait_seconds={wait_seconds:.1f} '
+            f'mean_wait={(wait_seconds / waits if waits else 0) * 1000:.0f}ms '
+            f'throttled={stats.get("throttled", 0):.0f} deferred={stats.get("deferred", 0):.0f}'
+        )
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.1 on 2026-10-16 23:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_routing_keys(apps, schema_editor):
+    PlatformAccount = apps.get_model('platforms', 'PlatformAccount')
+
+    accounts = []
+    for account in PlatformAccount.objects.filter(platform='whatsapp', routing_key__isnull=True).iterator():
+        account.routing_key = (account.metadata or {}).get('phone_number_id')
+        if account.routing_key:
+            accounts.append(account)
+
+    PlatformAccount.objects.bulk_update(accounts, ['routing_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('platforms', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='platformaccount',
+            name='routing_key',
+            field=models.CharField(blank=True, help_text='Key webhooks are routed by (WhatsApp phone_number_id)', max_length=255, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='platformaccount',
+            index=models.Index(fields=['platform', 'routing_key'], name='platform_acc_routing_idx'),
+        ),
+        migrations.RunPython(backfill_routing_keys, migrations.RunPython.noop),
+    ]
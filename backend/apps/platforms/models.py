@@ -4,7 +4,8 @@ Platform connection models
 import uuid
 from django.db import models
 from django.conf import settings
-from cryptography.fernet import Fernet
+
+from . import encryption
 
 
 class PlatformAccount(models.Model):
@@ -22,6 +23,10 @@ class PlatformAccount(models.Model):
     platform = models.CharField(max_length=20, choices=PLATFORM_CHOICES)
     platform_user_id = models.CharField(max_length=255, help_text="User ID from the platform")
     platform_username = models.CharField(max_length=255, blank=True, null=True)
+    routing_key = models.CharField(
+        max_length=255, blank=True, null=True,
+        help_text="Key webhooks are routed by (WhatsApp phone_number_id)"
+    )
 
     # Encrypted tokens
     access_token = models.TextField(help_text="Encrypted access token")
@@ -43,6 +48,9 @@ class PlatformAccount(models.Model):
         verbose_name = 'Platform Account'
         verbose_name_plural = 'Platform Accounts'
         unique_together = [['user', 'platform', 'platform_user_id']]
+        indexes = [
+            models.Index(fields=['platform', 'routing_key'], name='platform_acc_routing_idx'),
+        ]
         ordering = ['-created_at']
 
     def __str__(self):
@@ -50,56 +58,41 @@ class PlatformAccount(models.Model):
 
     def encrypt_token(self, token):
         """Encrypt a token using the encryption key"""
-        if not token:
+        try:
+            return encryption.encrypt_token(token)
+        except Exception:
+            # If encryption fails, return original (shouldn't happen in production)
             return token
-        if settings.ENCRYPTION_KEY:
-            try:
-                f = Fernet(settings.ENCRYPTION_KEY)
-                return f.encrypt(token.encode()).decode()
-            except Exception:
-                # If encryption fails, return original (shouldn't happen in production)
-                return token
-        return token
 
     def decrypt_token(self, encrypted_token):
         """Decrypt a token using the encryption key"""
-        if not encrypted_token:
-            return encrypted_token
-        if settings.ENCRYPTION_KEY:
-            try:
-                f = Fernet(settings.ENCRYPTION_KEY)
-                return f.decrypt(encrypted_token.encode()).decode()
-            except Exception:
-                # If decryption fails, assume it's already plaintext
-                return encrypted_token
-        return encrypted_token
+        return encryption.decrypt_token(encrypted_token)
 
     def _is_token_encrypted(self, token):
         """Check if a token is already encrypted"""
-        if not token or not settings.ENCRYPTION_KEY:
-            return False
-        try:
-            f = Fernet(settings.ENCRYPTION_KEY)
-            f.decrypt(token.encode())
-            return True
-        except Exception:
-            return False
+        return encryption.is_encrypted(token)
+
+    def _prepare_token_for_storage(self, token):
+        """Encrypt a token unless it already is; marks ciphertext stored before the marker existed"""
+        if not token or self._is_token_encrypted(token):
+            return token
+        return encryption.mark_legacy_ciphertext(token) or self.encrypt_token(token)
 
     def save(self, *args, **kwargs):
         """Override save to encrypt tokens before saving"""
-        # Encrypt access_token if it's not already encrypted
-        if self.access_token and not self._is_token_encrypted(self.access_token):
-            self.access_token = self.encrypt_token(self.access_token)
+        # WhatsApp webhooks identify the account by its phone number ID
+        if self.platform == 'whatsapp' and not self.routing_key:
+            self.routing_key = (self.metadata or {}).get('phone_number_id')
 
-        # Encrypt refresh_token if it exists and not already encrypted
-        if self.refresh_token and not self._is_token_encrypted(self.refresh_token):
-            self.refresh_token = self.encrypt_token(self.refresh_token)
+        # Encrypt tokens that are not encrypted yet (marked values are left alone)
+        self.access_token = self._prepare_token_for_storage(self.access_token)
+        self.refresh_token = self._prepare_token_for_storage(self.refresh_token)
 
         super().save(*args, **kwargs)
 
     def get_decrypted_access_token(self):
-        """Get the decrypted access token"""
-        return self.decrypt_token(self.access_token)
+        """Get the decrypted access token (cached briefly per account and ciphertext)"""
+        return encryption.decrypted_token_cache.get_or_decrypt(self.pk, self.access_token)
 
     def get_decrypted_refresh_token(self):
         """Get the decrypted refresh token if it exists"""
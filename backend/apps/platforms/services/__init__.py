@@ -1,14 +1,23 @@
 """
 Platform integration services
 """
-from .meta_api import MetaAPIService
+from .http import get_http_session, get_pool_stats, token_concurrency_slot
+from .rate_limit import RateLimitDeferred, get_rate_limit_scopes, rate_limiter
+from .meta_api import MetaAPIService, GRAPH_BATCH_LIMIT
 from .instagram import InstagramService
 from .messenger import MessengerService
 from .whatsapp import WhatsAppService
 
 __all__ = [
     'MetaAPIService',
+    'GRAPH_BATCH_LIMIT',
     'InstagramService',
     'MessengerService',
     'WhatsAppService',
+    'get_http_session',
+    'get_pool_stats',
+    'token_concurrency_slot',
+    'RateLimitDeferred',
+    'get_rate_limit_scopes',
+    'rate_limiter',
 ]
@@ -0,0 +1,108 @@
+"""
+Shared keep-alive HTTP session for Meta Graph API calls
+"""
+import hashlib
+import os
+import threading
+import requests
+from contextlib import contextmanager
+from typing import Dict, Any
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+_session = None
+_session_pid = None
+_lock = threading.Lock()
+_token_semaphores = {}
+
+
+def get_http_session() -> requests.Session:
+    """
+    Get the process-wide HTTP session with a sized connection pool
+
+    The session is rebuilt after a fork so Celery prefork workers never
+    share sockets with their parent.
+
+    Returns:
+        requests.Session reusing TCP/TLS connections to graph.facebook.com
+    """
+    global _session, _session_pid
+
+    if _session is None or _session_pid != os.getpid():
+        with _lock:
+            if _session is None or _session_pid != os.getpid():
+                adapter = HTTPAdapter(
+                    pool_connections=settings.META_HTTP_POOL_CONNECTIONS,
+                    pool_maxsize=settings.META_HTTP_POOL_MAXSIZE,
+                    pool_block=False,
+                )
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+                _session_pid = os.getpid()
+
+    return _session
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """
+    Get connection pool statistics of the shared session
+
+    Returns:
+        Dict with per-host pool stats and totals; requests minus
+        connections_created is the number of reused connections
+    """
+    hosts = {}
+    session = _session if _session_pid == os.getpid() else None
+
+    if session is not None:
+        seen = set()
+        for adapter in session.adapters.values():
+            if id(adapter) in seen:
+                continue
+            seen.add(id(adapter))
+
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                hosts[f'{pool.scheme}://{pool.host}:{pool.port}'] = {
+                    'connections_created': pool.num_connections,
+                    'requests': pool.num_requests,
+                    # The queue is pre-filled with None placeholders for unopened slots
+                    'idle_connections': sum(1 for conn in list(pool.pool.queue) if conn) if pool.pool else 0,
+                    'maxsize': pool.pool.maxsize if pool.pool else 0,
+                }
+
+    return {
+        'hosts': hosts,
+        'connections_created': sum(host['connections_created'] for host in hosts.values()),
+        'requests': sum(host['requests'] for host in hosts.values()),
+        'idle_connections': sum(host['idle_connections'] for host in hosts.values()),
+    }
+
+
+@contextmanager
+def token_concurrency_slot(access_token: str):
+    """
+    Limit how many requests of this process run concurrently for one token
+
+    Args:
+        access_token: Access token the requests are made with
+
+    Yields:
+        Once fewer than META_MAX_CONCURRENCY_PER_TOKEN requests use the token
+    """
+    key = hashlib.sha256(access_token.encode()).hexdigest()
+
+    semaphore = _token_semaphores.get(key)
+    if semaphore is None:
+        with _lock:
+            semaphore = _token_semaphores.setdefault(
+                key, threading.BoundedSemaphore(settings.META_MAX_CONCURRENCY_PER_TOKEN)
+            )
+
+    with semaphore:
+        yield
@@ -2,9 +2,10 @@
 Instagram API service for managing Instagram Direct Messages
 """
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from datetime import datetime
 from .meta_api import MetaAPIService
+from .parsing import parse_each
 
 logger = logging.getLogger(__name__)
 
@@ -26,18 +27,40 @@ class InstagramService(MetaAPIService):
         Returns:
             List of conversation objects
         """
+        return self.get_conversations_page(ig_account_id, access_token, limit).get('data', [])
+
+    def get_conversations_page(
+        self,
+        ig_account_id: str,
+        access_token: str,
+        limit: int = 50,
+        after: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Fetch one page of Instagram conversations, most recently updated first
+
+        Args:
+            ig_account_id: Instagram Business Account ID
+            access_token: Page access token
+            limit: Maximum number of conversations per page
+            after: Paging cursor returned by the previous page
+
+        Returns:
+            Graph API response with 'data' and 'paging', or an empty dict on error
+        """
         endpoint = f'{ig_account_id}/conversations'
         params = {
-            'fields': 'id,participants,messages.limit(1){message,from,created_time}',
+            'fields': 'id,updated_time,participants,messages.limit(1){message,from,created_time}',
             'limit': limit,
         }
+        if after:
+            params['after'] = after
 
         try:
-            response = self.make_api_request('GET', endpoint, access_token, params=params)
-            return response.get('data', [])
+            return self.make_api_request('GET', endpoint, access_token, params=params)
         except Exception as e:
             logger.error(f'Error fetching Instagram conversations: {e}')
-            return []
+            return {}
 
     def get_conversation_messages(
         self,
@@ -56,18 +79,87 @@ class InstagramService(MetaAPIService):
         Returns:
             List of message objects
         """
-        endpoint = f'{conversation_id}/messages'
-        params = {
-            'fields': 'id,message,from,created_time,attachments',
-            'limit': limit,
-        }
+        return self.get_conversation_messages_page(conversation_id, access_token, limit).get('data', [])
+
+    def get_conversation_messages_page(
+        self,
+        conversation_id: str,
+        access_token: str,
+        limit: int = 50,
+        after: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Fetch one page of messages from a conversation, newest first
+
+        Args:
+            conversation_id: Instagram conversation ID
+            access_token: Page access token
+            limit: Maximum number of messages per page
+            after: Paging cursor returned by the previous page
+
+        Returns:
+            Graph API response with 'data' and 'paging', or an empty dict on error
+        """
+        method, endpoint, params = self._conversation_messages_request(conversation_id, limit, after)
 
         try:
-            response = self.make_api_request('GET', endpoint, access_token, params=params)
-            return response.get('data', [])
+            return self.make_api_request(method, endpoint, access_token, params=params)
         except Exception as e:
             logger.error(f'Error fetching Instagram messages: {e}')
-            return []
+            return {}
+
+    def get_conversation_messages_pages(
+        self,
+        pages: List[Tuple[str, Optional[str]]],
+        access_token: str,
+        limit: int = 50
+    ) -> List[Dict[str, Any]]:
+        """
+        Fetch one page of messages for many conversations using batch requests
+
+        Args:
+            pages: (conversation_id, after) tuples; after may be None
+            access_token: Page access token
+            limit: Maximum number of messages per page
+
+        Returns:
+            One Graph API response per tuple, in order; an empty dict marks
+            a conversation whose page could not be fetched
+        """
+        batch = [
+            self._conversation_messages_request(conversation_id, limit, after)
+            for conversation_id, after in pages
+        ]
+
+        try:
+            results = self.make_batch_request(batch, access_token)
+        except Exception as e:
+            logger.error(f'Error fetching Instagram messages batch: {e}')
+            return [{} for _ in pages]
+
+        responses = []
+        for (conversation_id, _), result in zip(pages, results):
+            if result['error']:
+                logger.error(f'Error fetching Instagram messages for {conversation_id}: {result["error"]}')
+                responses.append({})
+            else:
+                responses.append(result['data'])
+        return responses
+
+    def _conversation_messages_request(
+        self,
+        conversation_id: str,
+        limit: int,
+        after: Optional[str]
+    ) -> Tuple[str, str, Dict[str, Any]]:
+        """Build the (method, endpoint, params) request for one page of messages"""
+        params = {
+            'fields': 'id,message,from,created_time,attachments',
+            'limit': limit,
+        }
+        if after:
+            params['after'] = after
+        return 'GET', f'{conversation_id}/messages', params
 
     def send_message(
         self,
@@ -75,7 +167,7 @@ class InstagramService(MetaAPIService):
         message_text: str,
         ig_account_id: str,
         access_token: str
-    ) -> Optional[Dict[str, Any]]:
+    ) -> Dict[str, Any]:
         """
         Send a message to an Instagram user
 
@@ -86,7 +178,10 @@ class InstagramService(MetaAPIService):
             access_token: Page access token
 
         Returns:
-            Response with message ID or None
+            Response with message ID
+
+        Raises:
+            requests.RequestException: If the API call fails
         """
         endpoint = f'{ig_account_id}/messages'
 
@@ -100,7 +195,7 @@ class InstagramService(MetaAPIService):
             return response
         except Exception as e:
             logger.error(f'Error sending Instagram message: {e}')
-            return None
+            raise
 
     def get_user_profile(self, user_id: str, access_token: str) -> Optional[Dict[str, Any]]:
         """
@@ -125,6 +220,37 @@ class InstagramService(MetaAPIService):
             logger.error(f'Error fetching Instagram user profile: {e}')
             return None
 
+    def get_user_profiles(self, user_ids: List[str], access_token: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Get Instagram user profiles for many users using batch requests
+
+        Args:
+            user_ids: User IDs to look up
+            access_token: Page access token
+
+        Returns:
+            Dict mapping user ID to profile data; users whose lookup failed are omitted
+        """
+        params = {
+            'fields': 'id,username,name,profile_pic',
+        }
+
+        try:
+            results = self.make_batch_request(
+                [('GET', f'{user_id}', params) for user_id in user_ids], access_token
+            )
+        except Exception as e:
+            logger.error(f'Error fetching Instagram user profiles: {e}')
+            return {}
+
+        profiles = {}
+        for user_id, result in zip(user_ids, results):
+            if result['error']:
+                logger.error(f'Error fetching Instagram user profile {user_id}: {result["error"]}')
+            else:
+                profiles[user_id] = result['data']
+        return profiles
+
     def mark_message_as_read(
         self,
         message_id: str,
@@ -144,9 +270,41 @@ class InstagramService(MetaAPIService):
         # This is handled automatically when messages are fetched
         return True
 
+    def parse_webhook_events(self, event: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Parse every message in an Instagram webhook payload into standardized format
+
+        Args:
+            event: Raw webhook event data (may batch several entries/changes)
+
+        Yields:
+            Parsed event data, one item per message
+        """
+        entries = event.get('entry', []) if isinstance(event, dict) else event
+        return parse_each(entries, self._parse_webhook_entry, 'Instagram webhook entry')
+
+    def _parse_webhook_entry(self, item: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        return parse_each(item.get('changes', []), self._parse_webhook_change, 'Instagram webhook change')
+
+    def _parse_webhook_change(self, change: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        if change.get('field') == 'messages':
+            value = change.get('value', {})
+
+            # Extract message data
+            yield {
+                'platform': 'instagram',
+                'conversation_id': value.get('thread_id'),
+                'message_id': value.get('mid'),
+                'sender_id': value.get('from', {}).get('id'),
+                'recipient_id': value.get('to', {}).get('id'),
+                'message_text': value.get('message', {}).get('text'),
+                'timestamp': value.get('timestamp'),
+                'attachments': value.get('attachments', []),
+            }
+
     def parse_webhook_event(self, event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
-        Parse Instagram webhook event into standardized format
+        Parse the first message of an Instagram webhook payload
 
         Args:
             event: Raw webhook event data
@@ -154,29 +312,4 @@ class InstagramService(MetaAPIService):
         Returns:
             Parsed event data or None
         """
-        try:
-            entry = event.get('entry', [])
-            if not entry:
-                return None
-
-            for item in entry:
-                changes = item.get('changes', [])
-                for change in changes:
-                    if change.get('field') == 'messages':
-                        value = change.get('value', {})
-
-                        # Extract message data
-                        return {
-                            'platform': 'instagram',
-                            'conversation_id': value.get('thread_id'),
-                            'message_id': value.get('mid'),
-                            'sender_id': value.get('from', {}).get('id'),
-                            'recipient_id': value.get('to', {}).get('id'),
-                            'message_text': value.get('message', {}).get('text'),
-                            'timestamp': value.get('timestamp'),
-                            'attachments': value.get('attachments', []),
-                        }
-            return None
-        except Exception as e:
-            logger.error(f'Error parsing Instagram webhook event: {e}')
-            return None
+        return next(self.parse_webhook_events(event), None)
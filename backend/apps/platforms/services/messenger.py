@@ -2,8 +2,9 @@
 Messenger API service for managing Facebook Messenger conversations
 """
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from .meta_api import MetaAPIService
+from .parsing import parse_each
 
 logger = logging.getLogger(__name__)
 
@@ -25,18 +26,40 @@ class MessengerService(MetaAPIService):
         Returns:
             List of conversation objects
         """
+        return self.get_conversations_page(page_id, access_token, limit).get('data', [])
+
+    def get_conversations_page(
+        self,
+        page_id: str,
+        access_token: str,
+        limit: int = 50,
+        after: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Fetch one page of Messenger conversations, most recently updated first
+
+        Args:
+            page_id: Facebook Page ID
+            access_token: Page access token
+            limit: Maximum number of conversations per page
+            after: Paging cursor returned by the previous page
+
+        Returns:
+            Graph API response with 'data' and 'paging', or an empty dict on error
+        """
         endpoint = f'{page_id}/conversations'
         params = {
             'fields': 'id,participants,updated_time,message_count,unread_count',
             'limit': limit,
         }
+        if after:
+            params['after'] = after
 
         try:
-            response = self.make_api_request('GET', endpoint, access_token, params=params)
-            return response.get('data', [])
+            return self.make_api_request('GET', endpoint, access_token, params=params)
         except Exception as e:
             logger.error(f'Error fetching Messenger conversations: {e}')
-            return []
+            return {}
 
     def get_conversation_messages(
         self,
@@ -55,18 +78,87 @@ class MessengerService(MetaAPIService):
         Returns:
             List of message objects
         """
-        endpoint = f'{conversation_id}/messages'
-        params = {
-            'fields': 'id,message,from,created_time,attachments,sticker',
-            'limit': limit,
-        }
+        return self.get_conversation_messages_page(conversation_id, access_token, limit).get('data', [])
+
+    def get_conversation_messages_page(
+        self,
+        conversation_id: str,
+        access_token: str,
+        limit: int = 50,
+        after: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Fetch one page of messages from a conversation, newest first
+
+        Args:
+            conversation_id: Messenger conversation ID
+            access_token: Page access token
+            limit: Maximum number of messages per page
+            after: Paging cursor returned by the previous page
+
+        Returns:
+            Graph API response with 'data' and 'paging', or an empty dict on error
+        """
+        method, endpoint, params = self._conversation_messages_request(conversation_id, limit, after)
 
         try:
-            response = self.make_api_request('GET', endpoint, access_token, params=params)
-            return response.get('data', [])
+            return self.make_api_request(method, endpoint, access_token, params=params)
         except Exception as e:
             logger.error(f'Error fetching Messenger messages: {e}')
-            return []
+            return {}
+
+    def get_conversation_messages_pages(
+        self,
+        pages: List[Tuple[str, Optional[str]]],
+        access_token: str,
+        limit: int = 50
+    ) -> List[Dict[str, Any]]:
+        """
+        Fetch one page of messages for many conversations using batch requests
+
+        Args:
+            pages: (conversation_id, after) tuples; after may be None
+            access_token: Page access token
+            limit: Maximum number of messages per page
+
+        Returns:
+            One Graph API response per tuple, in order; an empty dict marks
+            a conversation whose page could not be fetched
+        """
+        batch = [
+            self._conversation_messages_request(conversation_id, limit, after)
+            for conversation_id, after in pages
+        ]
+
+        try:
+            results = self.make_batch_request(batch, access_token)
+        except Exception as e:
+            logger.error(f'Error fetching Messenger messages batch: {e}')
+            return [{} for _ in pages]
+
+        responses = []
+        for (conversation_id, _), result in zip(pages, results):
+            if result['error']:
+                logger.error(f'Error fetching Messenger messages for {conversation_id}: {result["error"]}')
+                responses.append({})
+            else:
+                responses.append(result['data'])
+        return responses
+
+    def _conversation_messages_request(
+        self,
+        conversation_id: str,
+        limit: int,
+        after: Optional[str]
+    ) -> Tuple[str, str, Dict[str, Any]]:
+        """Build the (method, endpoint, params) request for one page of messages"""
+        params = {
+            'fields': 'id,message,from,created_time,attachments,sticker',
+            'limit': limit,
+        }
+        if after:
+            params['after'] = after
+        return 'GET', f'{conversation_id}/messages', params
 
     def send_message(
         self,
@@ -74,7 +166,7 @@ class MessengerService(MetaAPIService):
         message_text: str,
         page_id: str,
         access_token: str
-    ) -> Optional[Dict[str, Any]]:
+    ) -> Dict[str, Any]:
         """
         Send a message via Messenger
 
@@ -85,7 +177,10 @@ class MessengerService(MetaAPIService):
             access_token: Page access token
 
         Returns:
-            Response with message ID or None
+            Response with message ID
+
+        Raises:
+            requests.RequestException: If the API call fails
         """
         endpoint = f'{page_id}/messages'
 
@@ -100,7 +195,7 @@ class MessengerService(MetaAPIService):
             return response
         except Exception as e:
             logger.error(f'Error sending Messenger message: {e}')
-            return None
+            raise
 
     def send_message_with_attachment(
         self,
@@ -109,7 +204,7 @@ class MessengerService(MetaAPIService):
         attachment_url: str,
         page_id: str,
         access_token: str
-    ) -> Optional[Dict[str, Any]]:
+    ) -> Dict[str, Any]:
         """
         Send a message with attachment
 
@@ -121,7 +216,10 @@ class MessengerService(MetaAPIService):
             access_token: Page access token
 
         Returns:
-            Response with message ID or None
+            Response with message ID
+
+        Raises:
+            requests.RequestException: If the API call fails
         """
         endpoint = f'{page_id}/messages'
 
@@ -140,7 +238,7 @@ class MessengerService(MetaAPIService):
             return response
         except Exception as e:
             logger.error(f'Error sending Messenger attachment: {e}')
-            return None
+            raise
 
     def get_user_profile(self, user_id: str, access_token: str) -> Optional[Dict[str, Any]]:
         """
@@ -165,6 +263,37 @@ class MessengerService(MetaAPIService):
             logger.error(f'Error fetching Messenger user profile: {e}')
             return None
 
+    def get_user_profiles(self, user_ids: List[str], access_token: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Get Messenger user profiles for many users using batch requests
+
+        Args:
+            user_ids: User IDs to look up
+            access_token: Page access token
+
+        Returns:
+            Dict mapping user ID to profile data; users whose lookup failed are omitted
+        """
+        params = {
+            'fields': 'id,name,first_name,last_name,profile_pic',
+        }
+
+        try:
+            results = self.make_batch_request(
+                [('GET', f'{user_id}', params) for user_id in user_ids], access_token
+            )
+        except Exception as e:
+            logger.error(f'Error fetching Messenger user profiles: {e}')
+            return {}
+
+        profiles = {}
+        for user_id, result in zip(user_ids, results):
+            if result['error']:
+                logger.error(f'Error fetching Messenger user profile {user_id}: {result["error"]}')
+            else:
+                profiles[user_id] = result['data']
+        return profiles
+
     def mark_message_as_read(
         self,
         sender_id: str,
@@ -196,9 +325,41 @@ class MessengerService(MetaAPIService):
             logger.error(f'Error marking Messenger message as read: {e}')
             return False
 
+    def parse_webhook_events(self, event: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Parse every message in a Messenger webhook payload into standardized format
+
+        Args:
+            event: Raw webhook event data (may batch several entries/messaging items)
+
+        Yields:
+            Parsed event data, one item per message
+        """
+        entries = event.get('entry', []) if isinstance(event, dict) else event
+        return parse_each(entries, self._parse_webhook_entry, 'Messenger webhook entry')
+
+    def _parse_webhook_entry(self, item: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        return parse_each(item.get('messaging', []), self._parse_messaging_item, 'Messenger messaging item')
+
+    def _parse_messaging_item(self, message_event: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        # Check if it's a message event
+        if 'message' in message_event:
+            msg = message_event['message']
+
+            yield {
+                'platform': 'messenger',
+                'sender_id': message_event.get('sender', {}).get('id'),
+                'recipient_id': message_event.get('recipient', {}).get('id'),
+                'message_id': msg.get('mid'),
+                'message_text': msg.get('text'),
+                'timestamp': message_event.get('timestamp'),
+                'attachments': msg.get('attachments', []),
+                'is_echo': msg.get('is_echo', False),
+            }
+
     def parse_webhook_event(self, event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
-        Parse Messenger webhook event into standardized format
+        Parse the first message of a Messenger webhook payload
 
         Args:
             event: Raw webhook event data
@@ -206,29 +367,4 @@ class MessengerService(MetaAPIService):
         Returns:
             Parsed event data or None
         """
-        try:
-            entry = event.get('entry', [])
-            if not entry:
-                return None
-
-            for item in entry:
-                messaging = item.get('messaging', [])
-                for message_event in messaging:
-                    # Check if it's a message event
-                    if 'message' in message_event:
-                        msg = message_event['message']
-
-                        return {
-                            'platform': 'messenger',
-                            'sender_id': message_event.get('sender', {}).get('id'),
-                            'recipient_id': message_event.get('recipient', {}).get('id'),
-                            'message_id': msg.get('mid'),
-                            'message_text': msg.get('text'),
-                            'timestamp': message_event.get('timestamp'),
-                            'attachments': msg.get('attachments', []),
-                            'is_echo': msg.get('is_echo', False),
-                        }
-            return None
-        except Exception as e:
-            logger.error(f'Error parsing Messenger webhook event: {e}')
-            return None
+        return next(self.parse_webhook_events(event), None)
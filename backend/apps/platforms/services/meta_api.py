@@ -1,14 +1,21 @@
 """
 Base Meta Graph API service for Instagram and Messenger
 """
+import json
 import requests
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from django.conf import settings
 from urllib.parse import urlencode
 
+from .http import get_http_session
+from .rate_limit import scheduled_request
+
 logger = logging.getLogger(__name__)
 
+# Maximum number of sub-requests Graph API accepts in one batch call
+GRAPH_BATCH_LIMIT = 50
+
 
 class MetaAPIService:
     """
@@ -21,7 +28,8 @@ class MetaAPIService:
         self.app_secret = settings.META_APP_SECRET
         self.redirect_uri = settings.META_REDIRECT_URI
         self.api_version = settings.META_API_VERSION
-        self.base_url = f'https://graph.facebook.com/{self.api_version}'
+        self.base_url = f'{settings.META_GRAPH_API_URL}/{self.api_version}'
+        self.session = get_http_session()
 
     def get_oauth_url(self, platform: str, state: str = None) -> str:
         """
@@ -85,7 +93,7 @@ class MetaAPIService:
         }
 
         try:
-            response = requests.get(url, params=params, timeout=10)
+            response = self.session.get(url, params=params, timeout=10)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -112,7 +120,7 @@ class MetaAPIService:
         }
 
         try:
-            response = requests.get(url, params=params, timeout=10)
+            response = self.session.get(url, params=params, timeout=10)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -136,7 +144,7 @@ class MetaAPIService:
         }
 
         try:
-            response = requests.get(url, headers=headers, timeout=10)
+            response = self.session.get(url, headers=headers, timeout=10)
             response.raise_for_status()
             data = response.json()
             return data.get('data', [])
@@ -166,7 +174,7 @@ class MetaAPIService:
         }
 
         try:
-            response = requests.get(url, params=params, headers=headers, timeout=10)
+            response = self.session.get(url, params=params, headers=headers, timeout=10)
             response.raise_for_status()
             data = response.json()
             ig_account = data.get('instagram_business_account', {})
@@ -207,22 +215,102 @@ class MetaAPIService:
             'Content-Type': 'application/json',
         }
 
-        try:
-            if method.upper() == 'GET':
-                response = requests.get(url, params=params, headers=headers, timeout=10)
-            elif method.upper() == 'POST':
-                response = requests.post(url, params=params, json=data, headers=headers, timeout=10)
-            elif method.upper() == 'DELETE':
-                response = requests.delete(url, params=params, headers=headers, timeout=10)
-            else:
-                raise ValueError(f'Unsupported HTTP method: {method}')
+        if method.upper() not in ('GET', 'POST', 'DELETE'):
+            raise ValueError(f'Unsupported HTTP method: {method}')
 
+        try:
+            response = scheduled_request(
+                self.session, method.upper(), url, access_token,
+                params=params,
+                json=data if method.upper() == 'POST' else None,
+                headers=headers,
+                timeout=10
+            )
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
             logger.error(f'API request error: {method} {endpoint} - {e}')
             raise
 
+    def make_batch_request(
+        self,
+        batch: List[Tuple[str, str, Optional[Dict[str, Any]]]],
+        access_token: str,
+    ) -> List[Dict[str, Any]]:
+        """
+        Make many Graph API requests with ceil(N/50) batch calls
+
+        Args:
+            batch: (method, endpoint, params) tuples; params go to the query
+                   string for GET/DELETE and to the body for POST
+            access_token: Access token used for every sub-request
+
+        Returns:
+            One result per sub-request, in order, with 'status_code', 'data'
+            and 'error' (None on success, error message otherwise)
+        """
+        headers = {
+            'Authorization': f'Bearer {access_token}',
+        }
+
+        results = []
+        for start in range(0, len(batch), GRAPH_BATCH_LIMIT):
+            operations = []
+            for method, endpoint, params in batch[start:start + GRAPH_BATCH_LIMIT]:
+                operation = {'method': method.upper(), 'relative_url': endpoint}
+                if params:
+                    # Nested values (recipient, message, ...) are sent JSON-encoded
+                    encoded = urlencode({
+                        key: json.dumps(value) if isinstance(value, (dict, list)) else value
+                        for key, value in params.items()
+                    })
+                    if method.upper() == 'POST':
+                        operation['body'] = encoded
+                    else:
+                        operation['relative_url'] = f'{endpoint}?{encoded}'
+                operations.append(operation)
+
+            try:
+                # Every operation counts against the rate limits
+                response = scheduled_request(
+                    self.session, 'POST', f'{self.base_url}/', access_token,
+                    cost=len(operations),
+                    data={'batch': json.dumps(operations), 'include_headers': 'false'},
+                    headers=headers,
+                    timeout=30
+                )
+                response.raise_for_status()
+                items = response.json()
+            except requests.exceptions.RequestException as e:
+                logger.error(f'API batch request error: {len(operations)} operations - {e}')
+                raise
+
+            results.extend(self._parse_batch_item(item) for item in items)
+
+        return results
+
+    def _parse_batch_item(self, item: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Convert one batch response item into a result dict"""
+        if item is None:
+            # Graph returns null for sub-requests that did not complete in time
+            return {'status_code': None, 'data': None, 'error': 'Batch sub-request timed out'}
+
+        status_code = item.get('code')
+        try:
+            data = json.loads(item.get('body') or '{}')
+        except ValueError:
+            data = {}
+
+        if status_code and 200 <= status_code < 300:
+            return {'status_code': status_code, 'data': data, 'error': None}
+
+        error = data.get('error', {}) if isinstance(data, dict) else {}
+        return {
+            'status_code': status_code,
+            'data': data,
+            'error': error.get('message') or f'HTTP {status_code}',
+        }
+
     def verify_webhook_signature(self, payload: str, signature: str) -> bool:
         """
         Verify webhook signature from Meta
@@ -0,0 +1,39 @@
+"""
+Webhook payload parsing shared by the platform services
+"""
+import logging
+from typing import Any, Callable, Dict, Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+
+def parse_each(
+    items: Any,
+    parse: Callable[[Any], Iterable[Dict[str, Any]]],
+    description: str
+) -> Iterator[Dict[str, Any]]:
+    """
+    Parse the items of one webhook payload list, skipping malformed ones
+
+    A bad entry, change or message is logged and dropped on its own, so
+    the rest of the batch is still delivered.
+
+    Args:
+        items: List from the payload (entries, changes, messages, ...)
+        parse: Function yielding the parsed events of one item
+        description: What an item is, for the log message
+
+    Yields:
+        Parsed events of every well-formed item
+    """
+    if not isinstance(items, list):
+        logger.error(f'Skipping malformed {description} list: {type(items).__name__}')
+        return
+
+    for item in items:
+        try:
+            parsed = list(parse(item))
+        except Exception as e:
+            logger.error(f'Skipping malformed {description}: {type(e).__name__}: {e}')
+            continue
+        yield from parsed
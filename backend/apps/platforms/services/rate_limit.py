@@ -0,0 +1,391 @@
+"""
+Rate-limit aware scheduling of Meta Graph API calls
+"""
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+import redis
+import requests
+from typing import Dict, Any, List, Optional
+from django.conf import settings
+
+from config.redis import get_redis, redis_failed
+
+logger = logging.getLogger(__name__)
+
+# Graph API error codes that mean the caller is being throttled
+THROTTLE_ERROR_CODES = {4, 17, 32, 613}
+
+# Token bucket shared by every worker: refill, honour blocks set by usage
+# headers or throttling errors, slow the refill down as reported usage grows.
+# Returns the milliseconds to wait before retrying, 0 when the tokens were taken.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = math.min(tonumber(ARGV[4]), capacity)
+local slowdown = tonumber(ARGV[5])
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts', 'blocked_until', 'usage')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+local blocked_until = tonumber(bucket[3]) or 0
+local usage = tonumber(bucket[4]) or 0
+
+if blocked_until > now then
+    return blocked_until - now
+end
+
+if usage > slowdown then
+    rate = rate * math.max(0.05, (100 - usage) / (100 - slowdown))
+end
+
+tokens = math.min(capacity, tokens + (now - ts) * rate / 1000)
+
+local wait = 0
+if tokens < cost then
+    wait = math.ceil((cost - tokens) * 1000 / rate)
+else
+    tokens = tokens - cost
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], 3600000)
+return wait
+"""
+
+
+class RateLimitDeferred(requests.exceptions.RequestException):
+    """Raised when a Graph API call would have to wait longer than META_RATE_LIMIT_MAX_WAIT"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f'Graph API rate limit reached, retry in {retry_after:.1f}s')
+        self.retry_after = retry_after
+
+
+def get_rate_limit_scopes(access_token: str) -> List[str]:
+    """
+    Get the rate limit buckets a Graph API call counts against
+
+    Page tokens and WhatsApp system user tokens each belong to one Page or
+    WABA, so the token identifies the Page/WABA bucket without exposing it.
+
+    Args:
+        access_token: Access token the call is made with
+
+    Returns:
+        Bucket names, app bucket first
+    """
+    return [
+        f'app:{settings.META_APP_ID or "default"}',
+        f'account:{hashlib.sha256(access_token.encode()).hexdigest()[:16]}',
+    ]
+
+
+class GraphRateLimiter:
+    """
+    Redis-backed token buckets shared by all web and Celery processes.
+
+    Usage headers returned by Meta lower the refill rate before throttling
+    starts; throttling errors block the bucket for an exponential, jittered
+    backoff. If Redis is unreachable calls are let through unscheduled.
+    """
+
+    KEY_PREFIX = 'graph:ratelimit'
+
+    def __init__(self):
+        self._script = None
+        self._lock = threading.Lock()
+        self._local = {'waits': 0, 'wait_seconds': 0.0, 'throttled': 0, 'deferred': 0}
+
+    def _redis(self) -> Optional[redis.Redis]:
+        if not settings.META_RATE_LIMIT_ENABLED:
+            return None
+        client = get_redis(settings.META_RATE_LIMIT_REDIS_URL)
+        if client is not None and self._script is None:
+            self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+        return client
+
+    def _redis_failed(self, e: Exception):
+        redis_failed(e, 'calling Graph API unscheduled', settings.META_RATE_LIMIT_REDIS_URL)
+
+    def _bucket_key(self, scope: str) -> str:
+        return f'{self.KEY_PREFIX}:bucket:{scope}'
+
+    def _rate(self, scope: str) -> float:
+        if scope.startswith('app:'):
+            return settings.META_RATE_LIMIT_APP_RATE
+        return settings.META_RATE_LIMIT_ACCOUNT_RATE
+
+    def _record_metric(self, field: str, amount: float = 1):
+        with self._lock:
+            self._local[field] += amount
+        client = self._redis()
+        if client is None:
+            return
+        try:
+            client.hincrbyfloat(f'{self.KEY_PREFIX}:metrics', field, amount)
+        except redis.RedisError as e:
+            self._redis_failed(e)
+
+    def acquire(self, scopes: List[str], cost: int = 1) -> float:
+        """
+        Take `cost` tokens from every bucket, sleeping while they refill
+
+        Args:
+            scopes: Bucket names from get_rate_limit_scopes
+            cost: Number of Graph API calls about to be made
+
+        Returns:
+            Seconds spent waiting
+
+        Raises:
+            RateLimitDeferred: If the wait would exceed META_RATE_LIMIT_MAX_WAIT
+        """
+        waited = 0.0
+
+        for scope in scopes:
+            while True:
+                client = self._redis()
+                if client is None:
+                    return waited
+                try:
+                    wait = self._script(
+                        keys=[self._bucket_key(scope)],
+                        args=[
+                            settings.META_RATE_LIMIT_BURST,
+                            self._rate(scope),
+                            int(time.time() * 1000),
+                            cost,
+                            settings.META_RATE_LIMIT_SLOWDOWN_PERCENT,
+                        ],
+                        client=client,
+                    ) / 1000
+                except redis.RedisError as e:
+                    self._redis_failed(e)
+                    return waited
+
+                if not wait:
+                    break
+                if waited + wait > settings.META_RATE_LIMIT_MAX_WAIT:
+                    self._record_metric('deferred')
+                    raise RateLimitDeferred(wait)
+
+                time.sleep(wait)
+                waited += wait
+
+        if waited:
+            self._record_metric('waits')
+            self._record_metric('wait_seconds', waited)
+        return waited
+
+    def get_delay(self, scopes: List[str]) -> float:
+        """
+        Get how long calls for these buckets are blocked, without taking tokens
+
+        Args:
+            scopes: Bucket names from get_rate_limit_scopes
+
+        Returns:
+            Seconds until the buckets accept calls again, 0 if they do now
+        """
+        client = self._redis()
+        if client is None:
+            return 0
+        try:
+            blocked = [client.hget(self._bucket_key(scope), 'blocked_until') for scope in scopes]
+        except redis.RedisError as e:
+            self._redis_failed(e)
+            return 0
+
+        now = time.time() * 1000
+        return max([(float(value) - now) / 1000 for value in blocked if value] + [0])
+
+    def record_usage(self, scopes: List[str], headers) -> None:
+        """
+        Store the usage Meta reported in the response headers of a call
+
+        X-App-Usage applies to the app bucket; X-Business-Use-Case-Usage and
+        X-Page-Usage to the Page/WABA bucket. Usage is the highest percentage
+        reported, and a non-zero estimated_time_to_regain_access blocks the
+        bucket for that many minutes.
+
+        Args:
+            scopes: Bucket names from get_rate_limit_scopes
+            headers: Response headers
+        """
+        app_scope, account_scope = scopes
+        updates = {}
+
+        app_usage = self._parse_usage_header(headers.get('X-App-Usage'))
+        if app_usage is not None:
+            updates[app_scope] = (max(app_usage.values(), default=0), 0)
+
+        account_usage = []
+        regain_minutes = 0
+        page_usage = self._parse_usage_header(headers.get('X-Page-Usage'))
+        if page_usage is not None:
+            account_usage.extend(page_usage.values())
+
+        business_usage = self._parse_usage_header(headers.get('X-Business-Use-Case-Usage'))
+        for entries in (business_usage or {}).values():
+            for entry in entries if isinstance(entries, list) else []:
+                account_usage.extend(
+                    entry.get(field, 0) for field in ('call_count', 'total_cputime', 'total_time')
+                )
+                regain_minutes = max(regain_minutes, entry.get('estimated_time_to_regain_access', 0))
+        if account_usage or regain_minutes:
+            updates[account_scope] = (max(account_usage, default=0), regain_minutes)
+
+        if not updates:
+            return
+
+        client = self._redis()
+        if client is None:
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            for scope, (usage, regain_minutes) in updates.items():
+                fields = {'usage': usage}
+                if usage >= 100 or regain_minutes:
+                    fields['blocked_until'] = int((time.time() + max(regain_minutes * 60, 60)) * 1000)
+                    logger.warning(f'Graph API usage of {scope} at {usage}%, pausing calls')
+                pipe.hset(self._bucket_key(scope), mapping=fields)
+                pipe.pexpire(self._bucket_key(scope), 3600000)
+            pipe.execute()
+        except redis.RedisError as e:
+            self._redis_failed(e)
+
+    @staticmethod
+    def _parse_usage_header(value: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not value:
+            return None
+        try:
+            usage = json.loads(value)
+        except ValueError:
+            return None
+        return usage if isinstance(usage, dict) else None
+
+    def backoff(self, scopes: List[str], attempt: int, code: int) -> float:
+        """
+        Block the buckets after a throttling error and sleep out the backoff
+
+        The delay is exponential in `attempt` with full jitter, and is shared
+        through Redis so other workers back off as well. Only code 4 (app
+        limit) blocks the app bucket; other codes block the Page/WABA bucket.
+
+        Args:
+            scopes: Bucket names from get_rate_limit_scopes
+            attempt: Zero-based retry attempt
+            code: Graph API error code of the throttling error
+
+        Returns:
+            Seconds slept
+        """
+        delay = random.uniform(0, min(
+            settings.META_RATE_LIMIT_BACKOFF_MAX,
+            settings.META_RATE_LIMIT_BACKOFF_BASE * 2 ** attempt
+        ))
+        self._record_metric('throttled')
+
+        client = self._redis()
+        if client is not None:
+            try:
+                blocked_until = int((time.time() + delay) * 1000)
+                pipe = client.pipeline(transaction=False)
+                for scope in scopes if code == 4 else scopes[1:]:
+                    pipe.hset(self._bucket_key(scope), 'blocked_until', blocked_until)
+                pipe.execute()
+            except redis.RedisError as e:
+                self._redis_failed(e)
+
+        time.sleep(delay)
+        self._record_metric('waits')
+        self._record_metric('wait_seconds', delay)
+        return delay
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get time spent waiting on rate limits
+
+        Returns:
+            Dict with 'process' counters of this process and 'cluster'
+            counters summed over all processes (empty without Redis)
+        """
+        with self._lock:
+            local = dict(self._local)
+
+        cluster = {}
+        client = self._redis()
+        if client is not None:
+            try:
+                cluster = {
+                    key.decode(): float(value)
+                    for key, value in client.hgetall(f'{self.KEY_PREFIX}:metrics').items()
+                }
+            except redis.RedisError as e:
+                self._redis_failed(e)
+
+        return {'process': local, 'cluster': cluster}
+
+
+rate_limiter = GraphRateLimiter()
+
+
+def get_throttle_code(response: requests.Response) -> Optional[int]:
+    """Get the Graph API error code if a response is a throttling error"""
+    if response.status_code < 400:
+        return None
+    try:
+        code = response.json().get('error', {}).get('code')
+    except (ValueError, AttributeError):
+        return None
+    return code if code in THROTTLE_ERROR_CODES else None
+
+
+def scheduled_request(
+    session,
+    method: str,
+    url: str,
+    access_token: str,
+    cost: int = 1,
+    **kwargs
+) -> requests.Response:
+    """
+    Make a Graph API call through the shared rate limiter
+
+    Waits for the app and Page/WABA buckets, records the usage headers of the
+    response and retries throttling errors with exponential backoff.
+
+    Args:
+        session: requests session (or module) making the call
+        method: HTTP method
+        url: Full request URL
+        access_token: Access token the call is made with
+        cost: Number of Graph API calls this request counts as (batch size)
+        **kwargs: Passed through to session.request
+
+    Returns:
+        The final response; raise_for_status is left to the caller
+
+    Raises:
+        RateLimitDeferred: If the call would have to wait too long
+    """
+    scopes = get_rate_limit_scopes(access_token)
+
+    attempt = 0
+    while True:
+        rate_limiter.acquire(scopes, cost)
+        response = session.request(method, url, **kwargs)
+        rate_limiter.record_usage(scopes, response.headers)
+
+        code = get_throttle_code(response)
+        if code is None or attempt >= settings.META_RATE_LIMIT_MAX_RETRIES:
+            return response
+
+        logger.warning(f'Graph API throttled {method} {url} (code {code}), backing off (attempt {attempt + 1})')
+        rate_limiter.backoff(scopes, attempt, code)
+        attempt += 1
@@ -3,9 +3,13 @@ WhatsApp Business API service
 """
 import requests
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional
 from django.conf import settings
 
+from .http import get_http_session
+from .parsing import parse_each
+from .rate_limit import scheduled_request
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,7 +23,8 @@ class WhatsAppService:
         self.business_account_id = settings.WHATSAPP_BUSINESS_ACCOUNT_ID
         self.access_token = settings.WHATSAPP_ACCESS_TOKEN
         self.api_version = settings.META_API_VERSION
-        self.base_url = f'https://graph.facebook.com/{self.api_version}'
+        self.base_url = f'{settings.META_GRAPH_API_URL}/{self.api_version}'
+        self.session = get_http_session()
 
     def send_text_message(
         self,
@@ -27,7 +32,7 @@ class WhatsAppService:
         message_text: str,
         phone_number_id: str = None,
         access_token: str = None
-    ) -> Optional[Dict[str, Any]]:
+    ) -> Dict[str, Any]:
         """
         Send a text message via WhatsApp
 
@@ -38,7 +43,10 @@ class WhatsAppService:
             access_token: Access token (optional, uses default if not provided)
 
         Returns:
-            Response with message ID or None
+            Response with message ID
+
+        Raises:
+            requests.RequestException: If the API call fails
         """
         phone_id = phone_number_id or self.phone_number_id
         token = access_token or self.access_token
@@ -60,17 +68,17 @@ class WhatsAppService:
         try:
             logger.info(f'Sending WhatsApp message to {recipient_phone}')
             logger.info(f'Request data: {data}')
-            response = requests.post(url, headers=headers, json=data, timeout=10)
+            response = scheduled_request(self.session, 'POST', url, token, headers=headers, json=data, timeout=10)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.HTTPError as e:
             error_detail = e.response.text if hasattr(e.response, 'text') else str(e)
             logger.error(f'Error sending WhatsApp message: {e}')
             logger.error(f'WhatsApp API Error Response: {error_detail}')
-            return None
+            raise
         except requests.exceptions.RequestException as e:
             logger.error(f'Error sending WhatsApp message: {e}')
-            return None
+            raise
 
     def send_template_message(
         self,
@@ -125,7 +133,7 @@ class WhatsAppService:
         }
 
         try:
-            response = requests.post(url, headers=headers, json=data, timeout=10)
+            response = scheduled_request(self.session, 'POST', url, token, headers=headers, json=data, timeout=10)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -140,7 +148,7 @@ class WhatsAppService:
         caption: str = None,
         phone_number_id: str = None,
         access_token: str = None
-    ) -> Optional[Dict[str, Any]]:
+    ) -> Dict[str, Any]:
         """
         Send a media message (image, video, audio, document)
 
@@ -153,7 +161,10 @@ class WhatsAppService:
             access_token: Access token
 
         Returns:
-            Response with message ID or None
+            Response with message ID
+
+        Raises:
+            requests.RequestException: If the API call fails
         """
         phone_id = phone_number_id or self.phone_number_id
         token = access_token or self.access_token
@@ -177,12 +188,12 @@ class WhatsAppService:
         }
 
         try:
-            response = requests.post(url, headers=headers, json=data, timeout=10)
+            response = scheduled_request(self.session, 'POST', url, token, headers=headers, json=data, timeout=10)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
             logger.error(f'Error sending WhatsApp media: {e}')
-            return None
+            raise
 
     def mark_message_as_read(
         self,
@@ -218,7 +229,7 @@ class WhatsAppService:
         }
 
         try:
-            response = requests.post(url, headers=headers, json=data, timeout=10)
+            response = scheduled_request(self.session, 'POST', url, token, headers=headers, json=data, timeout=10)
             response.raise_for_status()
             return True
         except requests.exceptions.RequestException as e:
@@ -249,7 +260,7 @@ class WhatsAppService:
         }
 
         try:
-            response = requests.get(url, headers=headers, timeout=10)
+            response = scheduled_request(self.session, 'GET', url, token, headers=headers, timeout=10)
             response.raise_for_status()
             data = response.json()
             return data.get('url')
@@ -312,7 +323,7 @@ class WhatsAppService:
         }
 
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            response = scheduled_request(self.session, 'GET', url, access_token, headers=headers, params=params, timeout=10)
             response.raise_for_status()
             data = response.json()
 
@@ -355,9 +366,94 @@ class WhatsAppService:
                 'error': f'Connection error: {str(e)}'
             }
 
+    def parse_webhook_events(self, event: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Parse every message and status in a WhatsApp webhook payload into standardized format
+
+        Args:
+            event: Raw webhook event data (may batch several entries/changes)
+
+        Yields:
+            Parsed event data, one item per message or status update
+        """
+        entries = event.get('entry', []) if isinstance(event, dict) else event
+        return parse_each(entries, self._parse_webhook_entry, 'WhatsApp webhook entry')
+
+    def _parse_webhook_entry(self, item: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        return parse_each(item.get('changes', []), self._parse_webhook_change, 'WhatsApp webhook change')
+
+    def _parse_webhook_change(self, change: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        value = change.get('value', {})
+        metadata = value.get('metadata', {})
+
+        # Map sender wa_id to the profile name sent alongside the messages
+        contact_names = {
+            contact.get('wa_id'): contact.get('profile', {}).get('name')
+            for contact in value.get('contacts', [])
+        }
+
+        yield from parse_each(
+            value.get('messages', []),
+            lambda msg: self._parse_message(msg, metadata, contact_names),
+            'WhatsApp webhook message'
+        )
+        # Status updates for outbound messages
+        yield from parse_each(
+            value.get('statuses', []),
+            lambda status: self._parse_status(status, metadata),
+            'WhatsApp webhook status'
+        )
+
+    def _parse_message(
+        self,
+        msg: Dict[str, Any],
+        metadata: Dict[str, Any],
+        contact_names: Dict[str, Any]
+    ) -> Iterator[Dict[str, Any]]:
+        # Extract message content based on type
+        message_text = None
+        media_id = None
+        message_type = msg.get('type', 'text')
+
+        if message_type == 'text':
+            message_text = msg.get('text', {}).get('body')
+        elif message_type in ['image', 'video', 'audio', 'document']:
+            media_id = msg.get(message_type, {}).get('id')
+            if message_type in ['image', 'video', 'document']:
+                message_text = msg.get(message_type, {}).get('caption')
+
+        sender_phone = msg.get('from')
+
+        yield {
+            'platform': 'whatsapp',
+            'message_id': msg.get('id'),
+            # Same conversation key as conversations created from the inbox
+            'conversation_id': f'whatsapp_{sender_phone}',
+            'sender_id': sender_phone,
+            'sender_name': contact_names.get(sender_phone) or sender_phone,
+            'sender_phone': sender_phone,
+            'recipient_phone': metadata.get('display_phone_number'),
+            'phone_number_id': metadata.get('phone_number_id'),
+            'message_text': message_text,
+            'message_type': message_type,
+            'media_id': media_id,
+            'timestamp': msg.get('timestamp'),
+        }
+
+    def _parse_status(self, status: Dict[str, Any], metadata: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        yield {
+            'platform': 'whatsapp',
+            'event_type': 'status',
+            'message_id': status.get('id'),
+            'phone_number_id': metadata.get('phone_number_id'),
+            'status': status.get('status'),  # sent, delivered, read, failed
+            'timestamp': status.get('timestamp'),
+            'error': (status.get('errors') or [{}])[0].get('title'),
+        }
+
     def parse_webhook_event(self, event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
-        Parse WhatsApp webhook event into standardized format
+        Parse the first message or status of a WhatsApp webhook payload
 
         Args:
             event: Raw webhook event data
@@ -365,57 +461,4 @@ class WhatsAppService:
         Returns:
             Parsed event data or None
         """
-        try:
-            entry = event.get('entry', [])
-            if not entry:
-                return None
-
-            for item in entry:
-                changes = item.get('changes', [])
-                for change in changes:
-                    value = change.get('value', {})
-
-                    # Check for message
-                    messages = value.get('messages', [])
-                    if messages:
-                        msg = messages[0]
-
-                        # Extract message content based on type
-                        message_text = None
-                        media_id = None
-                        message_type = msg.get('type', 'text')
-
-                        if message_type == 'text':
-                            message_text = msg.get('text', {}).get('body')
-                        elif message_type in ['image', 'video', 'audio', 'document']:
-                            media_id = msg.get(message_type, {}).get('id')
-                            if message_type in ['image', 'video', 'document']:
-                                message_text = msg.get(message_type, {}).get('caption')
-
-                        return {
-                            'platform': 'whatsapp',
-                            'message_id': msg.get('id'),
-                            'sender_phone': msg.get('from'),
-                            'recipient_phone': value.get('metadata', {}).get('display_phone_number'),
-                            'message_text': message_text,
-                            'message_type': message_type,
-                            'media_id': media_id,
-                            'timestamp': msg.get('timestamp'),
-                        }
-
-                    # Check for status update
-                    statuses = value.get('statuses', [])
-                    if statuses:
-                        status = statuses[0]
-                        return {
-                            'platform': 'whatsapp',
-                            'event_type': 'status',
-                            'message_id': status.get('id'),
-                            'status': status.get('status'),  # sent, delivered, read, failed
-                            'timestamp': status.get('timestamp'),
-                        }
-
-            return None
-        except Exception as e:
-            logger.error(f'Error parsing WhatsApp webhook event: {e}')
-            return None
+        return next(self.parse_webhook_events(event), None)
@@ -0,0 +1,39 @@
+"""
+Platform account signal handlers
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import account_resolver
+from .models import PlatformAccount
+
+
+# Fields whose changes do not affect webhook routing
+ROUTING_IRRELEVANT_FIELDS = {'last_sync_at', 'updated_at'}
+
+# Fields the cached routing entries are keyed by
+ROUTING_KEY_FIELDS = {'platform', 'platform_user_id', 'routing_key'}
+
+
+@receiver(pre_save, sender=PlatformAccount)
+def remember_account_routing(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Keep the stored routing keys of an account, so saving new ones drops the old entries too"""
+    instance._stored_routing = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and not ROUTING_KEY_FIELDS & set(update_fields):
+        return
+    instance._stored_routing = PlatformAccount.objects.filter(pk=instance.pk).only(*ROUTING_KEY_FIELDS).first()
+
+
+@receiver(post_save, sender=PlatformAccount)
+@receiver(post_delete, sender=PlatformAccount)
+def invalidate_account_routing(sender, instance, update_fields=None, **kwargs):
+    """Drop cached webhook routing entries of a changed or removed account"""
+    if update_fields and set(update_fields) <= ROUTING_IRRELEVANT_FIELDS:
+        return
+    accounts = [instance]
+    stored = instance.__dict__.pop('_stored_routing', None)
+    if stored is not None:
+        accounts.append(stored)
+    account_resolver.invalidate(accounts)
@@ -7,6 +7,7 @@ from celery import shared_task
 from django.utils import timezone
 from django.db.models import Q
 
+from .cache import account_resolver
 from .models import PlatformAccount
 from .services import MetaAPIService
 
@@ -53,7 +54,7 @@ def refresh_expiring_tokens():
                 # Update platform with new token
                 platform.access_token = new_access_token  # Will be encrypted on save
                 platform.token_expires_at = timezone.now() + timedelta(seconds=expires_in)
-                platform.save()
+                platform.save(update_fields=['access_token', 'token_expires_at', 'updated_at'])
 
                 logger.info(f'Refreshed token for platform {platform.id} ({platform.platform})')
                 refreshed += 1
@@ -87,11 +88,13 @@ def deactivate_expired_tokens():
         token_expires_at__lt=timezone.now()
     )
 
-    count = expired_platforms.count()
+    expired_platforms = list(expired_platforms)
+    count = len(expired_platforms)
     logger.info(f'Found {count} platforms with expired tokens')
 
-    # Deactivate them
-    expired_platforms.update(is_active=False)
+    # Deactivate them; update() sends no post_save, so drop cached routing explicitly
+    PlatformAccount.objects.filter(pk__in=[platform.pk for platform in expired_platforms]).update(is_active=False)
+    account_resolver.invalidate(expired_platforms)
 
     logger.info(f'Deactivated {count} platforms with expired tokens')
     return {
@@ -101,6 +101,7 @@ class PlatformViewSet(viewsets.ViewSet):
             platform='whatsapp',
             platform_user_id=business_account_id or phone_number_id,
             platform_username=verified_name,
+            routing_key=phone_number_id,
             access_token=access_token,  # Will be encrypted on save
             is_active=True,
             metadata={
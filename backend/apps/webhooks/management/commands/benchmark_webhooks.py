@@ -0,0 +1,95 @@
+"""
+Measure webhook view latency (p50/p99) for async and inline ingestion
+"""
+import hashlib
+import hmac
+import json
+import statistics
+import time
+import uuid
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+
+from apps.webhooks.views import instagram_webhook, messenger_webhook, whatsapp_webhook
+
+VIEWS = {
+    'instagram': ('/api/webhooks/instagram/', instagram_webhook),
+    'messenger': ('/api/webhooks/messenger/', messenger_webhook),
+    'whatsapp': ('/api/webhooks/whatsapp/', whatsapp_webhook),
+}
+
+
+def build_payload(platform):
+    """Build a single-message webhook payload for a platform"""
+    mid = f'bench.{uuid.uuid4().hex}'
+    if platform == 'whatsapp':
+        return {
+            'object': 'whatsapp_business_account',
+            'entry': [{'changes': [{'field': 'messages', 'value': {
+                'metadata': {'display_phone_number': '15550000000', 'phone_number_id': 'bench'},
+                'messages': [{'id': mid, 'from': '15551111111', 'type': 'text',
+                              'text': {'body': 'benchmark'}, 'timestamp': str(int(time.time()))}],
+            }}]}],
+        }
+    if platform == 'messenger':
+        return {
+            'object': 'page',
+            'entry': [{'messaging': [{
+                'sender': {'id': 'bench-sender'}, 'recipient': {'id': 'bench-page'},
+                'timestamp': int(time.time() * 1000), 'message': {'mid': mid, 'text': 'benchmark'},
+            }]}],
+        }
+    return {
+        'object': 'instagram',
+        'entry': [{'changes': [{'field': 'messages', 'value': {
+            'mid': mid, 'from': {'id': 'bench-sender'}, 'to': {'id': 'bench-account'},
+            'message': {'text': 'benchmark'}, 'timestamp': int(time.time()),
+        }}]}],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Benchmark webhook view latency (p50/p99) in async and inline ingestion modes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--platform', choices=list(VIEWS), default='whatsapp')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--mode', choices=['async', 'inline', 'both'], default='both')
+
+    def handle(self, *args, **options):
+        modes = ['async', 'inline'] if options['mode'] == 'both' else [options['mode']]
+        for mode in modes:
+            with override_settings(WEBHOOK_ASYNC_PROCESSING=(mode == 'async')):
+                timings = self._run(options['platform'], options['requests'])
+            self._report(mode, timings)
+
+    def _run(self, platform, count):
+        path, view = VIEWS[platform]
+        factory = RequestFactory()
+        secret = settings.META_APP_SECRET.encode()
+        timings = []
+
+        for _ in range(count):
+            body = json.dumps(build_payload(platform))
+            signature = 'sha256=' + hmac.new(secret, body.encode(), hashlib.sha256).hexdigest()
+            request = factory.post(
+                path, data=body, content_type='application/json',
+                HTTP_X_HUB_SIGNATURE_256=signature,
+            )
+
+            start = time.perf_counter()
+            response = view(request)
+            timings.append((time.perf_counter() - start) * 1000)
+
+            if response.status_code != 200:
+                self.stderr.write(f'Unexpected status {response.status_code}: {response.data}')
+
+        return timings
+
+    def _report(self, mode, timings):
+        quantiles = statistics.quantiles(timings, n=100, method='inclusive')
+        self.stdout.write(
+            f'{mode:>6}: n={len(timings)} '
+            f'p50={quantiles[49]:.2f}ms p99={quantiles[98]:.2f}ms max={max(timings):.2f}ms'
+        )
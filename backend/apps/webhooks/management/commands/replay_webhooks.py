@@ -0,0 +1,34 @@
+"""
+Queue dead-lettered webhook payloads for processing again
+"""
+import json
+from django.core.management.base import BaseCommand
+
+from apps.webhooks.models import WebhookLog
+from apps.webhooks.tasks import process_webhook_event
+
+
+class Command(BaseCommand):
+    help = (
+        'Queue the payloads of dead-lettered webhooks on the webhooks Celery queue again, '
+        'for example once the outage that exhausted their retries is over.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--platform', choices=[choice for choice, _ in WebhookLog.PLATFORM_CHOICES])
+        parser.add_argument('--limit', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        logs = WebhookLog.objects.filter(status='dead_letter').order_by('created_at')
+        if options['platform']:
+            logs = logs.filter(platform=options['platform'])
+
+        queued = 0
+        for webhook_log in logs[:options['limit']]:
+            process_webhook_event.apply_async(
+                args=[webhook_log.platform, json.dumps(webhook_log.payload), webhook_log.headers],
+                kwargs={'webhook_log_id': str(webhook_log.pk)},
+            )
+            WebhookLog.objects.filter(pk=webhook_log.pk).update(status='pending')
+            queued += 1
+        self.stdout.write(f'Queued {queued} dead-lettered webhooks')
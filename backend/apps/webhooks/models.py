@@ -20,6 +20,7 @@ class WebhookLog(models.Model):
         ('processing', 'Processing'),
         ('processed', 'Processed'),
         ('failed', 'Failed'),
+        ('dead_letter', 'Dead Letter'),
     ]
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -0,0 +1,184 @@
+"""
+Webhook payload processing services
+"""
+import json
+import logging
+from typing import Dict, Any, List, Optional
+from django.conf import settings
+from django.utils import timezone
+
+from .models import WebhookLog
+from apps.platforms.services import InstagramService, MessengerService, WhatsAppService
+from apps.messages.receipts import StatusService, status_buffer
+from apps.messages.services import MessageService
+from apps.messages.tasks import flush_message_statuses
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookService:
+    """
+    Service for logging, parsing and storing webhook payloads.
+    Shared by the webhook views (inline mode) and the Celery ingestion task.
+    """
+
+    PARSERS = {
+        'instagram': InstagramService,
+        'messenger': MessengerService,
+        'whatsapp': WhatsAppService,
+    }
+
+    @staticmethod
+    def get_event_type(platform: str, event_data: Dict[str, Any]) -> str:
+        """
+        Derive the event type stored on the WebhookLog
+
+        Args:
+            platform: Platform name (instagram, messenger, whatsapp)
+            event_data: Decoded webhook payload
+
+        Returns:
+            Event type string
+        """
+        if platform == 'whatsapp':
+            value = event_data.get('entry', [{}])[0].get('changes', [{}])[0].get('value', {})
+            return 'message' if value.get('messages') else 'status'
+        return event_data.get('object', 'unknown')
+
+    @staticmethod
+    def queue_statuses(statuses: List[Dict[str, Any]]):
+        """
+        Buffer delivery/read statuses for the next batched flush
+
+        Without Redis the statuses are applied right away.
+
+        Args:
+            statuses: Parsed status events
+        """
+        claimed = status_buffer.push(statuses)
+        if claimed is None:
+            StatusService.apply_statuses(statuses)
+            return
+        if not claimed:
+            return
+
+        try:
+            flush_message_statuses.apply_async(countdown=settings.MESSAGE_STATUS_FLUSH_INTERVAL)
+        except Exception as e:
+            logger.error(f'Error scheduling status flush, flushing inline: {e}')
+            flush_message_statuses()
+
+    @staticmethod
+    def log_payload(
+        platform: str,
+        event_data: Dict[str, Any],
+        headers: Optional[Dict[str, str]] = None,
+        status: str = 'processing'
+    ) -> WebhookLog:
+        """
+        Create the WebhookLog of a webhook delivery
+
+        Args:
+            platform: Platform name (instagram, messenger, whatsapp)
+            event_data: Decoded webhook payload
+            headers: Request headers of the original delivery
+            status: Initial status of the log
+
+        Returns:
+            WebhookLog instance
+        """
+        return WebhookLog.objects.create(
+            platform=platform,
+            event_type=WebhookService.get_event_type(platform, event_data),
+            payload=event_data,
+            headers=headers or {},
+            status=status
+        )
+
+    @staticmethod
+    def process_payload(
+        platform: str,
+        event_data: Dict[str, Any],
+        headers: Optional[Dict[str, str]] = None,
+        webhook_log: Optional[WebhookLog] = None
+    ) -> WebhookLog:
+        """
+        Log a webhook payload and store every message it carries
+
+        Args:
+            platform: Platform name (instagram, messenger, whatsapp)
+            event_data: Decoded webhook payload
+            headers: Request headers of the original delivery
+            webhook_log: Log of an earlier attempt at the same delivery, reused
+                         instead of logging the payload again
+
+        Returns:
+            WebhookLog instance recording the outcome
+
+        Raises:
+            Exception: Re-raised after the log has been marked as failed
+        """
+        if webhook_log is None:
+            webhook_log = WebhookService.log_payload(platform, event_data, headers)
+        elif webhook_log.status != 'processing':
+            webhook_log.status = 'processing'
+            webhook_log.save(update_fields=['status', 'updated_at'])
+
+        try:
+            service = WebhookService.PARSERS[platform]()
+            parsed_events = list(service.parse_webhook_events(event_data))
+
+            if parsed_events:
+                logger.info(f'{platform.capitalize()} webhook payload received with {len(parsed_events)} events')
+                # Store messages in database and broadcast via WebSocket
+                MessageService.process_webhook_batch(platform, parsed_events)
+
+                statuses = [event for event in parsed_events if event.get('event_type') == 'status']
+                if statuses:
+                    WebhookService.queue_statuses(statuses)
+
+            webhook_log.status = 'processed'
+            webhook_log.processed_at = timezone.now()
+            webhook_log.save(update_fields=['status', 'processed_at', 'updated_at'])
+            return webhook_log
+
+        except Exception as e:
+            webhook_log.status = 'failed'
+            webhook_log.error_message = str(e)
+            webhook_log.save(update_fields=['status', 'error_message', 'updated_at'])
+            raise
+
+    @staticmethod
+    def dead_letter(
+        platform: str,
+        body: str,
+        headers: Optional[Dict[str, str]],
+        webhook_log: Optional[WebhookLog],
+        error: Exception,
+        attempts: int
+    ):
+        """
+        Keep a webhook payload that could not be processed after all retries
+
+        The payload stays on its WebhookLog with status 'dead_letter' until
+        the replay_webhooks command queues it again. If the log cannot be
+        written either, the raw body goes to the error log.
+
+        Args:
+            platform: Platform name (instagram, messenger, whatsapp)
+            body: Raw request body
+            headers: Request headers of the original delivery
+            webhook_log: Log of the failed attempts, if one was created
+            error: Exception of the last attempt
+            attempts: Number of attempts made
+        """
+        try:
+            if webhook_log is None:
+                webhook_log = WebhookService.log_payload(platform, json.loads(body), headers, status='dead_letter')
+            webhook_log.status = 'dead_letter'
+            webhook_log.error_message = str(error)
+            webhook_log.metadata = {**webhook_log.metadata, 'attempts': attempts}
+            webhook_log.save(update_fields=['status', 'error_message', 'metadata', 'updated_at'])
+            logger.error(f'Dead-lettered {platform} webhook {webhook_log.pk} after {attempts} attempts: {error}')
+        except Exception as e:
+            logger.critical(f'Could not dead-letter {platform} webhook after {attempts} attempts ({e}), body: {body}')
@@ -0,0 +1,60 @@
+"""
+Celery tasks for asynchronous webhook ingestion
+"""
+import json
+import logging
+import random
+from celery import shared_task
+from django.conf import settings
+
+from .models import WebhookLog
+from .services import WebhookService
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(
+    bind=True,
+    name='apps.webhooks.tasks.process_webhook_event',
+    acks_late=True,
+    reject_on_worker_lost=True,
+    ignore_result=True,
+    max_retries=None,
+)
+def process_webhook_event(self, platform, body, headers=None, webhook_log_id=None):
+    """
+    Process a webhook delivery that was acknowledged by the view.
+    The task is acknowledged only after it finishes, so a worker crash
+    hands the raw body to another worker instead of losing it. Failures
+    are retried with exponential backoff, since the platform will not
+    redeliver an acknowledged webhook; once WEBHOOK_TASK_MAX_RETRIES is
+    exhausted the payload is kept as a dead-letter WebhookLog.
+    """
+    try:
+        event_data = json.loads(body)
+    except json.JSONDecodeError as e:
+        logger.error(f'Discarding malformed {platform} webhook body: {e}')
+        return
+
+    webhook_log = None
+    try:
+        if webhook_log_id is not None:
+            webhook_log = WebhookLog.objects.filter(pk=webhook_log_id).first()
+        if webhook_log is None:
+            webhook_log = WebhookService.log_payload(platform, event_data, headers)
+        WebhookService.process_payload(platform, event_data, headers, webhook_log=webhook_log)
+    except Exception as e:
+        attempts = self.request.retries + 1
+        if self.request.retries >= settings.WEBHOOK_TASK_MAX_RETRIES:
+            WebhookService.dead_letter(platform, body, headers, webhook_log, e, attempts)
+            return
+
+        delay = min(
+            settings.WEBHOOK_RETRY_BACKOFF_BASE ** attempts, settings.WEBHOOK_RETRY_BACKOFF_MAX
+        ) + random.uniform(0, 1)
+        logger.warning(f'Error processing {platform} webhook (attempt {attempts}), retrying in {delay:.0f}s: {e}')
+        raise self.retry(
+            exc=e,
+            countdown=delay,
+            kwargs={'webhook_log_id': str(webhook_log.pk) if webhook_log else None},
+        )
@@ -9,15 +9,41 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
-from django.utils import timezone
 
-from .models import WebhookLog
-from apps.platforms.services import MetaAPIService, InstagramService, MessengerService, WhatsAppService
-from apps.messages.services import MessageService
+from apps.platforms.services import MetaAPIService, WhatsAppService
+from .services import WebhookService
+from .tasks import process_webhook_event
 
 logger = logging.getLogger(__name__)
 
 
+def _dispatch_webhook(platform, body, request):
+    """
+    Hand a verified webhook body over for processing
+
+    With WEBHOOK_ASYNC_PROCESSING enabled the raw body is enqueued and Meta
+    gets its 200 immediately; otherwise the payload is processed inline.
+    """
+    headers = dict(request.headers)
+
+    if settings.WEBHOOK_ASYNC_PROCESSING:
+        try:
+            process_webhook_event.delay(platform, body, headers)
+            return Response({'status': 'success'})
+        except Exception as e:
+            # Broker unavailable - fall back to inline processing
+            logger.error(f'Error enqueuing {platform} webhook, processing inline: {e}')
+
+    try:
+        event_data = json.loads(body)
+        WebhookService.process_payload(platform, event_data, headers)
+        return Response({'status': 'success'})
+
+    except Exception as e:
+        logger.error(f'Error processing {platform.capitalize()} webhook: {e}')
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @api_view(['GET', 'POST'])
 @permission_classes([AllowAny])
 @csrf_exempt
@@ -51,33 +77,7 @@ def instagram_webhook(request):
             logger.warning('Instagram webhook signature verification failed')
             return Response('Invalid signature', status=status.HTTP_403_FORBIDDEN)
 
-        try:
-            # Parse event
-            event_data = json.loads(body)
-
-            # Log webhook event
-            WebhookLog.objects.create(
-                platform='instagram',
-                event_type=event_data.get('object', 'unknown'),
-                payload=event_data,
-                headers=dict(request.headers),
-                status='pending'
-            )
-
-            # Parse and process event
-            instagram_service = InstagramService()
-            parsed_event = instagram_service.parse_webhook_event(event_data)
-
-            if parsed_event:
-                logger.info(f'Instagram webhook event received: {parsed_event}')
-                # Store message in database and broadcast via WebSocket
-                MessageService.process_webhook_message('instagram', parsed_event)
-
-            return Response({'status': 'success'})
-
-        except Exception as e:
-            logger.error(f'Error processing Instagram webhook: {e}')
-            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return _dispatch_webhook('instagram', body, request)
 
 
 @api_view(['GET', 'POST'])
@@ -113,35 +113,7 @@ def messenger_webhook(request):
             logger.warning('Messenger webhook signature verification failed')
             return Response('Invalid signature', status=status.HTTP_403_FORBIDDEN)
 
-        try:
-            # Parse event
-            event_data = json.loads(body)
-
-            # Log webhook event
-            webhook_log = WebhookLog.objects.create(
-                platform='messenger',
-                event_type=event_data.get('object', 'unknown'),
-                payload=event_data,
-                headers=dict(request.headers),
-                status='pending'
-            )
-
-            # Parse and process event
-            messenger_service = MessengerService()
-            parsed_event = messenger_service.parse_webhook_event(event_data)
-
-            if parsed_event:
-                logger.info(f'Messenger webhook event received: {parsed_event}')
-                # Store message in database and broadcast via WebSocket
-                MessageService.process_webhook_message('messenger', parsed_event)
-                webhook_log.status = 'processed'
-                webhook_log.save()
-
-            return Response({'status': 'success'})
-
-        except Exception as e:
-            logger.error(f'Error processing Messenger webhook: {e}')
-            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return _dispatch_webhook('messenger', body, request)
 
 
 @api_view(['GET', 'POST'])
@@ -177,36 +149,4 @@ def whatsapp_webhook(request):
             logger.warning('WhatsApp webhook signature verification failed')
             return Response('Invalid signature', status=status.HTTP_403_FORBIDDEN)
 
-        try:
-            # Parse event
-            event_data = json.loads(body)
-
-            # Log webhook event
-            webhook_log = WebhookLog.objects.create(
-                platform='whatsapp',
-                event_type='message' if event_data.get('entry', [{}])[0].get('changes', [{}])[0].get('value', {}).get('messages') else 'status',
-                payload=event_data,
-                headers=dict(request.headers),
-                status='pending'
-            )
-
-            # Parse and process event
-            parsed_event = whatsapp_service.parse_webhook_event(event_data)
-
-            if parsed_event:
-                logger.info(f'WhatsApp webhook event received: {parsed_event}')
-                # Store message in database and broadcast via WebSocket
-                if parsed_event.get('event_type') != 'status':
-                    MessageService.process_webhook_message('whatsapp', parsed_event)
-                webhook_log.status = 'processed'
-                webhook_log.processed_at = timezone.now()
-                webhook_log.save()
-
-            return Response({'status': 'success'})
-
-        except Exception as e:
-            logger.error(f'Error processing WhatsApp webhook: {e}')
-            webhook_log.status = 'failed'
-            webhook_log.error_message = str(e)
-            webhook_log.save()
-            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return _dispatch_webhook('whatsapp', body, request)
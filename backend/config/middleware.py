@@ -4,40 +4,46 @@ Custom middleware for WebSocket JWT authentication
 from channels.db import database_sync_to_async
 from channels.middleware import BaseMiddleware
 from django.contrib.auth.models import AnonymousUser
-from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework_simplejwt.exceptions import TokenError
 from urllib.parse import parse_qs
 import logging
 
+from apps.accounts.cache import user_resolver
+
 logger = logging.getLogger(__name__)
-User = get_user_model()
 
 
-@database_sync_to_async
-def get_user_from_token(token_string):
+async def get_user_from_token(token_string):
     """
     Get user from JWT token
+
+    Users cached in this process are returned without leaving the event
+    loop; others are loaded through the shared user cache.
     """
     try:
         # Validate and decode the token
         access_token = AccessToken(token_string)
         user_id = access_token['user_id']
-
-        # Get the user
-        user = User.objects.get(id=user_id)
-        logger.info(f"WebSocket authenticated user: {user.email}")
-        return user
     except TokenError as e:
         logger.warning(f"WebSocket token error: {str(e)}")
         return AnonymousUser()
-    except User.DoesNotExist:
-        logger.warning(f"WebSocket user not found for token")
-        return AnonymousUser()
     except KeyError as e:
         logger.warning(f"WebSocket token missing key: {str(e)}")
         return AnonymousUser()
 
+    # Get the user
+    user = user_resolver.get_cached(user_id)
+    if user is None:
+        user = await database_sync_to_async(user_resolver.get_user)(user_id)
+
+    if user is None or not user.is_active:
+        logger.warning("WebSocket user not found or inactive for token")
+        return AnonymousUser()
+
+    logger.debug(f"WebSocket authenticated user: {user.pk}")
+    return user
+
 
 class JWTAuthMiddleware(BaseMiddleware):
     """
@@ -53,7 +59,6 @@ class JWTAuthMiddleware(BaseMiddleware):
         token = None
         if 'token' in query_params:
             token = query_params['token'][0]
-            logger.info(f"WebSocket token found in query params: {token[:20]}...")
 
         # If no token in query params, try headers
         if not token:
@@ -61,15 +66,12 @@ class JWTAuthMiddleware(BaseMiddleware):
             auth_header = headers.get(b'authorization', b'').decode()
             if auth_header.startswith('Bearer '):
                 token = auth_header[7:]
-                logger.info(f"WebSocket token found in headers: {token[:20]}...")
 
         # Authenticate user
         if token:
-            logger.info(f"Attempting to authenticate WebSocket with token")
             scope['user'] = await get_user_from_token(token)
-            logger.info(f"WebSocket authenticated user: {scope['user']}, is_authenticated: {scope['user'].is_authenticated if hasattr(scope['user'], 'is_authenticated') else False}")
         else:
-            logger.warning(f"WebSocket no token provided. Query string: {query_string[:100]}")
+            logger.warning("WebSocket connection without token")
             scope['user'] = AnonymousUser()
 
         return await super().__call__(scope, receive, send)
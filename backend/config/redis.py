@@ -0,0 +1,70 @@
+"""
+Shared Redis clients with one failure backoff per server
+"""
+import logging
+import threading
+import time
+from typing import Dict, Optional
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_clients: Dict[str, redis.Redis] = {}
+_down_until: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def _url(url: Optional[str]) -> str:
+    return url or settings.CACHES['default']['LOCATION']
+
+
+def redis_available(url: Optional[str] = None) -> bool:
+    """
+    Whether a Redis server may be used, i.e. no failure was reported within
+    the last REDIS_FAILURE_BACKOFF seconds
+
+    Args:
+        url: Redis URL, the default cache's LOCATION if omitted
+    """
+    return time.monotonic() >= _down_until.get(_url(url), 0)
+
+
+def get_redis(url: Optional[str] = None) -> Optional[redis.Redis]:
+    """
+    Get the process-wide client of a Redis server
+
+    Clients give up after a second. Callers fall back to working without
+    Redis when None is returned and report errors through redis_failed(),
+    so one outage costs one timeout instead of one per call.
+
+    Args:
+        url: Redis URL, the default cache's LOCATION if omitted
+
+    Returns:
+        Redis client, or None while the server is being skipped
+    """
+    url = _url(url)
+    if not redis_available(url):
+        return None
+    client = _clients.get(url)
+    if client is None:
+        with _lock:
+            client = _clients.get(url)
+            if client is None:
+                client = _clients[url] = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+    return client
+
+
+def redis_failed(error: Exception, fallback: str, url: Optional[str] = None):
+    """
+    Report a Redis error; the server is skipped by every caller for
+    REDIS_FAILURE_BACKOFF seconds
+
+    Args:
+        error: Exception raised by the client
+        fallback: What the caller does without Redis, for the log
+        url: Redis URL, the default cache's LOCATION if omitted
+    """
+    logger.warning(f'Redis unavailable, {fallback}: {error}')
+    _down_until[_url(url)] = time.monotonic() + settings.REDIS_FAILURE_BACKOFF
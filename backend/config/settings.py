@@ -128,7 +128,7 @@ AUTH_USER_MODEL = 'accounts.User'
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.accounts.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -164,6 +164,12 @@ SIMPLE_JWT = {
     'AUTH_HEADER_NAME': 'HTTP_AUTHORIZATION',
 }
 
+# Token user cache shared by REST and WebSocket authentication: lifetimes in
+# seconds for the default cache and the per-process LRU, and the LRU size
+USER_CACHE_TTL = env.int('USER_CACHE_TTL', default=60)
+USER_LOCAL_CACHE_TTL = env.int('USER_LOCAL_CACHE_TTL', default=10)
+USER_LOCAL_CACHE_SIZE = env.int('USER_LOCAL_CACHE_SIZE', default=10000)
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = env.list('CORS_ALLOWED_ORIGINS', default=['http://localhost:5173'])
 CORS_ALLOW_CREDENTIALS = True
@@ -177,6 +183,52 @@ CHANNEL_LAYERS = {
         },
     },
 }
+# New-message events are held this many seconds (0 sends at once) and sent
+# per user as one messages_batch event of at most WEBSOCKET_BATCH_MAX_MESSAGES
+WEBSOCKET_BATCH_WINDOW = env.float('WEBSOCKET_BATCH_WINDOW', default=0.005)
+WEBSOCKET_BATCH_MAX_MESSAGES = max(1, env.int('WEBSOCKET_BATCH_MAX_MESSAGES', default=100))
+# Per-user Redis Stream of sent events, replayed to clients reconnecting with ?since=<event_id>:
+# approximate length cap, seconds kept after the last event, and most events replayed at once
+WEBSOCKET_STREAM_MAXLEN = env.int('WEBSOCKET_STREAM_MAXLEN', default=1000)
+WEBSOCKET_STREAM_TTL = env.int('WEBSOCKET_STREAM_TTL', default=86400)
+WEBSOCKET_REPLAY_MAX = env.int('WEBSOCKET_REPLAY_MAX', default=1000)
+
+# Cache (Redis)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': env('CACHE_URL', default='redis://localhost:6379/1'),
+        'KEY_PREFIX': 'cahts',
+        # Fail fast; callers fall back to the database (see config/redis.py)
+        'OPTIONS': {'socket_timeout': 1, 'socket_connect_timeout': 1},
+    },
+}
+# Seconds a Redis server is skipped after an error, by every cache, buffer
+# and limiter that uses it (see config/redis.py)
+REDIS_FAILURE_BACKOFF = env.int('REDIS_FAILURE_BACKOFF', default=30)
+
+# Webhook routing key -> platform account cache: lifetimes in seconds of
+# Redis entries for known and unknown keys and of the per-process LRU, and
+# the LRU size
+PLATFORM_ACCOUNT_CACHE_TTL = env.int('PLATFORM_ACCOUNT_CACHE_TTL', default=3600)
+PLATFORM_ACCOUNT_MISSING_CACHE_TTL = env.int('PLATFORM_ACCOUNT_MISSING_CACHE_TTL', default=300)
+PLATFORM_ACCOUNT_LOCAL_CACHE_TTL = env.int('PLATFORM_ACCOUNT_LOCAL_CACHE_TTL', default=30)
+PLATFORM_ACCOUNT_LOCAL_CACHE_SIZE = env.int('PLATFORM_ACCOUNT_LOCAL_CACHE_SIZE', default=1024)
+
+# Daily analytics: closed days re-aggregated until finalized, hours after a
+# day's end before it is finalized, and rows per upsert statement
+ANALYTICS_AGGREGATION_DAYS = env.int('ANALYTICS_AGGREGATION_DAYS', default=3)
+ANALYTICS_FINALIZE_AFTER_HOURS = env.int('ANALYTICS_FINALIZE_AFTER_HOURS', default=6)
+ANALYTICS_UPSERT_BATCH_SIZE = env.int('ANALYTICS_UPSERT_BATCH_SIZE', default=1000)
+# Response times: replies slower than this many hours are not measured,
+# seconds new messages are left to commit before they are processed, and
+# users per pairing query
+ANALYTICS_RESPONSE_MAX_HOURS = env.int('ANALYTICS_RESPONSE_MAX_HOURS', default=72)
+ANALYTICS_RESPONSE_TIME_LAG = env.int('ANALYTICS_RESPONSE_TIME_LAG', default=60)
+ANALYTICS_RESPONSE_TIME_BATCH_SIZE = env.int('ANALYTICS_RESPONSE_TIME_BATCH_SIZE', default=500)
+# Seconds the per-platform totals behind /stats/messages and /platform are
+# cached; message writes and mark-read requests drop them sooner
+ANALYTICS_STATS_CACHE_TTL = env.int('ANALYTICS_STATS_CACHE_TTL', default=30)
 
 # Celery Configuration
 CELERY_BROKER_URL = env('CELERY_BROKER_URL', default='redis://localhost:6379/0')
@@ -185,6 +237,11 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_TASK_ROUTES = {
+    'apps.webhooks.tasks.*': {'queue': 'webhooks'},
+    'apps.messages.tasks.send_outbound_message': {'queue': 'outbound'},
+    'apps.messages.tasks.flush_message_statuses': {'queue': 'webhooks'},
+}
 CELERY_BEAT_SCHEDULE = {
     'sync-messages-every-5-minutes': {
         'task': 'apps.messages.tasks.sync_all_platforms',
@@ -194,6 +251,10 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'apps.analytics.tasks.aggregate_daily_analytics',
         'schedule': 3600.0,  # 1 hour
     },
+    'update-response-times-every-10-minutes': {
+        'task': 'apps.analytics.tasks.update_response_times',
+        'schedule': 600.0,  # 10 minutes
+    },
     'refresh-expiring-tokens-daily': {
         'task': 'apps.platforms.tasks.refresh_expiring_tokens',
         'schedule': 86400.0,  # 24 hours (1 day)
@@ -202,6 +263,14 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'apps.platforms.tasks.deactivate_expired_tokens',
         'schedule': 86400.0,  # 24 hours (1 day)
     },
+    'requeue-outbound-messages-every-minute': {
+        'task': 'apps.messages.tasks.requeue_outbound_messages',
+        'schedule': 60.0,  # 1 minute
+    },
+    'flush-message-statuses-every-minute': {
+        'task': 'apps.messages.tasks.flush_message_statuses',
+        'schedule': 60.0,  # 1 minute
+    },
 }
 
 # Meta API Configuration
@@ -209,6 +278,50 @@ META_APP_ID = env('META_APP_ID', default='')
 META_APP_SECRET = env('META_APP_SECRET', default='')
 META_REDIRECT_URI = env('META_REDIRECT_URI', default='http://localhost:8000/api/platforms/callback')
 META_API_VERSION = 'v18.0'
+# Graph API host, overridable to point workers at a stub server
+META_GRAPH_API_URL = env('META_GRAPH_API_URL', default='https://graph.facebook.com')
+# Keep-alive connection pool shared by all Graph API calls of a process
+META_HTTP_POOL_CONNECTIONS = env.int('META_HTTP_POOL_CONNECTIONS', default=10)
+META_HTTP_POOL_MAXSIZE = env.int('META_HTTP_POOL_MAXSIZE', default=20)
+META_MAX_CONCURRENCY_PER_TOKEN = env.int('META_MAX_CONCURRENCY_PER_TOKEN', default=4)
+# Graph API rate limiting shared across workers (token buckets in Redis);
+# rates are calls per second, waits and backoff in seconds
+META_RATE_LIMIT_ENABLED = env.bool('META_RATE_LIMIT_ENABLED', default=True)
+META_RATE_LIMIT_REDIS_URL = env('META_RATE_LIMIT_REDIS_URL', default=env('REDIS_URL', default='redis://localhost:6379/0'))
+META_RATE_LIMIT_APP_RATE = env.float('META_RATE_LIMIT_APP_RATE', default=50)
+META_RATE_LIMIT_ACCOUNT_RATE = env.float('META_RATE_LIMIT_ACCOUNT_RATE', default=10)
+META_RATE_LIMIT_BURST = env.int('META_RATE_LIMIT_BURST', default=50)
+META_RATE_LIMIT_SLOWDOWN_PERCENT = env.int('META_RATE_LIMIT_SLOWDOWN_PERCENT', default=75)
+META_RATE_LIMIT_MAX_WAIT = env.float('META_RATE_LIMIT_MAX_WAIT', default=30)
+META_RATE_LIMIT_MAX_RETRIES = env.int('META_RATE_LIMIT_MAX_RETRIES', default=3)
+META_RATE_LIMIT_BACKOFF_BASE = env.float('META_RATE_LIMIT_BACKOFF_BASE', default=1)
+META_RATE_LIMIT_BACKOFF_MAX = env.float('META_RATE_LIMIT_BACKOFF_MAX', default=60)
+
+# Maximum Graph API pages followed per conversation list/conversation in one sync
+SYNC_MAX_PAGES = env.int('SYNC_MAX_PAGES', default=5)
+# Conversations whose messages are fetched in parallel during one sync
+SYNC_FETCH_CONCURRENCY = env.int('SYNC_FETCH_CONCURRENCY', default=8)
+# Searches matching up to this many messages are ranked and counted exactly;
+# broader ones are ordered by recency and their totals estimated
+SEARCH_RANK_LIMIT = env.int('SEARCH_RANK_LIMIT', default=1000)
+# Outbound sends on the 'outbound' Celery queue: attempts before a message is
+# marked failed, and the exponential retry backoff in seconds
+OUTBOUND_SEND_MAX_ATTEMPTS = env.int('OUTBOUND_SEND_MAX_ATTEMPTS', default=5)
+OUTBOUND_RETRY_BACKOFF_BASE = env.float('OUTBOUND_RETRY_BACKOFF_BASE', default=2)
+OUTBOUND_RETRY_BACKOFF_MAX = env.float('OUTBOUND_RETRY_BACKOFF_MAX', default=300)
+# Longest a live send can take inside scheduled_request: each attempt may wait
+# out the rate limiter plus the 10s connect and read timeouts, and every retry
+# after a throttling error sleeps up to the backoff cap first
+OUTBOUND_SEND_MAX_SECONDS = (
+    (META_RATE_LIMIT_MAX_RETRIES + 1) * (META_RATE_LIMIT_MAX_WAIT + 2 * 10)
+    + META_RATE_LIMIT_MAX_RETRIES * META_RATE_LIMIT_BACKOFF_MAX
+)
+# Seconds after which a send claimed by a worker that died is attempted again;
+# never below the longest live send, which would then be claimed and sent twice
+OUTBOUND_SEND_CLAIM_TIMEOUT = max(
+    env.int('OUTBOUND_SEND_CLAIM_TIMEOUT', default=0),
+    int(OUTBOUND_SEND_MAX_SECONDS) + 60,
+)
 
 # WhatsApp Configuration
 WHATSAPP_PHONE_NUMBER_ID = env('WHATSAPP_PHONE_NUMBER_ID', default='')
@@ -217,9 +330,26 @@ WHATSAPP_ACCESS_TOKEN = env('WHATSAPP_ACCESS_TOKEN', default='')
 
 # Webhook Configuration
 WEBHOOK_VERIFY_TOKEN = env('WEBHOOK_VERIFY_TOKEN', default='chats-webhook-token')
+# Acknowledge webhooks after signature check and process them on the 'webhooks' Celery queue
+WEBHOOK_ASYNC_PROCESSING = env.bool('WEBHOOK_ASYNC_PROCESSING', default=True)
+# Retries of a failed webhook task before its payload is dead-lettered, and
+# the exponential retry backoff in seconds
+WEBHOOK_TASK_MAX_RETRIES = env.int('WEBHOOK_TASK_MAX_RETRIES', default=8)
+WEBHOOK_RETRY_BACKOFF_BASE = env.float('WEBHOOK_RETRY_BACKOFF_BASE', default=2)
+WEBHOOK_RETRY_BACKOFF_MAX = env.float('WEBHOOK_RETRY_BACKOFF_MAX', default=600)
+# Delivery/read statuses: seconds they are buffered before one batched flush,
+# events per bulk update, and flushes a status waits for its message to be stored
+MESSAGE_STATUS_FLUSH_INTERVAL = env.float('MESSAGE_STATUS_FLUSH_INTERVAL', default=0.5)
+MESSAGE_STATUS_BATCH_SIZE = env.int('MESSAGE_STATUS_BATCH_SIZE', default=2000)
+MESSAGE_STATUS_MAX_DEFERS = env.int('MESSAGE_STATUS_MAX_DEFERS', default=3)
 
 # Encryption Key for Platform Tokens
 ENCRYPTION_KEY = env('ENCRYPTION_KEY', default='').encode() if env('ENCRYPTION_KEY', default='') else None
+# Previous keys, still accepted for decryption while tokens are rotated
+ENCRYPTION_OLD_KEYS = env.list('ENCRYPTION_OLD_KEYS', default=[])
+# In-process cache of decrypted tokens: lifetime in seconds (0 disables) and size
+PLATFORM_TOKEN_CACHE_TTL = env.int('PLATFORM_TOKEN_CACHE_TTL', default=60)
+PLATFORM_TOKEN_CACHE_SIZE = env.int('PLATFORM_TOKEN_CACHE_SIZE', default=1024)
 
 # Logging
 LOGGING = {
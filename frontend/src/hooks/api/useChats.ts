@@ -82,6 +82,17 @@ export const useRealtimeMessages = (onNewMessage?: (message: Message) => void) =
       }
     });
 
+    // Handle sent/failed outbound messages
+    const unsubscribeStatus = websocketService.onStatus((event) => {
+      queryClient.invalidateQueries({ queryKey: ['conversation', event.conversation_id] });
+    });
+
+    // Refetch lists when missed events could not be replayed
+    const unsubscribeResync = websocketService.onResync(() => {
+      queryClient.invalidateQueries({ queryKey: ['conversations'] });
+      queryClient.invalidateQueries({ queryKey: ['conversation'] });
+    });
+
     // Handle connection state
     const unsubscribeConnect = websocketService.onConnect(() => {
       setIsConnected(true);
@@ -97,6 +108,8 @@ export const useRealtimeMessages = (onNewMessage?: (message: Message) => void) =
     // Cleanup on unmount
     return () => {
       unsubscribeMessage();
+      unsubscribeStatus();
+      unsubscribeResync();
       unsubscribeConnect();
       unsubscribeDisconnect();
     };
@@ -42,12 +42,13 @@ const ConversationDetail = () => {
         content: data.content,
         message_type: (data.messageType as any) || 'text',
         media_url: data.mediaUrl,
+        client_message_id: crypto.randomUUID(),
       }),
     onSuccess: () => {
       // Refresh conversation to get new message
       queryClient.invalidateQueries({ queryKey: ['conversation', id] });
       queryClient.invalidateQueries({ queryKey: ['conversations'] });
-      toast.success('Message sent!');
+      toast.success('Message queued');
     },
     onError: (error) => {
       toast.error(handleApiError(error));
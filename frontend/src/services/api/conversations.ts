@@ -23,19 +23,18 @@ export interface Conversation {
 
 export interface ConversationDetail extends Conversation {
   messages: Message[];
+  messages_cursor: string | null;
 }
 
 export interface PaginatedConversations {
-  count: number;
-  next?: string;
-  previous?: string;
+  next: string | null;
   results: Conversation[];
 }
 
 export interface ConversationFilters {
   platform?: 'instagram' | 'messenger' | 'whatsapp';
   is_archived?: boolean;
-  page?: number;
+  cursor?: string;
   page_size?: number;
 }
 
@@ -43,6 +42,7 @@ export interface SendMessageData {
   content: string;
   message_type?: 'text' | 'image' | 'video' | 'audio' | 'file';
   media_url?: string;
+  client_message_id?: string;
 }
 
 export const conversationsApi = {
@@ -54,7 +54,7 @@ export const conversationsApi = {
 
     if (filters?.platform) params.append('platform', filters.platform);
     if (filters?.is_archived !== undefined) params.append('is_archived', String(filters.is_archived));
-    if (filters?.page) params.append('page', String(filters.page));
+    if (filters?.cursor) params.append('cursor', filters.cursor);
     if (filters?.page_size) params.append('page_size', String(filters.page_size));
 
     const response = await apiClient.get<PaginatedConversations>(`/messages/conversations/?${params}`);
@@ -62,11 +62,15 @@ export const conversationsApi = {
   },
 
   /**
-   * Get a single conversation with recent messages
+   * Get a single conversation with recent messages.
+   * Pass the returned messages_cursor as messagesCursor to load older messages.
    */
-  get: async (id: string, messagesLimit: number = 50): Promise<ConversationDetail> => {
+  get: async (id: string, messagesLimit: number = 50, messagesCursor?: string): Promise<ConversationDetail> => {
+    const params = new URLSearchParams({ messages_limit: String(messagesLimit) });
+    if (messagesCursor) params.append('messages_cursor', messagesCursor);
+
     const response = await apiClient.get<ConversationDetail>(
-      `/messages/conversations/${id}/?messages_limit=${messagesLimit}`
+      `/messages/conversations/${id}/?${params}`
     );
     return response.data;
   },
@@ -1,11 +1,13 @@
 import apiClient from './client';
 
+export type MessageStatus = 'pending' | 'sending' | 'sent' | 'delivered' | 'read' | 'failed';
+
 export interface Message {
   id: string;
   conversation: string;
   conversation_participant: string;
   platform: string;
-  platform_message_id: string;
+  platform_message_id: string | null;
   message_type: 'text' | 'image' | 'video' | 'audio' | 'file' | 'sticker' | 'location';
   content: string;
   media_url?: string;
@@ -13,6 +15,8 @@ export interface Message {
   sender_name: string;
   is_incoming: boolean;
   is_read: boolean;
+  status: MessageStatus;
+  client_message_id?: string | null;
   read_at?: string;
   delivered_at?: string;
   sent_at: string;
@@ -20,9 +24,7 @@ export interface Message {
 }
 
 export interface PaginatedMessages {
-  count: number;
-  next?: string;
-  previous?: string;
+  next: string | null;
   results: Message[];
 }
 
@@ -30,7 +32,7 @@ export interface MessageFilters {
   conversation?: string;
   platform?: 'instagram' | 'messenger' | 'whatsapp';
   is_read?: boolean;
-  page?: number;
+  cursor?: string;
   page_size?: number;
 }
 
@@ -44,7 +46,7 @@ export const messagesApi = {
     if (filters?.conversation) params.append('conversation', filters.conversation);
     if (filters?.platform) params.append('platform', filters.platform);
     if (filters?.is_read !== undefined) params.append('is_read', String(filters.is_read));
-    if (filters?.page) params.append('page', String(filters.page));
+    if (filters?.cursor) params.append('cursor', filters.cursor);
     if (filters?.page_size) params.append('page_size', String(filters.page_size));
 
     const response = await apiClient.get<PaginatedMessages>(`/messages/messages/?${params}`);
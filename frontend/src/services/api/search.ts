@@ -7,6 +7,7 @@ export interface SearchFilters {
   platform?: 'instagram' | 'messenger' | 'whatsapp';
   is_read?: boolean;
   limit?: number;
+  cursor?: string;
 }
 
 export interface SearchResults {
@@ -16,6 +17,7 @@ export interface SearchResults {
     conversations: Conversation[];
     total_messages: number;
     total_conversations: number;
+    messages_cursor: string | null;
   };
 }
 
@@ -30,6 +32,7 @@ export const searchApi = {
     if (filters.platform) params.append('platform', filters.platform);
     if (filters.is_read !== undefined) params.append('is_read', String(filters.is_read));
     if (filters.limit) params.append('limit', String(filters.limit));
+    if (filters.cursor) params.append('cursor', filters.cursor);
 
     const response = await apiClient.get<SearchResults>(`/messages/search/?${params}`);
     return response.data;
@@ -1,15 +1,30 @@
-import { Message } from './api/messages';
+import { Message, MessageStatus } from './api/messages';
+
+export interface MessageStatusEvent {
+  message_id: string;
+  conversation_id: string;
+  status: MessageStatus;
+  platform_message_id?: string | null;
+  delivered_at?: string | null;
+  read_at?: string | null;
+  error?: string | null;
+}
 
 type MessageHandler = (message: Message) => void;
+type StatusHandler = (event: MessageStatusEvent) => void;
 type ErrorHandler = (error: Event) => void;
 type ConnectionHandler = () => void;
 
 class WebSocketService {
   private ws: WebSocket | null = null;
   private messageHandlers: Set<MessageHandler> = new Set();
+  private statusHandlers: Set<StatusHandler> = new Set();
   private errorHandlers: Set<ErrorHandler> = new Set();
   private connectHandlers: Set<ConnectionHandler> = new Set();
   private disconnectHandlers: Set<ConnectionHandler> = new Set();
+  private resyncHandlers: Set<ConnectionHandler> = new Set();
+  private lastEventId: string | null = null;
+  private wasConnected = false;
   private reconnectAttempts = 0;
   private maxReconnectAttempts = 5;
   private reconnectDelay = 1000; // Start with 1 second
@@ -38,7 +53,12 @@ class WebSocketService {
     }
 
     // Construct WebSocket URL with user ID and token (URL encode the token)
-    const url = `${wsUrl}/messages/${userId}/?token=${encodeURIComponent(token)}`;
+    let url = `${wsUrl}/messages/${userId}/?token=${encodeURIComponent(token)}`;
+
+    // Resume after the last event seen, so missed events are replayed
+    if (this.lastEventId) {
+      url += `&since=${encodeURIComponent(this.lastEventId)}`;
+    }
 
     console.log('🔌 Connecting to WebSocket...');
     console.log('  User ID:', userId);
@@ -59,9 +79,35 @@ class WebSocketService {
       try {
         const data = JSON.parse(event.data);
 
+        if (data.type === 'connection_established') {
+          // A reconnect with nothing to resume from may have missed events
+          if (this.wasConnected && !this.lastEventId) {
+            this.resyncHandlers.forEach((handler) => handler());
+          }
+          this.lastEventId = this.lastEventId || data.event_id || null;
+          this.wasConnected = true;
+          return;
+        }
+        if (data.event_id) {
+          this.lastEventId = data.event_id;
+        }
+
         // Handle different message types
-        if (data.type === 'new_message' && data.message) {
+        if (data.type === 'resync') {
+          // Too much was missed to replay; refetch instead
+          this.resyncHandlers.forEach((handler) => handler());
+        } else if (data.type === 'new_message' && data.message) {
           this.messageHandlers.forEach((handler) => handler(data.message));
+        } else if (data.type === 'messages_batch' && Array.isArray(data.messages)) {
+          data.messages.forEach((message: Message) => {
+            this.messageHandlers.forEach((handler) => handler(message));
+          });
+        } else if (data.type === 'message_status' && data.message) {
+          this.statusHandlers.forEach((handler) => handler(data.message));
+        } else if (data.type === 'message_receipts' && Array.isArray(data.receipts)) {
+          data.receipts.forEach((receipt: MessageStatusEvent) => {
+            this.statusHandlers.forEach((handler) => handler(receipt));
+          });
         }
       } catch (error) {
         console.error('Error parsing WebSocket message:', error);
@@ -97,6 +143,8 @@ class WebSocketService {
     }
 
     this.userId = null;
+    this.lastEventId = null;
+    this.wasConnected = false;
     this.reconnectAttempts = 0;
   }
 
@@ -140,6 +188,17 @@ class WebSocketService {
     };
   }
 
+  /**
+   * Subscribe to outbound message status changes
+   */
+  onStatus(handler: StatusHandler): () => void {
+    this.statusHandlers.add(handler);
+
+    return () => {
+      this.statusHandlers.delete(handler);
+    };
+  }
+
   /**
    * Subscribe to connection events
    */
@@ -162,6 +221,17 @@ class WebSocketService {
     };
   }
 
+  /**
+   * Subscribe to resync signals, sent when missed events cannot be replayed
+   */
+  onResync(handler: ConnectionHandler): () => void {
+    this.resyncHandlers.add(handler);
+
+    return () => {
+      this.resyncHandlers.delete(handler);
+    };
+  }
+
   /**
    * Subscribe to error events
    */